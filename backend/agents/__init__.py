@@ -2,4 +2,6 @@
 from .discovery_agent import DiscoveryAgent
 from .threat_detector import ThreatDetector
 from .deception_agent import DeceptionAgent
-from .defense_agent import DefenseAgent
\ No newline at end of file
+from .defense_agent import DefenseAgent
+from .device_inventory import DeviceInventory
+from .threat_correlator import ThreatCorrelator
\ No newline at end of file
@@ -2,8 +2,8 @@
 Deception Agent - Honeypots & Honeytokens
 """
 import random
-from datetime import datetime
 import config
+from core import clock
 
 class DeceptionAgent:
     def __init__(self):
@@ -25,7 +25,7 @@ class DeceptionAgent:
                 'name': random.choice(honeypot_names),
                 'ip': f"192.168.1.{150 + i}",
                 'ports': random.sample(config.HONEYPOT_PORTS, 2),
-                'deployed': datetime.now().strftime("%H:%M:%S"),
+                'deployed': clock.now().strftime("%H:%M:%S"),
                 'interactions': 0
             })
         
@@ -45,7 +45,7 @@ class DeceptionAgent:
                 alert = {
                     'honeypot': honeypot['name'],
                     'attacker': f"10.0.0.{random.randint(1, 255)}",
-                    'time': datetime.now().strftime("%H:%M:%S"),
+                    'time': clock.now().strftime("%H:%M:%S"),
                     'action': random.choice(['Port Scan', 'Login Attempt', 'Exploit Try'])
                 }
                 alerts.append(alert)
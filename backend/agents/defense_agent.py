@@ -2,56 +2,83 @@
 Autonomous Defense Agent
 """
 import random
-from datetime import datetime
+from collections import OrderedDict, deque
+from itertools import islice
+import config
+from core import clock
+from database.records import ActionRecord, Status
+from database.retention import RetentionStore
+from database.threat_intel import get_threat_intel
 
 class DefenseAgent:
     def __init__(self):
-        self.blocked_ips = []
-        self.firewall_rules = []
-        self.actions = []
+        self.blocked_ips = OrderedDict()  # ip -> expiry time, soonest expiry first
+        self.firewall_rules = deque(maxlen=config.DEFENSE_RULES_MAX)
+        self.rules_created = 0
+        self.actions = RetentionStore("defense_actions", type_key='threat', severity_key=None)
+        self.intel = get_threat_intel()
         print("🛡️ Defense Agent initialized")
     
     def respond_to_threat(self, threat):
         """Respond to detected threat"""
         actions = []
+        self.expire_blocks()
         
-        # Block source IP
-        if threat['source'].startswith('10.0.0.'):
-            self.blocked_ips.append(threat['source'])
+        # Block sources listed in the threat-intel feed
+        if self.intel.contains(threat['source']):
+            self.block_ip(threat['source'])
             actions.append(f"Blocked IP {threat['source']}")
         
         # Create firewall rule
+        self.rules_created += 1
         rule = {
-            'id': f"RULE{len(self.firewall_rules)+1:04d}",
+            'id': f"RULE{self.rules_created:04d}",
             'action': 'BLOCK',
             'source': threat['source'],
             'target': threat['target'],
             'reason': threat['type'],
-            'time': datetime.now().strftime("%H:%M:%S")
+            'time': clock.now().strftime("%H:%M:%S")
         }
         self.firewall_rules.append(rule)
         
         # Log action
-        action_log = {
-            'time': datetime.now().strftime("%H:%M:%S"),
+        action_log = ActionRecord.from_dict({
+            'id': f"ACT{self.actions.total + 1:04d}",
+            'action_type': 'mitigate',
+            'target': threat['source'],
             'threat': threat['type'],
             'actions': actions,
-            'status': 'Mitigated'
-        }
+            'timestamp': clock.time(),
+            'status': Status.MITIGATED
+        })
         self.actions.append(action_log)
         
         # Update threat status
-        threat['status'] = 'Mitigated'
-        threat['mitigated_at'] = datetime.now().strftime("%H:%M:%S")
+        threat['status'] = Status.MITIGATED
+        threat['mitigated_at'] = clock.time()
         
         return actions
     
+    def block_ip(self, ip):
+        """Block an IP, or extend its block; the oldest blocks are released beyond DEFENSE_BLOCK_MAX"""
+        self.blocked_ips[ip] = clock.time() + config.DEFENSE_BLOCK_SECONDS
+        self.blocked_ips.move_to_end(ip)  # every block lasts as long, so this keeps expiry order
+        while len(self.blocked_ips) > config.DEFENSE_BLOCK_MAX:
+            self.blocked_ips.popitem(last=False)
+    
+    def expire_blocks(self):
+        """Release blocks past their expiry (they sit at the front)"""
+        now = clock.time()
+        while self.blocked_ips and next(iter(self.blocked_ips.values())) <= now:
+            self.blocked_ips.popitem(last=False)
+    
     def get_defense_status(self):
         """Get current defense status"""
+        self.expire_blocks()
         return {
-            'blocked_ips': self.blocked_ips[-10:],  # Last 10 blocked IPs
+            'blocked_ips': list(islice(reversed(self.blocked_ips), 10))[::-1],  # Last 10 blocked IPs
             'total_rules': len(self.firewall_rules),
-            'recent_actions': self.actions[-5:] if self.actions else [],
+            'recent_actions': self.actions.recent(5),
             'active_defenses': len(self.blocked_ips)
         }
     
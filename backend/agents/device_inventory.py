@@ -0,0 +1,160 @@
+"""
+Device Inventory - deduplicated store of discovered devices
+"""
+import ipaddress
+import config
+from core import clock
+from database.records import DeviceRecord, Status
+
+# Fields whose change marks a device as updated (timestamps always move)
+TRACKED_FIELDS = ('ip', 'name', 'type', 'vendor', 'firmware', 'risk_score',
+                  'ports', 'vulnerabilities', 'status')
+
+
+def risk_bucket(score):
+    """Map a risk score to its summary bucket"""
+    if score > config.RISK_HIGH:
+        return 'high'
+    if score >= config.RISK_MEDIUM:
+        return 'medium'
+    return 'low'
+
+
+class DeviceInventory:
+    """Devices keyed by MAC with a secondary IP index.
+
+    Devices whose MAC is unknown are keyed by "ip:<address>" until a scan
+    reports their MAC, at which point the entry is re-keyed in place.
+    Scans report plain dicts; the inventory keeps DeviceRecords.
+    """
+
+    def __init__(self):
+        self.by_mac = {}
+        self.by_ip = {}
+        self.risk_counts = {'high': 0, 'medium': 0, 'low': 0}
+        self.scan_id = 0
+        self.changed_in = {}  # key -> scan id of the last add/update/loss
+        self.last_diff = self._empty_diff()
+        self._seen = set()
+        self._added = []
+        self._updated = []
+
+    def _empty_diff(self):
+        return {'scan_id': self.scan_id, 'added': [], 'updated': [], 'lost': [], 'unchanged': 0}
+
+    def begin_scan(self):
+        """Start collecting changes for a new scan"""
+        self.scan_id += 1
+        self._seen = set()
+        self._added = []
+        self._updated = []
+        return self.scan_id
+
+    def upsert(self, device):
+        """Insert or refresh a device; returns 'added', 'updated' or 'unchanged'"""
+        now = clock.time()
+        key = self._key_for(device)
+        record = self.by_mac.get(key)
+        self._seen.add(key)
+
+        if record is None:
+            record = DeviceRecord.from_dict({**device, 'first_seen': now, 'last_seen': now})
+            self.by_mac[key] = record
+            self.by_ip[record['ip']] = key
+            self.risk_counts[risk_bucket(record['risk_score'])] += 1
+            self.changed_in[key] = self.scan_id
+            self._added.append(record)
+            return 'added'
+
+        record['last_seen'] = now
+        changed = [f for f in TRACKED_FIELDS
+                   if f in device and DeviceRecord.coerce(f, device[f]) != record.get(f)]
+        if record.get('status') == Status.OFFLINE and 'status' not in device:
+            record['status'] = Status.ONLINE
+            changed.append('status')
+        if not changed:
+            return 'unchanged'
+
+        self.risk_counts[risk_bucket(record['risk_score'])] -= 1
+        if 'ip' in changed and self.by_ip.get(record['ip']) == key:
+            del self.by_ip[record['ip']]
+        for field in changed:
+            if field in device:
+                record[field] = device[field]
+        self.by_ip[record['ip']] = key
+        self.risk_counts[risk_bucket(record['risk_score'])] += 1
+        self.changed_in[key] = self.scan_id
+        self._updated.append(record)
+        return 'updated'
+
+    def end_scan(self, full_sweep=False, network=None):
+        """Close the scan and compute its diff.
+
+        A full sweep marks devices inside `network` that did not answer as
+        offline and reports them as lost; partial scans never lose devices.
+        """
+        lost = []
+        if full_sweep:
+            net = ipaddress.ip_network(network, strict=False) if network else None
+            for key, record in self.by_mac.items():
+                if key in self._seen or record.get('status') == Status.OFFLINE:
+                    continue
+                if net is None or ipaddress.ip_address(record['ip']) in net:
+                    record['status'] = Status.OFFLINE
+                    self.changed_in[key] = self.scan_id
+                    lost.append(record)
+
+        self.last_diff = {
+            'scan_id': self.scan_id,
+            'added': self._added,
+            'updated': self._updated,
+            'lost': lost,
+            'unchanged': len(self._seen) - len(self._added) - len(self._updated)
+        }
+        return self.last_diff
+
+    def changes_since(self, scan_id):
+        """Devices added, updated or lost after the given scan id"""
+        return [self.by_mac[key] for key, changed in self.changed_in.items() if changed > scan_id]
+
+    def _key_for(self, device):
+        """Resolve the inventory key for a device, adopting IP-only entries once a MAC shows up"""
+        mac = (device.get('mac') or '').lower()
+        known = self.by_ip.get(device['ip'])
+        if not mac:
+            return known or f"ip:{device['ip']}"
+
+        if mac not in self.by_mac and known and known.startswith('ip:'):
+            record = self.by_mac.pop(known)
+            record['mac'] = mac
+            self.by_mac[mac] = record
+            self.by_ip[device['ip']] = mac
+            self.changed_in[mac] = self.changed_in.pop(known, self.scan_id)
+            if known in self._seen:
+                self._seen.discard(known)
+                self._seen.add(mac)
+        return mac
+
+    def get(self, mac=None, ip=None):
+        """Look a device up by MAC or IP"""
+        if mac:
+            return self.by_mac.get(mac.lower())
+        key = self.by_ip.get(ip)
+        return self.by_mac.get(key) if key else None
+
+    def devices(self):
+        """All devices in discovery order"""
+        return list(self.by_mac.values())
+
+    def recent(self, count=10):
+        """The most recently discovered devices"""
+        records = []
+        for record in reversed(self.by_mac.values()):
+            if len(records) == count:
+                break
+            records.append(record)
+        records.reverse()
+        return records
+
+    def __len__(self):
+        return len(self.by_mac)
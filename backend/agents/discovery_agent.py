@@ -1,44 +1,218 @@
 """
 IoT Device Discovery Agent
 """
+import asyncio
+import ipaddress
 import random
-from datetime import datetime
+import time
 import config
+from core import clock
+from .device_inventory import DeviceInventory
+
+# Well-known ports that give away what kind of device is listening
+PORT_TYPE_HINTS = {
+    554: "Security Camera",
+    8554: "Security Camera",
+    1883: "Smart Plug",
+    8008: "Smart TV",
+    8009: "Smart Speaker"
+}
+
+# Ports that should not be reachable on a consumer IoT device
+RISKY_PORTS = {
+    23: "Weak Auth",
+    2323: "Weak Auth",
+    21: "Open Port",
+    1883: "Open Port",
+    8080: "Open Port"
+}
+
+
+class _RateLimiter:
+    """Spaces out connection attempts to a fixed rate (single event loop)"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_slot = 0.0
+
+    async def acquire(self, count=1):
+        """Reserve `count` attempts, sleeping until the first one is due"""
+        if not self.interval:
+            return
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + self.interval * count
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
 
 class DiscoveryAgent:
-    def __init__(self):
-        self.devices = []
+    def __init__(self, mode=None, network=None):
+        self.mode = mode or config.DISCOVERY_MODE
+        self.network = network or config.SIMULATED_NETWORK
+        self.inventory = DeviceInventory()
         print("🔍 Discovery Agent initialized")
     
+    @property
+    def devices(self):
+        """Deduplicated device list"""
+        return self.inventory.devices()
+    
     def scan_network(self):
-        """Simulate network scan"""
-        new_devices = []
+        """Scan the configured network (simulated or real sweep)"""
+        if self.mode == "network":
+            asyncio.run(self.scan_network_async())
+            return self.inventory.last_diff['added']
+
+        self.inventory.begin_scan()
         
-        # Simulate finding 1-3 new devices
+        # Simulate seeing 1-3 devices; addresses repeat across scans
         for i in range(random.randint(1, 3)):
-            device = self._create_device()
-            self.devices.append(device)
-            new_devices.append(device)
+            self.inventory.upsert(self._create_device())
         
-        return new_devices
+        return self.inventory.end_scan()['added']
     
+    def get_scan_diff(self, since=None):
+        """Changes from the last scan, or every device changed after scan `since`"""
+        if since is None:
+            return self.inventory.last_diff
+        return {
+            'scan_id': self.inventory.scan_id,
+            'changed': self.inventory.changes_since(since)
+        }
+    
+    async def scan_network_async(self, network=None, ports=None, on_progress=None):
+        """Sweep a CIDR range with concurrent TCP connect probes.
+
+        Hosts are pulled from a shared iterator by a bounded set of workers,
+        so memory stays constant regardless of the range size. `on_progress`
+        is called with {'scanned', 'total', 'found'} roughly every 1% of hosts.
+        """
+        net = ipaddress.ip_network(network or self.network, strict=False)
+        ports = list(ports or config.DISCOVERY_PORTS)
+        total = self._host_count(net)
+        hosts = net.hosts()
+        limiter = _RateLimiter(config.DISCOVERY_RATE_LIMIT)
+        progress = {'scanned': 0, 'total': total, 'found': 0}
+        step = max(1, total // 100)
+        found = []
+        started = time.monotonic()
+        self.inventory.begin_scan()
+
+        async def worker():
+            for ip in hosts:
+                open_ports = await self._probe_host(str(ip), ports, limiter)
+                progress['scanned'] += 1
+                if open_ports is not None:
+                    found.append(self._build_device(str(ip), open_ports))
+                    progress['found'] += 1
+                if on_progress and (progress['scanned'] % step == 0 or progress['scanned'] == total):
+                    on_progress(dict(progress))
+
+        workers = max(1, min(config.DISCOVERY_CONCURRENCY, total))
+        await asyncio.gather(*(worker() for _ in range(workers)))
+
+        # Probes populate the kernel ARP cache, so MACs can be read afterwards
+        arp_table = self._read_arp_table()
+        for device in found:
+            device['mac'] = arp_table.get(device['ip'])
+            self.inventory.upsert(device)
+        self.inventory.end_scan(full_sweep=True, network=net)
+
+        print(f"🔍 Swept {total} hosts on {net} in {time.monotonic() - started:.1f}s, "
+              f"found {len(found)} devices")
+        return found
+
+    async def _probe_host(self, ip, ports, limiter):
+        """Probe every port on one host; returns open ports, or None if the host never answered"""
+
+        async def probe(port):
+            try:
+                _, writer = await asyncio.open_connection(ip, port)
+            except ConnectionRefusedError:
+                return False  # RST: host is up, port is closed
+            except OSError:
+                return None
+            writer.close()
+            return True
+
+        # Reserve the whole host's budget up front so rate limiting never eats into the timeout
+        await limiter.acquire(len(ports))
+        tasks = [asyncio.ensure_future(probe(port)) for port in ports]
+        done, pending = await asyncio.wait(tasks, timeout=config.DISCOVERY_HOST_TIMEOUT)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        results = [(port, task.result()) for port, task in zip(ports, tasks) if task in done]
+        if all(result is None for _, result in results):
+            return None
+        return [port for port, result in results if result]
+
+    def _build_device(self, ip, open_ports):
+        """Create a device record from a live host"""
+        device_type = next((PORT_TYPE_HINTS[p] for p in open_ports if p in PORT_TYPE_HINTS), "Unknown")
+        vulnerabilities = sorted({RISKY_PORTS[p] for p in open_ports if p in RISKY_PORTS})
+
+        return {
+            'id': f"DEV-{ip}",
+            'name': f"{device_type} ({ip})",
+            'ip': ip,
+            'mac': None,
+            'type': device_type,
+            'vendor': "Unknown",
+            'firmware': "unknown",
+            'risk_score': min(1.0, 0.1 + 0.25 * len(vulnerabilities) + 0.05 * len(open_ports)),
+            'vulnerabilities': vulnerabilities,
+            'ports': open_ports,
+            'discovered': clock.time()
+        }
+
+    @staticmethod
+    def _host_count(net):
+        """Number of addresses yielded by net.hosts()"""
+        if net.prefixlen >= net.max_prefixlen - 1:
+            return net.num_addresses
+        return net.num_addresses - 2
+
+    @staticmethod
+    def _read_arp_table():
+        """Read IP -> MAC pairs from the kernel ARP cache (Linux only)"""
+        table = {}
+        try:
+            with open('/proc/net/arp') as f:
+                next(f)
+                for line in f:
+                    fields = line.split()
+                    if len(fields) >= 4 and fields[3] != "00:00:00:00:00:00":
+                        table[fields[0]] = fields[3]
+        except OSError:
+            pass
+        return table
+
     def _create_device(self):
         """Create simulated IoT device"""
         device_types = config.DEVICE_TYPES
         vendors = ["Philips", "Samsung", "Google", "Amazon", "Xiaomi"]
-        
+        net = ipaddress.ip_network(self.network, strict=False)
+        hosts = self._host_count(net)
+        ip = str(net.network_address + random.randint(min(10, hosts), min(250, hosts)))
+
+        # Seed per address so the same simulated device answers every rescan
+        rng = random.Random(ip)
         return {
-            'id': f"DEV{random.randint(1000, 9999)}",
-            'name': f"{random.choice(vendors)} {random.choice(device_types)}",
-            'ip': f"192.168.1.{random.randint(10, 250)}",
-            'mac': ':'.join(f"{random.randint(0,255):02x}" for _ in range(6)),
-            'type': random.choice(device_types),
-            'vendor': random.choice(vendors),
-            'firmware': f"v{random.randint(1,4)}.{random.randint(0,9)}",
-            'risk_score': random.uniform(0.1, 0.9),
-            'vulnerabilities': random.sample(["Old Firmware", "Open Port", "Weak Auth"], 
-                                           random.randint(0, 2)),
-            'discovered': datetime.now().strftime("%H:%M:%S")
+            'id': f"DEV{rng.randint(1000, 9999)}",
+            'name': f"{rng.choice(vendors)} {rng.choice(device_types)}",
+            'ip': ip,
+            'mac': ':'.join(f"{rng.randint(0,255):02x}" for _ in range(6)),
+            'type': rng.choice(device_types),
+            'vendor': rng.choice(vendors),
+            'firmware': f"v{rng.randint(1,4)}.{rng.randint(0,9)}",
+            'risk_score': rng.uniform(0.1, 0.9),
+            'vulnerabilities': rng.sample(["Old Firmware", "Open Port", "Weak Auth"],
+                                          rng.randint(0, 2)),
+            'discovered': clock.time()
         }
     
     def get_devices(self):
@@ -47,14 +221,12 @@ class DiscoveryAgent:
     
     def get_risk_summary(self):
         """Get risk summary"""
-        high = len([d for d in self.devices if d['risk_score'] > 0.7])
-        medium = len([d for d in self.devices if 0.4 <= d['risk_score'] <= 0.7])
-        low = len([d for d in self.devices if d['risk_score'] < 0.4])
-        
+        counts = self.inventory.risk_counts
+
         return {
-            'total': len(self.devices),
-            'high_risk': high,
-            'medium_risk': medium,
-            'low_risk': low,
-            'devices': self.devices[-10:]  # Last 10 devices
-        }
\ No newline at end of file
+            'total': len(self.inventory),
+            'high_risk': counts['high'],
+            'medium_risk': counts['medium'],
+            'low_risk': counts['low'],
+            'devices': self.inventory.recent(10)  # Last 10 devices
+        }
@@ -0,0 +1,101 @@
+"""
+Threat Correlator - folds repeated alerts into incidents
+"""
+from collections import OrderedDict
+import config
+from core import clock
+from core.metrics import REGISTRY
+
+SEVERITY_RANK = {'low': 0, 'medium': 1, 'high': 2, 'critical': 3}
+
+CORRELATED = REGISTRY.counter('threat_events_total', 'Threat events by correlation outcome', ['status'])
+
+
+class ThreatCorrelator:
+    """Groups threats by (source, target, type) within a sliding window.
+
+    The first threat of a group becomes the incident record itself, so each
+    emitter keeps its own field names; later threats only bump `count`,
+    `last_seen` and, if higher, `severity`/`confidence`.
+    """
+
+    def __init__(self, window=None, max_open=None):
+        self.window = window or config.CORRELATION_WINDOW
+        self.max_open = max_open or config.CORRELATION_MAX_OPEN
+        self.open_incidents = OrderedDict()  # key -> [incident, last hit], oldest hit first
+        self.incident_count = 0
+        self.event_count = 0
+
+    def ingest(self, threat):
+        """Fold a threat into its incident; returns (incident, status).
+
+        status is 'new' for the first event of an incident, 'escalated' when
+        the count reaches a power of two or a closed incident re-fires, and
+        'merged' otherwise. Callers store 'new' incidents and only notify on
+        'new'/'escalated', which keeps bursts to O(log n) notifications.
+        """
+        now = clock.time()
+        self._expire(now)
+        self.event_count += 1
+
+        key = (
+            threat.get('source', 'unknown'),
+            threat.get('target') or threat.get('device_id', 'unknown'),
+            threat.get('type')
+        )
+        seen = threat.get('timestamp') or threat.get('time') or clock.now().isoformat()
+        entry = self.open_incidents.get(key)
+
+        if entry is None:
+            threat['count'] = 1
+            threat['first_seen'] = seen
+            threat['last_seen'] = seen
+            self.open_incidents[key] = [threat, now]
+            self.incident_count += 1
+            if len(self.open_incidents) > self.max_open:
+                self.open_incidents.popitem(last=False)
+            CORRELATED.labels('new').inc()
+            return threat, 'new'
+
+        incident = entry[0]
+        entry[1] = now
+        self.open_incidents.move_to_end(key)
+
+        incident['count'] += 1
+        incident['last_seen'] = seen
+        if self._rank(threat) > self._rank(incident):
+            incident['severity'] = threat['severity']
+        if threat.get('confidence', 0) > incident.get('confidence', 0):
+            incident['confidence'] = threat['confidence']
+
+        # A resolved/mitigated incident that keeps firing is live again
+        if 'status' in threat and incident.get('status') != threat['status']:
+            incident['status'] = threat['status']
+            CORRELATED.labels('escalated').inc()
+            return incident, 'escalated'
+
+        count = incident['count']
+        status = 'escalated' if count & (count - 1) == 0 else 'merged'
+        CORRELATED.labels(status).inc()
+        return incident, status
+
+    def _expire(self, now):
+        """Close incidents that have been quiet for longer than the window"""
+        while self.open_incidents:
+            key, (incident, last_hit) = next(iter(self.open_incidents.items()))
+            if now - last_hit <= self.window:
+                break
+            del self.open_incidents[key]
+
+    @staticmethod
+    def _rank(threat):
+        return SEVERITY_RANK.get(str(threat.get('severity', '')).lower(), -1)
+
+    def get_stats(self):
+        """Get correlation statistics"""
+        return {
+            'events': self.event_count,
+            'incidents': self.incident_count,
+            'open_incidents': len(self.open_incidents),
+            'compression': round(self.event_count / self.incident_count, 2) if self.incident_count else 0.0
+        }
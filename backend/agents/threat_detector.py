@@ -2,44 +2,98 @@
 AI Threat Detection Agent
 """
 import random
-from datetime import datetime
 
 from config import RISK_HIGH, RISK_MEDIUM, ANOMALY_THRESHOLD, ATTACK_TYPES
+from core import clock
+from core.metrics import REGISTRY
+from database.records import Status, ThreatRecord, to_iso
+from database.retention import RetentionStore
+from .threat_correlator import ThreatCorrelator
+
+# Severity assigned to threats derived from suspicious traffic
+TRAFFIC_SEVERITY = {
+    'Port Scan': 'Medium',
+    'Host Sweep': 'Medium',
+    'Known Malicious IP': 'High',
+    'Anomalous Traffic': 'Medium',
+    'Brute Force': 'High',
+    'Credential Stuffing': 'High',
+    'Malware Beacon': 'High',
+    'Data Exfiltration': 'Critical',
+    'DDoS': 'Critical'
+}
+
+ANALYZED = REGISTRY.counter('detector_analyzed_total', 'Traffic analyses by outcome', ['result'])
 
 
 class ThreatDetector:
     def __init__(self):
-        self.threats = []
+        self.threats = RetentionStore("detector_threats")
         self.threat_count = 0
+        self.correlator = ThreatCorrelator()
+        # Trained models (a ModelSet), swapped in whole by the training service
+        self.models = None
         print("⚠️ Threat Detector initialized")
     
     def analyze_traffic(self, traffic_data=None):
-        """Analyze traffic for threats"""
+        """Analyze traffic for threats.
+
+        With a traffic record, suspicious traffic becomes a threat, as does
+        clean-looking traffic the trained models score as anomalous; without
+        one, detection is simulated. Threats are folded into incidents by
+        the correlator, so only the first event of an incident is stored.
+        """
         self.threat_count += 1
         
+        if traffic_data is not None:
+            if traffic_data.get('is_suspicious'):
+                threat_type = traffic_data.get('suspicious_type', 'Suspicious Traffic')
+            else:
+                # Read once: a model swap mid-call can't mix two versions
+                models = self.models
+                verdict = models.score(traffic_data) if models is not None else None
+                if verdict is None or not verdict['is_anomaly']:
+                    ANALYZED.labels('clean').inc()
+                    return None
+                threat_type = verdict['type']
+            threat = {
+                'id': f"THR{self.threat_count:04d}",
+                'type': threat_type,
+                'source': traffic_data.get('source_ip', 'unknown'),
+                'target': traffic_data.get('destination_ip', 'unknown'),
+                'severity': TRAFFIC_SEVERITY.get(threat_type, 'Medium'),
+                'timestamp': clock.time(),
+                'status': Status.DETECTED
+            }
         # Simulate threat detection (30% chance)
-        if random.random() < 0.3:
-            threat_types = config.ATTACK_TYPES
+        elif random.random() < 0.3:
+            threat_types = ATTACK_TYPES
             threat = {
                 'id': f"THR{self.threat_count:04d}",
                 'type': random.choice(threat_types),
                 'source': f"10.0.0.{random.randint(1, 255)}",
                 'target': f"192.168.1.{random.randint(10, 250)}",
                 'severity': random.choice(['Low', 'Medium', 'High', 'Critical']),
-                'timestamp': datetime.now().strftime("%H:%M:%S"),
-                'status': 'Detected'
+                'timestamp': clock.time(),
+                'status': Status.DETECTED
             }
-            self.threats.append(threat)
+        else:
+            ANALYZED.labels('clean').inc()
+            return None
             
-            # Log threat
-            self._log_threat(threat)
-            return threat
+        ANALYZED.labels('threat').inc()
+        incident, status = self.correlator.ingest(ThreatRecord.from_dict(threat))
+        if status == 'new':
+            self.threats.append(incident)
         
-        return None
+        # Log new and escalating incidents only
+        if status != 'merged':
+            self._log_threat(incident)
+        return incident
     
     def _log_threat(self, threat):
         """Log threat to file"""
-        log_msg = f"[{threat['timestamp']}] {threat['type']} from {threat['source']} to {threat['target']}\n"
+        log_msg = f"[{to_iso(threat['timestamp'])}] {threat['type']} from {threat['source']} to {threat['target']}\n"
         try:
             with open('logs/threats.log', 'a') as f:
                 f.write(log_msg)
@@ -48,19 +102,17 @@ class ThreatDetector:
     
     def get_recent_threats(self, count=10):
         """Get recent threats"""
-        return self.threats[-count:] if self.threats else []
+        return self.threats.recent(count)
     
     def get_threat_stats(self):
         """Get threat statistics"""
-        severities = {}
-        for threat in self.threats:
-            sev = threat['severity']
-            severities[sev] = severities.get(sev, 0) + 1
+        severities = self.threats.counts()['by_severity']
+        midnight = clock.now().replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
         
         return {
-            'total': len(self.threats),
-            'today': len([t for t in self.threats if 'timestamp' in t and 
-                         datetime.now().strftime("%H:%M") in t['timestamp']]),
+            'total': self.threats.total,
+            'events': self.correlator.event_count,
+            'today': self.threats.count_between(midnight),
             'severities': severities,
-            'active_threats': len([t for t in self.threats if t.get('status') == 'Detected'])
+            'active_threats': len([t for t in self.threats if t.get('status') == Status.DETECTED])
         }
\ No newline at end of file
@@ -0,0 +1,45 @@
+"""
+Tick benchmark: dict-based IoTDeviceSimulator vs vectorized FleetSimulator
+
+Usage (from backend/):
+    python -m benchmarks.fleet_tick --devices 1000000
+"""
+import argparse
+import time
+
+from simulation.fleet_simulator import FleetSimulator
+from simulation.iot_simulator import IoTDeviceSimulator
+
+
+def time_ticks(sim, ticks):
+    """Mean and worst tick time in milliseconds"""
+    durations = []
+    for _ in range(ticks):
+        started = time.perf_counter()
+        sim.simulate_activity()
+        durations.append((time.perf_counter() - started) * 1000)
+    return sum(durations) / len(durations), max(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--devices', type=int, default=1_000_000)
+    parser.add_argument('--ticks', type=int, default=20)
+    parser.add_argument('--dict-devices', type=int, default=100_000,
+                        help="fleet size for the dict-based simulator (it is much slower)")
+    args = parser.parse_args()
+
+    fleet = FleetSimulator(args.devices, seed=7)
+    mean, worst = time_ticks(fleet, args.ticks)
+    print(f"FleetSimulator      {args.devices:>9,} devices  {mean:8.1f} ms/tick (max {worst:.1f})")
+
+    page = fleet.get_devices(offset=args.devices - 10, limit=10)
+    print(f"  last device: {page[-1]}")
+
+    dicts = IoTDeviceSimulator(num_devices=args.dict_devices)
+    mean, worst = time_ticks(dicts, max(1, args.ticks // 4))
+    print(f"IoTDeviceSimulator  {args.dict_devices:>9,} devices  {mean:8.1f} ms/tick (max {worst:.1f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+History query benchmark: indexed, cached SQLite read path over millions of threats
+
+Usage (from backend/):
+    python -m benchmarks.history_queries --threats 10000000
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+
+from database.iot_db import IoTDatabase, initialize_database
+from database.records import to_iso
+
+STATUSES = ['active', 'resolved', 'mitigated']
+SEVERITIES = ['Low', 'Medium', 'High', 'Critical']
+START = 1.7e9
+
+
+def load(path, threats, rate, devices):
+    """Bulk-load synthetic threats (`rate` per second) and devices straight into the file"""
+    initialize_database(path)
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO threats VALUES (?, ?, ?, ?, ?, ?, ?)", (
+        (f"threat_{i}", 'Port Scan', f"203.0.113.{i % 250}", f"192.168.1.{i % 200}", SEVERITIES[i % 4],
+         to_iso(START + i / rate), STATUSES[i % 3]) for i in range(threats)))
+    conn.executemany("INSERT INTO devices VALUES (?, ?, ?, ?, ?, ?)", (
+        (f"device_{i}", f"Device {i}", f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}",
+         ['camera', 'sensor', 'hub'][i % 3], (i * 7919) % 10000 / 100, to_iso(START)) for i in range(devices)))
+    conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+
+
+async def run(db, end):
+    queries = [
+        ('newest threats', lambda: db.threats(limit=100)),
+        ('last hour, active', lambda: db.threats(since=end - 3600, status='active', limit=100)),
+        ('one target, paged', lambda: db.threats(target='192.168.1.7', until=end - 86400, limit=100)),
+        ('critical', lambda: db.threats(severity='Critical', limit=100)),
+        ('summary 1h', lambda: db.threat_summary(since=end - 3600)),
+        ('summary 7d', lambda: db.threat_summary(since=end - 7 * 86400 + 1234.5, until=end - 42.5)),
+        ('summary all', lambda: db.threat_summary()),
+        ('riskiest cameras', lambda: db.devices(min_risk=90, type='camera', limit=100)),
+    ]
+    for name, query in queries:
+        started = time.perf_counter()
+        await query()
+        cold = time.perf_counter() - started
+        started = time.perf_counter()
+        await query()
+        cached = time.perf_counter() - started
+        print(f"{name:<20} {cold * 1000:8.2f} ms   cached {cached * 1000:.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--threats', type=int, default=10_000_000)
+    parser.add_argument('--rate', type=float, default=20.0, help="threats per second of simulated history")
+    parser.add_argument('--devices', type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'history.db')
+        started = time.perf_counter()
+        load(path, args.threats, args.rate, args.devices)
+        print(f"load: {args.threats:,} threats, {args.devices:,} devices in {time.perf_counter() - started:.0f}s "
+              f"({os.path.getsize(path) / 2**20:.0f} MiB)")
+
+        db = IoTDatabase(path)
+        asyncio.run(run(db, START + args.threats / args.rate))
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+Memory benchmark: dict records vs compact slotted records (traffic, threats, actions, devices)
+
+Usage (from backend/):
+    python -m benchmarks.record_memory --records 1000000
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from datetime import datetime
+
+from database.records import ActionRecord, DeviceRecord, ThreatRecord, TrafficRecord
+
+PROTOCOLS = ['TCP', 'UDP', 'HTTP', 'HTTPS', 'DNS', 'DHCP']
+DEVICE_TYPES = ["Smart TV", "Security Camera", "Smart Bulb", "Thermostat", "Smart Speaker", "Router"]
+VENDORS = ["Philips", "Nest", "Ring", "Samsung", "Apple", "Google", "Amazon"]
+
+
+def make_devices(count=50):
+    """Device pool, so IPs/MACs/ids are shared references exactly as in NetworkSimulator"""
+    return [
+        {'id': f"DEV{i+1:03d}", 'ip': f"192.168.1.{i+10}", 'mac': f"00:1a:2b:3c:4d:{i:02x}"}
+        for i in range(count)
+    ]
+
+
+def traffic_dict(rng, devices, ts):
+    """Traffic record in the shape NetworkSimulator has always produced"""
+    src, dst = rng.sample(devices, 2)
+    return {
+        'timestamp': datetime.fromtimestamp(ts).isoformat(),
+        'source_ip': src['ip'],
+        'source_mac': src['mac'],
+        'destination_ip': dst['ip'],
+        'destination_mac': dst['mac'],
+        'protocol': rng.choice(PROTOCOLS),
+        'port': rng.randint(1024, 65535),
+        'bytes': rng.randint(64, 1500),
+        'is_suspicious': False,
+        'src_device_id': src['id'],
+        'dst_device_id': dst['id']
+    }
+
+
+def threat_dict(rng, devices, ts, i):
+    """Threat in the shape backend/main.py stores"""
+    return {
+        'id': f"threat_{i}",
+        'type': rng.choice(["Port Scan", "Brute Force", "Malware", "DDoS"]),
+        'severity': rng.choice(["low", "medium", "high", "critical"]),
+        'device_id': rng.choice(devices)['id'],
+        'description': "Background security event detected",
+        'confidence': rng.uniform(0.4, 0.99),
+        'timestamp': datetime.fromtimestamp(ts).isoformat(),
+        'status': "active"
+    }
+
+
+def action_dict(rng, devices, ts, i):
+    """Action in the shape backend/main.py stores"""
+    target = rng.choice(devices)['id']
+    return {
+        'id': f"action_{int(ts)}_{i}",
+        'action_type': rng.choice(["block", "isolate", "alert"]),
+        'target': target,
+        'description': f"Automatically blocked {target} due to Port Scan",
+        'timestamp': datetime.fromtimestamp(ts).isoformat(),
+        'status': "completed"
+    }
+
+
+def device_dict(rng, ts, i):
+    """Device in the shape backend/main.py's scan produces"""
+    return {
+        'id': f"device_{i}",
+        'name': f"{rng.choice(DEVICE_TYPES)} {i}",
+        'ip': f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}",
+        'mac': f"00:1A:2B:{i >> 16 & 255:02X}:{i >> 8 & 255:02X}:{i & 255:02X}",
+        'type': rng.choice(DEVICE_TYPES),
+        'vendor': rng.choice(VENDORS),
+        'firmware': f"v{rng.randint(1, 5)}.{rng.randint(0, 9)}",
+        'risk_score': rng.uniform(0.1, 0.95),
+        'ports': rng.sample([80, 443, 8080, 22, 23], rng.randint(1, 3)),
+        'last_seen': datetime.fromtimestamp(ts).isoformat(),
+        'status': rng.choice(["online", "online", "online", "offline"])
+    }
+
+
+def measure(label, build, count):
+    """Build `count` records and report traced bytes per record"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    records = build(count)
+    elapsed = time.perf_counter() - started
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {current / count:8.1f} B/record  {current / 2**20:9.1f} MiB  {elapsed:6.2f}s")
+    del records
+    return current / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--records', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    devices = make_devices()
+    base = time.time()
+    count = args.records
+
+    def dict_traffic(n):
+        rng = random.Random(args.seed)
+        return [traffic_dict(rng, devices, base + i * 0.01) for i in range(n)]
+
+    def slotted_traffic(n):
+        # Conversion happens at ingest, so only the compact record is retained
+        rng = random.Random(args.seed)
+        return [TrafficRecord.from_dict(traffic_dict(rng, devices, base + i * 0.01)) for i in range(n)]
+
+    def dict_threats(n):
+        rng = random.Random(args.seed)
+        return [threat_dict(rng, devices, base + i, i) for i in range(n)]
+
+    def slotted_threats(n):
+        rng = random.Random(args.seed)
+        return [ThreatRecord.from_dict(threat_dict(rng, devices, base + i, i)) for i in range(n)]
+
+    def dict_actions(n):
+        rng = random.Random(args.seed)
+        return [action_dict(rng, devices, base + i, i) for i in range(n)]
+
+    def slotted_actions(n):
+        rng = random.Random(args.seed)
+        return [ActionRecord.from_dict(action_dict(rng, devices, base + i, i)) for i in range(n)]
+
+    def dict_devices(n):
+        rng = random.Random(args.seed)
+        return [device_dict(rng, base + i, i) for i in range(n)]
+
+    def slotted_devices(n):
+        rng = random.Random(args.seed)
+        return [DeviceRecord.from_dict(device_dict(rng, base + i, i)) for i in range(n)]
+
+    print(f"Records: {count:,}")
+    results = [
+        ("traffic", measure("traffic dict", dict_traffic, count),
+         measure("traffic TrafficRecord", slotted_traffic, count)),
+        ("threats", measure("threat dict", dict_threats, count),
+         measure("threat ThreatRecord", slotted_threats, count)),
+        ("actions", measure("action dict", dict_actions, count),
+         measure("action ActionRecord", slotted_actions, count)),
+        ("devices", measure("device dict", dict_devices, count),
+         measure("device DeviceRecord", slotted_devices, count)),
+    ]
+    for kind, before, after in results:
+        print(f"{kind}: {before:.0f} -> {after:.0f} B/record ({before / after:.1f}x smaller)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Lookup benchmark: memory-mapped threat-intel table with millions of entries
+
+Usage (from backend/):
+    python -m benchmarks.threat_intel_lookup --entries 20000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from database.threat_intel import ThreatIntel, compile_feed
+
+
+def write_feed(path, entries, rng):
+    """Random single addresses plus a few CIDR blocks, like a typical blocklist"""
+    addrs = rng.integers(1 << 24, 0xE0000000, entries, dtype=np.uint64)
+    with open(path, 'w') as f:
+        for chunk in np.array_split(addrs, max(1, entries // 1_000_000)):
+            f.write('\n'.join(f"{a >> 24}.{(a >> 16) & 255}.{(a >> 8) & 255}.{a & 255}" for a in chunk.tolist()))
+            f.write('\n')
+        f.write("10.0.0.0/24\n192.0.2.0/24\n")
+    return addrs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--entries', type=int, default=10_000_000)
+    parser.add_argument('--batch', type=int, default=10_000)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        feed, table = os.path.join(tmp, 'feed.txt'), os.path.join(tmp, 'feed.bin')
+        listed = write_feed(feed, args.entries, rng)
+
+        started = time.perf_counter()
+        ranges = compile_feed(feed, table)
+        print(f"compile: {ranges:,} ranges in {time.perf_counter() - started:.1f}s "
+              f"({os.path.getsize(table) / 2**20:.0f} MiB table)")
+
+        intel = ThreatIntel(table)
+        probes = np.concatenate([listed[:args.batch // 2], rng.integers(0, 1 << 32, args.batch // 2, dtype=np.uint64)])
+        started = time.perf_counter()
+        hits = intel.lookup_batch(probes)
+        elapsed = time.perf_counter() - started
+        print(f"batch:   {len(probes):,} addresses in {elapsed * 1000:.2f} ms "
+              f"({elapsed / len(probes) * 1e6:.3f} us/address, {int(hits.sum()):,} listed)")
+
+        strings = [f"{a >> 24}.{(a >> 16) & 255}.{(a >> 8) & 255}.{a & 255}" for a in probes[:1000].tolist()]
+        started = time.perf_counter()
+        for ip in strings:
+            intel.contains(ip)
+        print(f"single:  {(time.perf_counter() - started) / len(strings) * 1e6:.2f} us/lookup")
+
+
+if __name__ == '__main__':
+    main()
@@ -7,10 +7,16 @@ import os
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 LOG_DIR = os.path.join(BASE_DIR, 'logs')
 DB_PATH = os.path.join(BASE_DIR, 'iot_security.db')
+DB_READERS = 4  # read-only connections (and executor threads) for history queries
+DB_CACHE_SIZE = 256  # query results kept until the next write
+DB_MAX_LIMIT = 1000  # most rows one history query returns
+DB_MMAP_SIZE = 256 * 1024 * 1024  # bytes of the database file each reader memory-maps
 
 # Simulation Settings
 SIMULATED_NETWORK = "192.168.1.0/24"
 MAX_DEVICES = 50
+FLEET_SIZE = 0  # > 0 runs the dashboard on the vectorized FleetSimulator with this many devices
+FLEET_PAGE_SIZE = 1000  # devices scored and published per tick in fleet mode
 SCAN_INTERVAL = 30
 
 # Risk Thresholds
@@ -37,4 +43,107 @@ HONEYTOKEN_FILES = ["config_backup.zip", "admin_passwords.txt"]
 
 # AI Model Settings
 ANOMALY_THRESHOLD = 0.8
-MODEL_UPDATE_INTERVAL = 300  # 5 minutes
\ No newline at end of file
+MODEL_UPDATE_INTERVAL = 300  # 5 minutes
+MODEL_TRAINING_WINDOW = 86400  # seconds of archived clean traffic to train on
+MODEL_TRAINING_MIN_ROWS = 1000  # skip a run until the archive holds this much
+MODEL_TRAINING_MAX_ROWS = 2_000_000  # newest rows kept when the window holds more
+MODEL_TRAINING_WORKERS = 1  # training processes
+CHECKPOINT_DIR = os.path.join(BASE_DIR, 'checkpoints')
+CHECKPOINT_INTERVAL = 60  # seconds between checkpoint saves (only new model versions are written)
+CHECKPOINT_KEEP = 3  # model versions kept on disk
+
+# Discovery Settings
+DISCOVERY_MODE = "simulated"  # "simulated" or "network"
+DISCOVERY_PORTS = [22, 23, 53, 80, 443, 554, 1883, 8080, 8443]
+DISCOVERY_CONCURRENCY = 256  # hosts probed in parallel
+DISCOVERY_HOST_TIMEOUT = 1.0  # seconds per host
+DISCOVERY_RATE_LIMIT = 2000  # connection attempts per second (0 = unlimited)
+
+# Threat Correlation
+CORRELATION_WINDOW = 60  # seconds of quiet before an incident closes
+CORRELATION_MAX_OPEN = 10000
+
+# History Retention
+RETENTION_HOT_SECONDS = 3600  # raw records kept for 1 hour
+RETENTION_HOT_MAX = 10000  # and never more than this many
+RETENTION_MINUTE_BUCKETS = 1440  # 24 hours of per-minute rollups
+RETENTION_HOUR_BUCKETS = 2160  # 90 days of per-hour rollups
+TIME_INDEX_SEGMENT_SIZE = 1024  # events per index segment
+
+# Defense
+DEFENSE_BLOCK_SECONDS = 3600  # a blocked IP is released after this long without a new threat
+DEFENSE_BLOCK_MAX = 10000  # oldest blocks are released beyond this many
+DEFENSE_RULES_MAX = 1000  # newest firewall rules kept
+
+# Diagnostics
+ADMIN_TOKEN = os.environ.get("IOT_ADMIN_TOKEN", "")  # admin endpoints are disabled when unset
+LOOP_LAG_INTERVAL = 0.1  # seconds between event-loop heartbeats
+LOOP_LAG_THRESHOLD = 0.1  # stalls longer than this are recorded with a stack
+LOOP_LAG_HISTORY = 100
+PROFILER_SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+PROFILER_MAX_SECONDS = 60
+
+# Tick Scheduler (seconds between ticks per job)
+TICK_RATES = {
+    'traffic': 1,
+    'devices': 10,
+    'threats': 5,
+    'defense': 5,
+    'deception': 5,
+    'attacks': 25
+}
+
+# Scenario Replay
+SCENARIO_SPEED = 100  # simulated seconds per wall-clock second
+
+# Traffic Sketches
+SKETCH_WINDOW = 300  # seconds per tumbling window
+SKETCH_TOP_K = 20  # heavy hitters tracked per direction
+SKETCH_WIDTH = 2048  # Count-Min counters per row
+SKETCH_DEPTH = 4  # Count-Min rows
+SKETCH_MAX_SOURCES = 4096  # sources with HyperLogLog profiles per window
+SKETCH_HLL_PRECISION = 8  # 256 registers, ~6.5% error
+SKETCH_SCAN_PORT_LIMIT = 1024  # only service ports below this count toward scans (not ephemeral ports)
+SKETCH_PORT_SCAN_THRESHOLD = 50  # distinct service ports from one source
+SKETCH_FANOUT_THRESHOLD = 64  # distinct destinations from one source
+
+# Threat Intelligence
+THREAT_INTEL_FEED = os.path.join(BASE_DIR, 'threat_intel.txt')  # addresses, CIDRs or first-last ranges
+THREAT_INTEL_DB = os.path.join(BASE_DIR, 'intel', 'threat_intel.bin')  # compiled, memory-mapped table
+THREAT_INTEL_RELOAD_INTERVAL = 5  # seconds between checks for a replaced table
+THREAT_INTEL_COMPILE_INTERVAL = 60  # seconds between the compiler thread's checks for a newer feed
+
+# WebSocket Updates
+WS_MAX_RATE = 10  # batches per second sent to each client
+WS_MAX_BACKLOG = 1000  # events buffered for a slow client before the oldest are dropped
+WS_SEND_TIMEOUT = 5  # seconds before a stuck client is disconnected
+
+# Server-Sent Events
+SSE_BUFFER_SIZE = 10000  # events kept for replay to reconnecting clients
+SSE_HEARTBEAT = 15  # seconds between keep-alive comments on an idle stream
+SSE_RETRY_MS = 3000  # reconnect delay suggested to clients
+
+# Traffic Archive
+ARCHIVE_ENABLED = True
+ARCHIVE_DIR = os.path.join(BASE_DIR, 'archive')
+ARCHIVE_SEGMENT_ROWS = 65536  # rows per segment before it is sealed
+ARCHIVE_SEGMENT_SECONDS = 3600  # or this much time, whichever comes first
+ARCHIVE_RETENTION_SECONDS = 7 * 86400  # whole segments older than this are deleted
+ARCHIVE_MAX_BYTES = 1 << 30  # and the oldest are deleted beyond this total size
+
+# Snapshot / Change Feed
+CHANGE_LOG_SIZE = 10000  # changes remembered for /api/changes deltas
+LONG_POLL_TIMEOUT = 25  # longest a /api/changes request waits (seconds)
+
+# Scan Jobs
+JOB_HISTORY = 100  # finished jobs kept for /api/jobs
+SCAN_PROBE_DELAY = 0.2  # simulated time to probe one host (seconds)
+
+# Subnet Sharding (one pipeline per site subnet, in worker processes)
+SHARD_SUBNETS = []  # e.g. ["10.1.0.0/24", "10.2.0.0/24"]; empty = single-process mode
+SHARD_WORKERS = 0  # worker processes (0 = one per subnet, at most one per core)
+SHARD_REPORT_INTERVAL = 1.0  # seconds between aggregate reports from each worker
+SHARD_TICK_INTERVAL = 1.0  # seconds between traffic ticks in a worker
+SHARD_STALE_AFTER = 5.0  # a shard silent this long is reported stale
+SHARD_TOP_K = 10  # top sources kept per shard and in the global view
+SHARD_DISCOVERY_SCANS = 10  # discovery passes per subnet before traffic starts
@@ -0,0 +1,186 @@
+"""
+Coalescing, rate-limited WebSocket fan-out
+"""
+import asyncio
+import itertools
+from collections import OrderedDict
+
+import config
+from core import serialization
+from core.metrics import REGISTRY
+
+EVENTS = REGISTRY.counter("websocket_events_total", "Events published to WebSocket clients by outcome",
+                          ["outcome"])
+FRAMES = REGISTRY.counter("websocket_frames_total", "Batched frames sent by encoding", ["encoding"])
+
+ENCODINGS = {
+    "json": lambda batch: serialization.dumps_text(batch),
+    "msgpack": lambda batch: serialization.dumps_msgpack(batch),
+}
+
+
+class Client:
+    """One connected socket, its negotiated encoding and its backlog while a send is in flight"""
+
+    def __init__(self, websocket, encoding):
+        self.websocket = websocket
+        self.encoding = encoding
+        self.backlog = OrderedDict()  # key -> event, same merge rules as Broadcaster.pending
+        self.dropped = 0
+        self.sending = False
+
+    def merge(self, events):
+        """Fold a batch into the backlog, keeping at most WS_MAX_BACKLOG events"""
+        for key, event in events.items():
+            self.backlog.pop(key, None)
+            self.backlog[key] = event
+        while len(self.backlog) > config.WS_MAX_BACKLOG:
+            self.backlog.popitem(last=False)
+            self.dropped += 1
+            EVENTS.labels("dropped").inc()
+
+
+class Broadcaster:
+    """Buffers published events and sends each client one batch per tick.
+
+    publish() only queues: events with the same key (an entity such as
+    "threat:THR0042") supersede each other, so a burst of updates to one
+    incident reaches clients as its latest state. A flusher task sends
+    everything pending as one {"type": "batch", "events": [...]} frame at
+    most WS_MAX_RATE times a second, encoded once per encoding. A client
+    whose previous send is still in flight gets the batch merged into its
+    own backlog instead, so slow clients never hold up the others; if the
+    backlog overflows, the oldest events are dropped and the next batch
+    carries a "dropped" count telling the client to resync over REST.
+
+    Clients choose JSON text frames or MessagePack binary frames when they
+    connect (see negotiate()). publish() must be called on the event loop.
+    """
+
+    def __init__(self, max_rate=None):
+        self.max_rate = max_rate or config.WS_MAX_RATE
+        self.clients = []
+        self.pending = OrderedDict()
+        self.seq = 0
+        self._ids = itertools.count()
+        self._wake = asyncio.Event()
+        self._task = None
+
+    @staticmethod
+    def negotiate(websocket):
+        """(encoding, subprotocol to accept) from the Sec-WebSocket-Protocol header or ?encoding="""
+        offered = list(websocket.scope.get("subprotocols") or [])
+        wanted = offered or [websocket.query_params.get("encoding", "json")]
+        for name in wanted:
+            if name == "msgpack" and serialization.msgpack is None:
+                continue
+            if name in ENCODINGS:
+                return name, name if name in offered else None
+        return "json", None
+
+    async def connect(self, websocket):
+        """Accept a socket with its negotiated encoding and start sending it batches"""
+        encoding, subprotocol = self.negotiate(websocket)
+        await websocket.accept(subprotocol=subprotocol)
+        client = Client(websocket, encoding)
+        self.clients.append(client)
+        return client
+
+    def disconnect(self, client):
+        if client in self.clients:
+            self.clients.remove(client)
+
+    def publish(self, event, key=None):
+        """Queue an event; a later event with the same key replaces it"""
+        if not self.clients:
+            return
+        if key is None:
+            key = next(self._ids)
+        elif key in self.pending:
+            del self.pending[key]
+            EVENTS.labels("coalesced").inc()
+        self.pending[key] = event
+        EVENTS.labels("published").inc()
+        self._wake.set()
+
+    def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()  # bound to the running loop
+            if self.pending:
+                self._wake.set()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        interval = 1.0 / self.max_rate
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            self.flush()
+            await asyncio.sleep(interval)  # real time: this paces the network, not the simulation
+
+    def flush(self):
+        """Send pending events to every idle client; busy clients keep them in their backlog"""
+        batch, self.pending = self.pending, OrderedDict()
+        frames = {}  # encoding -> frame for clients with no backlog of their own
+        for client in list(self.clients):
+            if client.sending:
+                client.merge(batch)
+                continue
+            if client.backlog:
+                client.merge(batch)
+                events, client.backlog = client.backlog, OrderedDict()
+                frame = self._encode(events, client)
+            elif batch:
+                frame = frames.get(client.encoding)
+                if frame is None:
+                    frame = frames[client.encoding] = self._encode(batch, client)
+            else:
+                continue
+            client.sending = True
+            asyncio.create_task(self._send(client, frame))
+
+    def _encode(self, events, client):
+        self.seq += 1
+        message = {"type": "batch", "seq": self.seq, "events": list(events.values())}
+        if client.dropped:
+            message["dropped"] = client.dropped
+            client.dropped = 0
+        return ENCODINGS[client.encoding](message)
+
+    async def _send(self, client, frame):
+        try:
+            if isinstance(frame, bytes):
+                await asyncio.wait_for(client.websocket.send_bytes(frame), config.WS_SEND_TIMEOUT)
+            else:
+                await asyncio.wait_for(client.websocket.send_text(frame), config.WS_SEND_TIMEOUT)
+            FRAMES.labels(client.encoding).inc()
+        except Exception:
+            self.disconnect(client)
+        finally:
+            client.sending = False
+            if client.backlog:
+                self._wake.set()
+
+    def queued(self):
+        """Events waiting to be sent, across the shared batch and client backlogs"""
+        return len(self.pending) + sum(len(c.backlog) for c in self.clients)
+
+    def get_stats(self):
+        """Get broadcaster statistics"""
+        return {
+            "clients": len(self.clients),
+            "encodings": {name: sum(1 for c in self.clients if c.encoding == name) for name in ENCODINGS},
+            "pending": len(self.pending),
+            "queued": self.queued(),
+            "batches": self.seq,
+            "max_rate": self.max_rate
+        }
@@ -0,0 +1,129 @@
+"""
+Pluggable clock: wall time by default, virtual time for fast simulations
+
+Code that deals in simulated time calls the module functions here
+(clock.now(), clock.time(), clock.sleep(), ...) instead of datetime/time,
+so installing a VirtualClock with set_clock() makes the whole system run
+on simulated time. Measurements of real cost (latency histograms,
+profilers, network timeouts) keep using time.perf_counter and friends.
+"""
+import asyncio
+import threading
+import time as _time
+from datetime import datetime
+
+
+class SystemClock:
+    """Real wall-clock time"""
+
+    virtual = False
+
+    def time(self):
+        return _time.time()
+
+    def monotonic(self):
+        return _time.monotonic()
+
+    def now(self):
+        return datetime.now()
+
+    def sleep(self, seconds):
+        _time.sleep(seconds)
+
+    async def async_sleep(self, seconds):
+        await asyncio.sleep(seconds)
+
+    def wait(self, event, timeout=None):
+        """Wait for a threading.Event, at most `timeout` seconds"""
+        return event.wait(timeout)
+
+
+class VirtualClock(SystemClock):
+    """Simulated time that jumps forward instead of waiting.
+
+    sleep() advances the clock to the sleeper's wake-up time and returns
+    at once, so simulated hours pass as fast as the CPU can run the work
+    in between. With several threads sleeping, time advances to the
+    furthest wake-up; for exact ordering drive the simulation from one
+    thread, e.g. with TickScheduler.run_for().
+    """
+
+    virtual = True
+
+    def __init__(self, start=None):
+        self._now = _time.time() if start is None else float(start)
+        self._lock = threading.Lock()
+
+    def time(self):
+        return self._now
+
+    def monotonic(self):
+        return self._now
+
+    def now(self):
+        return datetime.fromtimestamp(self._now)
+
+    def advance(self, seconds):
+        """Move simulated time forward by `seconds`"""
+        with self._lock:
+            self._now += max(0.0, seconds)
+
+    def advance_to(self, timestamp):
+        """Move simulated time forward to `timestamp` (never backwards)"""
+        with self._lock:
+            self._now = max(self._now, timestamp)
+
+    def sleep(self, seconds):
+        self.advance_to(self._now + max(0.0, seconds))
+        _time.sleep(0)  # still let other threads run
+
+    async def async_sleep(self, seconds):
+        self.advance_to(self._now + max(0.0, seconds))
+        await asyncio.sleep(0)
+
+    def wait(self, event, timeout=None):
+        if timeout is None or event.is_set():
+            return event.wait(timeout)
+        self.sleep(timeout)
+        return event.is_set()
+
+
+_clock = SystemClock()
+
+
+def get_clock():
+    """The clock currently in use"""
+    return _clock
+
+
+def set_clock(clock):
+    """Install a clock for the whole process; returns the previous one"""
+    global _clock
+    previous, _clock = _clock, clock
+    return previous
+
+
+def time():
+    """Current epoch seconds"""
+    return _clock.time()
+
+
+def monotonic():
+    return _clock.monotonic()
+
+
+def now():
+    """Current local datetime"""
+    return _clock.now()
+
+
+def sleep(seconds):
+    _clock.sleep(seconds)
+
+
+async def async_sleep(seconds):
+    await _clock.async_sleep(seconds)
+
+
+def wait(event, timeout=None):
+    return _clock.wait(event, timeout)
@@ -0,0 +1,99 @@
+"""
+Server-Sent Events stream with a resumable replay buffer
+"""
+import asyncio
+
+import config
+from core import serialization
+from core.metrics import REGISTRY
+
+SSE_CLIENTS = REGISTRY.gauge("sse_clients", "Connected Server-Sent Events subscribers")
+SSE_EVENTS = REGISTRY.counter("sse_events_total", "Events appended to the SSE replay buffer")
+
+
+class EventStream:
+    """Fixed-size ring buffer of sequenced, pre-encoded SSE frames.
+
+    publish() numbers each event, encodes its frame once and wakes every
+    subscriber through one shared asyncio.Event, so a publish costs the
+    same with one reader or thousands. A subscriber is just a cursor into
+    the ring: on reconnect it passes the last id it saw (Last-Event-ID)
+    and gets everything after it. If it was away so long that the ring
+    wrapped, it gets a "reset" event with the number of events missed and
+    should reload state over REST. publish() must be called on the event
+    loop.
+    """
+
+    def __init__(self, size=None):
+        self.size = size or config.SSE_BUFFER_SIZE
+        self.ring = [None] * self.size  # seq % size -> (seq, type, frame)
+        self.seq = 0
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+        SSE_CLIENTS.set_function(lambda: self.subscribers)
+
+    def publish(self, event):
+        """Append an event; returns its id"""
+        self.seq += 1
+        kind = str(event.get("type", "message"))
+        data = serialization.dumps(event)
+        frame = b"id: %d\nevent: %s\ndata: %s\n\n" % (self.seq, kind.encode(), data)
+        self.ring[self.seq % self.size] = (self.seq, kind, frame)
+        SSE_EVENTS.inc()
+
+        # Wake everyone waiting on the current event, then hand out a fresh one
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+        return self.seq
+
+    def oldest(self):
+        """Id of the oldest event still in the ring"""
+        return max(1, self.seq - self.size + 1)
+
+    def read(self, cursor, types=None):
+        """(frames after `cursor`, new cursor); a reset frame first if the ring wrapped past it"""
+        frames = []
+        if cursor > self.seq:  # the client saw a previous server's ids
+            frames.append(self._reset(None))
+            return b"".join(frames), self.seq
+        if cursor < self.oldest() - 1:
+            frames.append(self._reset(self.oldest() - 1 - cursor))
+            cursor = self.oldest() - 1
+        for seq in range(cursor + 1, self.seq + 1):
+            _, kind, frame = self.ring[seq % self.size]
+            if types is None or kind in types:
+                frames.append(frame)
+        return b"".join(frames), self.seq
+
+    @staticmethod
+    def _reset(missed):
+        return b"event: reset\ndata: %s\n\n" % serialization.dumps({"missed": missed})
+
+    async def subscribe(self, last_id=None, types=None):
+        """SSE byte chunks: missed events first (after last_id), then live ones as they arrive"""
+        self.subscribers += 1
+        try:
+            yield b"retry: %d\n\n" % config.SSE_RETRY_MS
+            cursor = self.seq if last_id is None else last_id
+            while True:
+                changed = self._changed  # grabbed before reading, so no publish slips between
+                chunk, cursor = self.read(cursor, types)
+                if chunk:
+                    yield chunk
+                    continue
+                try:
+                    await asyncio.wait_for(changed.wait(), config.SSE_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"  # comment line; keeps proxies from closing the stream
+        finally:
+            self.subscribers -= 1
+
+    def get_stats(self):
+        """Get stream statistics"""
+        return {
+            "subscribers": self.subscribers,
+            "last_id": self.seq,
+            "oldest_id": self.oldest() if self.seq else None,
+            "buffered": min(self.seq, self.size),
+            "size": self.size
+        }
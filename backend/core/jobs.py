@@ -0,0 +1,121 @@
+"""
+Background jobs with progress reporting
+"""
+import asyncio
+import itertools
+from collections import OrderedDict
+
+import config
+from core import clock
+from core.metrics import REGISTRY
+
+JOBS = REGISTRY.counter("jobs_total", "Background jobs by kind and outcome", ["kind", "outcome"])
+
+
+class JobManager:
+    """Runs long operations (network scans) as asyncio tasks the request handler doesn't wait on.
+
+    submit() starts a job and returns its record straight away; if a job
+    of the same kind is already running, that job is returned instead, so
+    a burst of identical requests shares one run. The work coroutine gets
+    a progress(dict) callback; each call updates the job record and is
+    handed to `notify` as a "job_progress" event keyed by job id, so
+    WebSocket clients only see the latest progress per batch. Jobs are
+    plain dicts; the last JOB_HISTORY finished ones are kept for lookup.
+    submit() must be called on the event loop.
+    """
+
+    def __init__(self, notify=None, history=None):
+        self.notify = notify
+        self.history = history or config.JOB_HISTORY
+        self.jobs = OrderedDict()  # id -> job, oldest first
+        self.running = {}  # kind -> id of the job in flight
+        self.tasks = {}
+        self._ids = itertools.count(1)
+
+    def submit(self, kind, work, **params):
+        """(job, created): a new job running work(progress, **params), or the running one of this kind"""
+        if kind in self.running:
+            JOBS.labels(kind, "deduplicated").inc()
+            return self.jobs[self.running[kind]], False
+
+        job = {
+            'id': f"{kind}_{next(self._ids):04d}",
+            'kind': kind,
+            'status': "running",
+            'params': params,
+            'progress': {},
+            'result': None,
+            'error': None,
+            'created': clock.now().isoformat(),
+            'finished': None
+        }
+        self.jobs[job['id']] = job
+        self.running[kind] = job['id']
+        self.tasks[job['id']] = asyncio.create_task(self._run(job, work, params))
+        self._trim()
+        return job, True
+
+    async def _run(self, job, work, params):
+        def progress(update):
+            job['progress'] = update
+            self._notify(job, "job_progress")
+
+        try:
+            job['result'] = await work(progress, **params)
+            job['status'] = "completed"
+        except asyncio.CancelledError:
+            job['status'] = "cancelled"
+            raise
+        except Exception as e:
+            job['status'] = "failed"
+            job['error'] = str(e)
+            print(f"❌ Job {job['id']} failed: {e}")
+        finally:
+            job['finished'] = clock.now().isoformat()
+            self.running.pop(job['kind'], None)
+            self.tasks.pop(job['id'], None)
+            JOBS.labels(job['kind'], job['status']).inc()
+            self._notify(job, "job_" + job['status'])
+
+    def _notify(self, job, event_type):
+        if self.notify is not None:
+            self.notify({"type": event_type, "job": job}, key=f"job:{job['id']}")
+
+    def _trim(self):
+        """Forget the oldest finished jobs beyond the history size"""
+        finished = [job_id for job_id, job in self.jobs.items() if job['finished']]
+        for job_id in finished[:max(0, len(self.jobs) - self.history)]:
+            del self.jobs[job_id]
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def list(self, kind=None):
+        """Jobs newest first"""
+        return [job for job in reversed(self.jobs.values()) if kind is None or job['kind'] == kind]
+
+    async def wait(self, job_id):
+        """Wait for a job to finish; returns its record"""
+        task = self.tasks.get(job_id)
+        if task is not None:
+            await asyncio.wait([task])
+        return self.jobs.get(job_id)
+
+    async def stop(self):
+        """Cancel jobs still running"""
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def get_stats(self):
+        """Get job statistics"""
+        statuses = {}
+        for job in self.jobs.values():
+            statuses[job['status']] = statuses.get(job['status'], 0) + 1
+        return {
+            'running': dict(self.running),
+            'jobs': len(self.jobs),
+            'by_status': statuses
+        }
@@ -0,0 +1,260 @@
+"""
+Low-overhead metrics registry with Prometheus text exposition
+"""
+import threading
+import weakref
+from bisect import bisect_left
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Owner:
+    """Lives in a thread's local storage; freed when the thread exits"""
+    __slots__ = ('__weakref__',)
+
+
+class _Shards:
+    """One mutable cell per live thread, plus a base cell for exited threads.
+
+    A thread only ever writes its own cell, so updates need no lock and
+    never contend; readers merge the cells at scrape time. When a thread
+    exits, its cell is folded into the base cell and dropped, so servers
+    that start a thread per request don't grow the list. The lock only
+    orders folds against reads; updates never take it.
+    """
+
+    def __init__(self, factory, merge):
+        self.factory = factory
+        self.merge = merge  # merge(into, cell) adds cell's counts to into
+        self.base = factory()
+        self.cells = []
+        self.lock = threading.Lock()
+        self._local = threading.local()
+
+    def local(self):
+        try:
+            return self._local.cell
+        except AttributeError:
+            return self._new_cell()
+
+    def _new_cell(self):
+        cell = self.factory()
+        owner = _Owner()
+        weakref.finalize(owner, self._fold, cell)
+        with self.lock:
+            self.cells.append(cell)
+        self._local.cell = cell
+        self._local.owner = owner
+        return cell
+
+    def _fold(self, cell):
+        with self.lock:
+            self.merge(self.base, cell)
+            self.cells.remove(cell)
+
+    def total(self):
+        """A new cell holding the sum of every thread's counts"""
+        total = self.factory()
+        with self.lock:
+            self.merge(total, self.base)
+            for cell in self.cells:
+                self.merge(total, cell)
+        return total
+
+
+def _merge_counts(into, cell):
+    into[0] += cell[0]
+
+
+def _merge_histogram(into, cell):
+    counts = into[0]
+    for i, count in enumerate(cell[0]):
+        counts[i] += count
+    into[1] += cell[1]
+
+
+class _CounterChild:
+    def __init__(self):
+        self.shards = _Shards(lambda: [0], _merge_counts)
+
+    def inc(self, amount=1):
+        self.shards.local()[0] += amount
+
+    def value(self):
+        return self.shards.total()[0]
+
+
+class _GaugeChild:
+    def __init__(self):
+        self._value = 0
+        self._function = None
+
+    def set(self, value):
+        self._value = value
+
+    def set_function(self, function):
+        """Evaluate `function` at scrape time instead of on the hot path"""
+        self._function = function
+
+    def value(self):
+        if self._function is not None:
+            try:
+                return self._function()
+            except Exception:
+                return float('nan')
+        return self._value
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.shards = _Shards(lambda: [[0] * (len(buckets) + 1), 0.0], _merge_histogram)
+
+    def observe(self, value):
+        cell = self.shards.local()
+        cell[0][bisect_left(self.buckets, value)] += 1
+        cell[1] += value
+
+    def snapshot(self):
+        """(cumulative bucket counts, count, sum)"""
+        counts, total = self.shards.total()
+        cumulative, running = [], 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, running, total
+
+
+class Metric:
+    """A named metric family; children are cached per label values"""
+
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+        if not self.labelnames:
+            self._default = self.children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """Child for the given label values (positional, in labelnames order)"""
+        child = self.children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self.children.setdefault(values, self._new_child())
+        return child
+
+    def _label_text(self, values, extra=()):
+        pairs = list(zip(self.labelnames, values)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{k}="{_escape(str(v))}"' for k, v in pairs) + '}'
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self.children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{self._label_text(values)} {child.value()}"]
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._default.set(value)
+
+    def set_function(self, function):
+        self._default.set_function(function)
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{self._label_text(values)} {child.value()}"]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def _render_child(self, values, child):
+        cumulative, count, total = child.snapshot()
+        lines = []
+        for bound, running in zip(self.buckets + (float('inf'),), cumulative):
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f"{self.name}_bucket{self._label_text(values, [('le', le)])} {running}")
+        lines.append(f"{self.name}_sum{self._label_text(values)} {total}")
+        lines.append(f"{self.name}_count{self._label_text(values)} {count}")
+        return lines
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsRegistry:
+    """Get-or-create registry, so modules can declare the metrics they update"""
+
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, documentation, labelnames, **kwargs):
+        metric = self.metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self.metrics.get(name)
+                if metric is None:
+                    metric = self.metrics[name] = cls(name, documentation, labelnames, **kwargs)
+        if not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} already registered as {metric.kind}")
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self):
+        """Prometheus text exposition format (0.0.4)"""
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry shared by the agents, simulators and web servers
+REGISTRY = MetricsRegistry()
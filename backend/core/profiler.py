@@ -0,0 +1,176 @@
+"""
+Event-loop lag monitor and on-demand sampling profiler
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+import config
+from core.metrics import REGISTRY
+
+LOOP_LAG = REGISTRY.histogram("event_loop_lag_seconds", "Delay between scheduled and actual heartbeat",
+                              buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+LOOP_STALLS = REGISTRY.counter("event_loop_stalls_total", "Event-loop stalls longer than the lag threshold")
+
+
+def _frame_label(frame):
+    """`path:function`, with paths relative to the backend for app code"""
+    filename = frame.f_code.co_filename
+    if filename.startswith(config.BASE_DIR):
+        filename = os.path.relpath(filename, config.BASE_DIR)
+    else:
+        filename = os.path.basename(filename)
+    return f"{filename}:{frame.f_code.co_name}"
+
+
+def _stack(frame):
+    """Frames of a stack, outermost first"""
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+
+def _in_app(frame):
+    filename = frame.f_code.co_filename
+    return filename.startswith(config.BASE_DIR) and filename != __file__
+
+
+class LoopLagMonitor:
+    """Detects event-loop stalls and captures the code that caused them.
+
+    A heartbeat coroutine wakes every `interval` seconds and records how
+    late it ran. A watchdog thread checks the heartbeat; once it is older
+    than `threshold` the loop is blocked, so the watchdog grabs the loop
+    thread's current stack - the blocking handler is on it. The stall's
+    full duration is filled in when the heartbeat runs again.
+    """
+
+    def __init__(self, interval=None, threshold=None, history=None):
+        self.interval = interval or config.LOOP_LAG_INTERVAL
+        self.threshold = threshold or config.LOOP_LAG_THRESHOLD
+        self.stalls = deque(maxlen=history or config.LOOP_LAG_HISTORY)
+        self.max_lag = 0.0
+        self.last_beat = None
+        self.loop_thread = None
+        self.pending = None  # stall captured by the watchdog, not yet finished
+        self.running = False
+        self.task = None
+
+    def start(self):
+        """Start monitoring the running loop (call from inside it)"""
+        if self.running:
+            return
+        self.running = True
+        self.loop_thread = threading.get_ident()
+        self.last_beat = time.perf_counter()
+        self.task = asyncio.get_running_loop().create_task(self._heartbeat())
+        threading.Thread(target=self._watchdog, name="loop-lag-watchdog", daemon=True).start()
+
+    def stop(self):
+        self.running = False
+        if self.task is not None:
+            self.task.cancel()
+
+    async def _heartbeat(self):
+        while self.running:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            lag = max(0.0, now - expected)
+            self.last_beat = now
+            self.max_lag = max(self.max_lag, lag)
+            LOOP_LAG.observe(lag)
+
+            stall = self.pending
+            if stall is not None:
+                stall['duration'] = round(lag, 4)
+                self.pending = None
+
+    def _watchdog(self):
+        while self.running:
+            time.sleep(self.interval / 2)
+            blocked_for = time.perf_counter() - self.last_beat - self.interval
+            if blocked_for > self.threshold and self.pending is None:
+                self._capture(blocked_for)
+
+    def _capture(self, blocked_for):
+        """Record the loop thread's stack while it is still blocked"""
+        frame = sys._current_frames().get(self.loop_thread)
+        if frame is None:
+            return
+        frames = _stack(frame)
+        app_frames = [f for f in frames if _in_app(f)]
+        stall = {
+            'timestamp': datetime.now().isoformat(),
+            'duration': round(blocked_for, 4),  # replaced by the full stall once the loop recovers
+            'handler': _frame_label(app_frames[0]) if app_frames else None,
+            'location': f"{_frame_label(app_frames[-1])}:{app_frames[-1].f_lineno}" if app_frames else None,
+            'stack': [f"{_frame_label(f)}:{f.f_lineno}" for f in frames]
+        }
+        self.pending = stall
+        self.stalls.append(stall)
+        LOOP_STALLS.inc()
+
+    def get_stats(self):
+        """Get loop lag statistics and the most recent stalls"""
+        return {
+            'running': self.running,
+            'interval': self.interval,
+            'threshold': self.threshold,
+            'max_lag': round(self.max_lag, 4),
+            'heartbeat_age': round(time.perf_counter() - self.last_beat, 4) if self.last_beat else None,
+            'stalls': list(self.stalls)
+        }
+
+
+class SamplingProfiler:
+    """Samples every thread's stack at a fixed interval and folds the stacks.
+
+    The output is the "folded" format (one `frame;frame;frame count` line
+    per unique stack) that flamegraph.pl, speedscope and inferno read
+    directly. Only one profile runs at a time.
+    """
+
+    def __init__(self, sample_interval=None):
+        self.sample_interval = sample_interval or config.PROFILER_SAMPLE_INTERVAL
+        self.lock = threading.Lock()
+
+    @property
+    def busy(self):
+        return self.lock.locked()
+
+    def profile(self, seconds):
+        """Sample for `seconds` (blocking; run it off the event loop); returns folded stack counts"""
+        if not self.lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        try:
+            own = threading.get_ident()
+            names = {}
+            stacks = Counter()
+            samples = 0
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    if ident not in names:
+                        names = {t.ident: t.name for t in threading.enumerate()}
+                    thread = names.get(ident, str(ident)).replace(';', '_').replace(' ', '_')
+                    stacks[';'.join([thread] + [_frame_label(f) for f in _stack(frame)])] += 1
+                samples += 1
+                time.sleep(self.sample_interval)
+            return {'seconds': seconds, 'samples': samples, 'stacks': stacks}
+        finally:
+            self.lock.release()
+
+    @staticmethod
+    def folded(result):
+        """Render a profile as flamegraph-ready folded text"""
+        return ''.join(f"{stack} {count}\n" for stack, count in result['stacks'].most_common())
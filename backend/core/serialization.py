@@ -0,0 +1,92 @@
+"""
+Fast JSON serialization with a cache of pre-encoded payloads
+"""
+import json
+from collections.abc import Mapping
+
+try:
+    import orjson
+except ImportError:  # optional: fall back to the standard library encoder
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional: binary WebSocket frames are only offered when it is installed
+    msgpack = None
+
+if orjson is not None:
+    # Records are dataclasses; route them through to_dict() so the JSON shape stays the API's
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATACLASS
+
+
+def _default(obj):
+    """Encode types the JSON encoders do not know about"""
+    if hasattr(obj, 'to_dict'):
+        return obj.to_dict()
+    if isinstance(obj, Mapping):  # read-only snapshots (mappingproxy)
+        return dict(obj)
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj):
+    """Encode to compact JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+    return json.dumps(obj, default=_default, separators=(',', ':')).encode()
+
+
+def dumps_text(obj):
+    """Encode to a JSON str (for text WebSocket frames)"""
+    return dumps(obj).decode()
+
+
+def dumps_msgpack(obj):
+    """Encode to MessagePack bytes (binary WebSocket frames); requires msgpack"""
+    return msgpack.packb(obj, default=_default)
+
+
+class EncodedCache:
+    """Pre-encoded JSON bytes per key, rebuilt only after the key is invalidated.
+
+    Writers call invalidate() when the data behind a key changes; readers
+    call get() with a builder that is only run on a miss, so unchanged
+    collections are served without building or encoding anything.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, build):
+        """Cached bytes for `key`, encoding build() on a miss"""
+        payload = self.entries.get(key)
+        if payload is None:
+            payload = dumps(build())
+            self.entries[key] = payload
+            self.misses += 1
+        else:
+            self.hits += 1
+        return payload
+
+    def invalidate(self, *keys):
+        """Drop the given keys, or everything when called without keys"""
+        if not keys:
+            self.entries.clear()
+        for key in keys:
+            self.entries.pop(key, None)
+
+    def get_stats(self):
+        """Get cache statistics"""
+        return {
+            'entries': len(self.entries),
+            'bytes': sum(len(p) for p in self.entries.values()),
+            'hits': self.hits,
+            'misses': self.misses
+        }
@@ -0,0 +1,277 @@
+"""
+Subnet sharding - per-site pipelines in worker processes, merged by a coordinator
+
+Usage (from backend/):
+    python -m core.sharding --subnets 10.1.0.0/24 10.2.0.0/24 --seconds 30 --flat-out
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import Counter
+from multiprocessing.connection import wait
+
+import config
+from core.metrics import REGISTRY
+
+SHARD_REPORTS = REGISTRY.counter("shard_reports_total", "Aggregate reports received from shard workers", ["shard"])
+SHARD_STALE = REGISTRY.gauge("shard_stale", "Shard workers whose last report is older than SHARD_STALE_AFTER")
+
+
+def assign_subnets(subnets, workers):
+    """Round-robin subnets over `workers` processes (no process gets none)"""
+    workers = max(1, min(workers, len(subnets)))
+    return [subnets[i::workers] for i in range(workers)]
+
+
+class ShardPipeline:
+    """Discovery, traffic and detection for one subnet, inside a shard worker"""
+
+    def __init__(self, subnet, archive=True):
+        from agents.discovery_agent import DiscoveryAgent
+        from agents.threat_detector import ThreatDetector
+        from database.traffic_archive import SHARD_DIR, TrafficArchive
+        from simulation.network_simulator import NetworkSimulator
+
+        self.subnet = subnet
+        self.discovery = DiscoveryAgent(mode="simulated", network=subnet)
+        for _ in range(config.SHARD_DISCOVERY_SCANS):
+            self.discovery.scan_network()
+        # Each subnet archives to its own directory: archive retention assumes a single writer
+        directory = os.path.join(config.ARCHIVE_DIR, SHARD_DIR, subnet.replace('/', '_'))
+        self.network = NetworkSimulator(archive=TrafficArchive(directory) if archive else None)
+        for device in self.discovery.devices:
+            self.network.add_device(device)
+        self.detector = ThreatDetector()
+        self.counts = {'packets': 0, 'bytes': 0, 'suspicious': 0, 'incidents': 0}
+        self.incident_types = Counter()
+
+    def step(self):
+        """One traffic tick through detection; returns the number of records"""
+        records = self.network.simulate_tick()
+        counts = self.counts
+        for record in records:
+            counts['packets'] += 1
+            counts['bytes'] += record.bytes
+            if record.is_suspicious:
+                counts['suspicious'] += 1
+            incident = self.detector.analyze_traffic(record)
+            if incident is not None and incident.get('count') == 1:
+                counts['incidents'] += 1
+                self.incident_types[incident['type']] += 1
+        return len(records)
+
+    def close(self):
+        if self.network.archive is not None:
+            self.network.archive.flush()
+
+
+def run_shard(shard_id, subnets, reports, stop, interval, tick_interval, archive):
+    """Worker process: run every assigned subnet's pipeline and report cumulative aggregates"""
+    try:
+        _run_pipelines(shard_id, subnets, reports, stop, interval, tick_interval, archive)
+    finally:
+        reports.close()
+
+
+def _run_pipelines(shard_id, subnets, reports, stop, interval, tick_interval, archive):
+    pipelines = [ShardPipeline(subnet, archive) for subnet in subnets]
+    started = time.monotonic()
+    next_report = started
+    seq = 0
+    try:
+        while not stop.is_set():
+            for pipeline in pipelines:
+                pipeline.step()
+            now = time.monotonic()
+            if now >= next_report:
+                seq += 1
+                reports.send(shard_report(shard_id, pipelines, seq, now - started))
+                next_report = now + interval
+            if tick_interval:
+                stop.wait(tick_interval)
+    finally:
+        for pipeline in pipelines:
+            pipeline.close()
+        reports.send(shard_report(shard_id, pipelines, seq + 1, time.monotonic() - started, final=True))
+
+
+def shard_report(shard_id, pipelines, seq, uptime, final=False):
+    """Cumulative totals for one worker, so a lost or late report only delays the view"""
+    totals = Counter()
+    incident_types = Counter()
+    sources = Counter()
+    open_incidents = devices = 0
+    for pipeline in pipelines:
+        totals.update(pipeline.counts)
+        incident_types.update(pipeline.incident_types)
+        sources.update(dict(pipeline.network.sketch.top_sources(config.SHARD_TOP_K)))
+        open_incidents += len(pipeline.detector.correlator.open_incidents)
+        devices += len(pipeline.discovery.inventory)
+    return {
+        'shard': shard_id,
+        'pid': os.getpid(),
+        'subnets': [pipeline.subnet for pipeline in pipelines],
+        'seq': seq,
+        'final': final,
+        'sent_at': time.time(),
+        'uptime': uptime,
+        'devices': devices,
+        'open_incidents': open_incidents,
+        'rate': totals['packets'] / uptime if uptime else 0.0,
+        **{key: totals[key] for key in ('packets', 'bytes', 'suspicious', 'incidents')},
+        'incident_types': dict(incident_types),
+        'top_sources': sources.most_common(config.SHARD_TOP_K)
+    }
+
+
+class ShardCoordinator:
+    """Starts one worker process per group of subnets and merges their reports into a global view.
+
+    Workers share nothing: each runs its own discovery, traffic and
+    detection for its subnets and every SHARD_REPORT_INTERVAL sends a
+    small cumulative report down its own pipe (no lock shared between
+    workers). A collector thread waits on all pipes at once and keeps
+    only the latest report per shard; global_view() merges those on
+    demand. The coordinator never waits on any one shard, so a slow or
+    stuck shard just shows up as stale with its last known numbers while
+    the rest keep reporting.
+    """
+
+    def __init__(self, subnets=None, workers=None, interval=None, tick_interval=None, archive=None):
+        self.subnets = list(subnets or config.SHARD_SUBNETS)
+        self.workers = workers or config.SHARD_WORKERS or min(len(self.subnets), os.cpu_count() or 1)
+        self.interval = interval or config.SHARD_REPORT_INTERVAL
+        self.tick_interval = config.SHARD_TICK_INTERVAL if tick_interval is None else tick_interval
+        self.archive = config.ARCHIVE_ENABLED if archive is None else archive
+        self.assignments = assign_subnets(self.subnets, self.workers) if self.subnets else []
+        self.latest = {}  # shard id -> last report
+        self.received = {}  # shard id -> monotonic time of that report
+        self.processes = []
+        self._context = multiprocessing.get_context('spawn')
+        self._collector = None
+        self._running = False
+        SHARD_STALE.set_function(lambda: sum(1 for shard in self.shards() if shard['stale']))
+        if self.subnets:
+            print(f"🧩 Shard Coordinator: {len(self.subnets)} subnets over {len(self.assignments)} workers")
+
+    def start(self):
+        if self._running or not self.assignments:
+            return
+        self._running = True
+        self.stop_event = self._context.Event()
+        self.processes = []
+        self.pipes = {}  # read end -> shard id
+        for shard_id, subnets in enumerate(self.assignments):
+            reader, writer = self._context.Pipe(duplex=False)
+            process = self._context.Process(
+                target=run_shard, name=f"shard-{shard_id}", daemon=True,
+                args=(shard_id, subnets, writer, self.stop_event, self.interval, self.tick_interval,
+                      self.archive))
+            process.start()
+            writer.close()  # the worker holds the only write end, so its exit closes the pipe
+            self.pipes[reader] = shard_id
+            self.processes.append(process)
+        self._collector = threading.Thread(target=self._collect, name="shard-collector", daemon=True)
+        self._collector.start()
+
+    def _collect(self):
+        while self._running and self.pipes:
+            for reader in wait(list(self.pipes), timeout=0.5):
+                try:
+                    report = reader.recv()
+                except (EOFError, OSError):  # the worker exited
+                    del self.pipes[reader]
+                    reader.close()
+                    continue
+                self.latest[report['shard']] = report
+                self.received[report['shard']] = time.monotonic()
+                SHARD_REPORTS.labels(str(report['shard'])).inc()
+
+    def stop(self, timeout=10):
+        """Ask workers to finish, wait for their final reports, then stop collecting"""
+        if not self._running:
+            return
+        self.stop_event.set()
+        deadline = time.monotonic() + timeout
+        for process in self.processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+        # The collector drains each pipe (final report included) until the worker's end closes
+        self._collector.join(max(0.1, deadline - time.monotonic()))
+        self._running = False
+
+    def shards(self):
+        """Per-shard status from the latest reports"""
+        now = time.monotonic()
+        result = []
+        for shard_id, subnets in enumerate(self.assignments):
+            report = self.latest.get(shard_id)
+            age = now - self.received[shard_id] if report else None
+            process = self.processes[shard_id] if shard_id < len(self.processes) else None
+            result.append({
+                'shard': shard_id,
+                'subnets': subnets,
+                'alive': process is not None and process.is_alive(),
+                'reports': report['seq'] if report else 0,
+                'age': age,
+                'stale': report is None or (not report['final'] and age > config.SHARD_STALE_AFTER),
+                'packets': report['packets'] if report else 0,
+                'rate': report['rate'] if report else 0.0
+            })
+        return result
+
+    def global_view(self, top_k=None):
+        """Totals, incident types and top sources across every shard that has reported"""
+        top_k = top_k or config.SHARD_TOP_K
+        reports = list(self.latest.values())
+        totals = Counter()
+        incident_types = Counter()
+        sources = Counter()
+        for report in reports:
+            totals.update({key: report[key] for key in
+                           ('packets', 'bytes', 'suspicious', 'incidents', 'devices', 'open_incidents')})
+            incident_types.update(report['incident_types'])
+            sources.update(dict(report['top_sources']))
+        shards = self.shards()
+        return {
+            'subnets': len(self.subnets),
+            'shards': len(self.assignments),
+            'reporting': len(reports),
+            'stale': sum(1 for shard in shards if shard['stale']),
+            'rate': sum(report['rate'] for report in reports),
+            **{key: totals[key] for key in ('packets', 'bytes', 'suspicious', 'incidents', 'devices',
+                                            'open_incidents')},
+            'incident_types': dict(incident_types.most_common()),
+            'top_sources': sources.most_common(top_k),
+            'per_shard': shards
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run subnet shards and print the merged view")
+    parser.add_argument('--subnets', nargs='+', default=None)
+    parser.add_argument('--sites', type=int, default=4, help="generate 10.N.0.0/24 subnets when --subnets is not given")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--flat-out', action='store_true', help="no pause between ticks (throughput test)")
+    parser.add_argument('--archive', action='store_true', help="archive shard traffic to disk")
+    args = parser.parse_args()
+
+    subnets = args.subnets or [f"10.{i + 1}.0.0/24" for i in range(args.sites)]
+    coordinator = ShardCoordinator(subnets, args.workers, tick_interval=0 if args.flat_out else None,
+                                   archive=args.archive)
+    coordinator.start()
+    time.sleep(args.seconds)
+    coordinator.stop()
+    view = coordinator.global_view()
+    print(json.dumps(view, indent=2))
+    print(f"{view['packets']:,} records through {view['shards']} workers in {args.seconds:.0f}s "
+          f"({view['rate']:,.0f} records/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Versioned change feed for snapshot + long-poll clients
+"""
+import asyncio
+import secrets
+from collections import deque
+
+import config
+from core import clock
+
+
+class ChangeFeed:
+    """A version number that moves on every store mutation, plus a bounded log of what changed.
+
+    Writers call mark() with a collection name and the ids they touched
+    (or no ids when the whole collection was replaced). Readers ask
+    changes_since(version) for the ids changed after the version they hold
+    and build a delta from just those records; a version older than the
+    log gets None, meaning "reload the snapshot". Versions restart at 0
+    with every process, so each feed also has a random epoch: a client
+    holding another epoch's version must reload too. wait() parks long-poll
+    requests on one shared asyncio.Event that every mark() swaps, so
+    thousands of waiting clients cost one wake-up. Marks must happen on
+    the event loop.
+    """
+
+    def __init__(self, size=None):
+        self.epoch = secrets.token_hex(4)  # which process's versions these are
+        self.version = 0
+        self.log = deque(maxlen=size or config.CHANGE_LOG_SIZE)  # (version, collection, ids or None)
+        self.updated_at = clock.time()
+        self._changed = asyncio.Event()
+
+    def mark(self, collection, ids=None):
+        """Record a change; ids=None means the whole collection changed"""
+        self.version += 1
+        self.log.append((self.version, collection, None if ids is None else frozenset(ids)))
+        self.updated_at = clock.time()
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def changes_since(self, since, epoch=None):
+        """{collection: set of ids, or None for everything}; None if `since` is no longer covered"""
+        if epoch is not None and epoch != self.epoch:
+            return None  # a version from another process
+        if since > self.version:
+            return None  # a version from before a restart
+        if since < self.version and (not self.log or self.log[0][0] > since + 1):
+            return None
+        changes = {}
+        for version, collection, ids in reversed(self.log):
+            if version <= since:
+                break
+            if ids is None or changes.get(collection, set()) is None:
+                changes[collection] = None
+            else:
+                changes.setdefault(collection, set()).update(ids)
+        return changes
+
+    async def wait(self, since, timeout):
+        """Return once the version is past `since`, or after `timeout` seconds"""
+        if self.version != since:
+            return
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def get_stats(self):
+        """Get change feed statistics"""
+        return {
+            'epoch': self.epoch,
+            'version': self.version,
+            'logged': len(self.log),
+            'oldest_version': self.log[0][0] if self.log else None,
+            'updated_at': self.updated_at
+        }
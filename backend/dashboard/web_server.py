@@ -1,12 +1,34 @@
 """
 Web Dashboard Server
 """
-from flask import Flask, render_template, jsonify
+from flask import Flask, Response, g, render_template, jsonify, request
+from flask.json.provider import DefaultJSONProvider
 import json
-from datetime import datetime
-import random
+import time
+
+from core import clock, serialization
+from core.metrics import REGISTRY, CONTENT_TYPE
+
+REQUEST_LATENCY = REGISTRY.histogram("http_request_duration_seconds", "HTTP request latency by route",
+                                     ["server", "method", "route"])
+REQUEST_COUNT = REGISTRY.counter("http_requests_total", "HTTP requests by route and status",
+                                 ["server", "method", "route", "status"])
+STORE_SIZE = REGISTRY.gauge("store_records", "Records currently held per store", ["store"])
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """jsonify() through orjson, building the response body as bytes directly"""
+
+    def dumps(self, obj, **kwargs):
+        return serialization.dumps_text(obj)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(serialization.dumps(obj), mimetype=self.mimetype)
+
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 
 # Initialize agents
 from agents.discovery_agent import DiscoveryAgent
@@ -14,22 +36,116 @@ from agents.threat_detector import ThreatDetector
 from agents.deception_agent import DeceptionAgent
 from agents.defense_agent import DefenseAgent
 from simulation.iot_simulator import IoTDeviceSimulator
+from simulation.fleet_simulator import FleetSimulator
+from simulation.network_simulator import NetworkSimulator
+from database.traffic_archive import TrafficArchive
+from simulation.scheduler import TickScheduler
 from models.risk_scorer import RiskScorer
+from models.checkpoint import CheckpointStore
+from models.training_service import TrainingService
+from database.records import Status
+from database.threat_intel import FeedCompiler
+import config
 
 discovery = DiscoveryAgent()
 threat_detector = ThreatDetector()
 deception = DeceptionAgent()
 defense = DefenseAgent()
-iot_sim = IoTDeviceSimulator(num_devices=8)
+iot_sim = FleetSimulator(config.FLEET_SIZE) if config.FLEET_SIZE else IoTDeviceSimulator(num_devices=8)
 risk_scorer = RiskScorer()
+# Traffic between the simulated devices, archived as it is generated and fed to the detector
+network = NetworkSimulator(archive=TrafficArchive() if config.ARCHIVE_ENABLED else None)
+for device in iot_sim.get_devices(limit=config.FLEET_PAGE_SIZE):
+    network.add_device(device)
+# Retrains the detector's models on that archive in a worker process and swaps them in when ready;
+# starts from the last checkpoint so trained models are live immediately after a restart
+training = TrainingService(threat_detector, archive=network.archive, checkpoints=CheckpointStore())
+risk_scorer.device_risks.update(training.restored_state.get('device_risks', {}))
+scheduler = TickScheduler()
+# Recompiles the threat-intel table off the traffic path; started by run.py with the scheduler
+intel_compiler = FeedCompiler()
+
+STORE_SIZE.labels('dashboard_devices').set_function(lambda: len(iot_sim))
+STORE_SIZE.labels('detector_threats').set_function(lambda: len(threat_detector.threats))
+STORE_SIZE.labels('defense_actions').set_function(lambda: len(defense.actions))
+STORE_SIZE.labels('inventory').set_function(lambda: len(discovery.inventory))
+
+# Simulators and agents only change on the scheduler thread; each tick
+# publishes a frozen snapshot that the handlers below read without locks
+def devices_tick():
+    iot_sim.simulate_activity()
+    devices = []
+    # A large fleet is scored and published one page per tick; counts cover the whole fleet
+    for device in iot_sim.get_devices(limit=config.FLEET_PAGE_SIZE):
+        risk = risk_scorer.calculate_risk(device)
+        devices.append({**device, 'risk_score': risk['score'], 'risk_level': risk['level']})
+    return {'devices': devices, 'device_counts': iot_sim.get_status_counts()}
+
+def traffic_tick():
+    for record in network.simulate_tick():
+        threat_detector.analyze_traffic(record)
+
+def threats_tick():
+    return {'threats': threat_detector.get_recent_threats(20)}
+
+def defense_tick():
+    defense.simulate_defense()
+    return {'defense': defense.get_defense_status()}
+
+def deception_tick():
+    alerts = deception.check_interactions()
+    return {'deception': deception.get_status(), 'honeypot_alerts': alerts[-5:]}
+
+def scan_state():
+    """Last scan diff plus (changed in scan, device) pairs for ?since= queries"""
+    inventory = discovery.inventory
+    return {
+        'scan_diff': inventory.last_diff,
+        'inventory': [(inventory.changed_in[key], record) for key, record in inventory.by_mac.items()]
+    }
+
+def run_scan():
+    """Manual scan, run on the scheduler thread via scheduler.call(); returns its frozen diff"""
+    discovery.scan_network()
+    scheduler.publish(scan_state())
+    return scheduler.snapshot['scan_diff']
+
+scheduler.add_job('traffic', traffic_tick, config.TICK_RATES['traffic'], publish=False)
+scheduler.add_job('devices', devices_tick, config.TICK_RATES['devices'])
+scheduler.add_job('threats', threats_tick, config.TICK_RATES['threats'])
+scheduler.add_job('defense', defense_tick, config.TICK_RATES['defense'])
+scheduler.add_job('deception', deception_tick, config.TICK_RATES['deception'])
+scheduler.add_job('training', training.tick, config.MODEL_UPDATE_INTERVAL, publish=False)
+scheduler.add_job('checkpoint', lambda: training.checkpoint({'device_risks': risk_scorer.device_risks}),
+                  config.CHECKPOINT_INTERVAL, publish=False)
+scheduler.publish(scan_state())
 
 # Global stats
 system_stats = {
-    'start_time': datetime.now().strftime("%H:%M:%S"),
+    'start_time': clock.now().strftime("%H:%M:%S"),
     'total_scans': 0,
     'total_threats': 0
 }
 
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Per-route latency and status counts, labelled by the URL rule"""
+    started = g.pop('request_started', None)
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    if started is not None:
+        REQUEST_LATENCY.labels('dashboard', request.method, route).observe(time.perf_counter() - started)
+    REQUEST_COUNT.labels('dashboard', request.method, route, str(response.status_code)).inc()
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text exposition of the runtime metrics"""
+    return Response(REGISTRY.render(), mimetype=CONTENT_TYPE)
+
 @app.route('/')
 def index():
     """Main dashboard page"""
@@ -41,91 +157,93 @@ def get_dashboard():
     # Update stats
     system_stats['total_scans'] += 1
     
-    # Get device data
-    devices = iot_sim.get_devices()
-    
-    # Calculate risks for devices
-    for device in devices:
-        risk = risk_scorer.calculate_risk(device)
-        device['risk_score'] = risk['score']
-        device['risk_level'] = risk['level']
-    
-    # Get threats
-    threats = threat_detector.get_recent_threats(5)
-    system_stats['total_threats'] = len(threats)
-    
-    # Get deception status
-    deception_status = deception.get_status()
-    
-    # Get defense status
-    defense_status = defense.get_defense_status()
+    # One consistent view of the last published tick
+    snapshot = scheduler.snapshot
+    devices = snapshot.get('devices', ())
+    counts = snapshot.get('device_counts', {})
+    threats = snapshot.get('threats', ())[-5:]
+    honeypot_alerts = snapshot.get('honeypot_alerts', ())
     
     # Calculate summary
     high_risk = len([d for d in devices if d.get('risk_score', 0) > 0.7])
     medium_risk = len([d for d in devices if 0.4 <= d.get('risk_score', 0) <= 0.7])
     low_risk = len([d for d in devices if d.get('risk_score', 0) < 0.4])
     
-    # Simulate a threat detection occasionally
-    if random.random() < 0.3:  # 30% chance
-        threat_detector.analyze_traffic()
-    
-    # Simulate defense action occasionally
-    if random.random() < 0.2:  # 20% chance
-        defense.simulate_defense()
-    
-    # Check honeypots
-    honeypot_alerts = deception.check_interactions()
-    
     return jsonify({
         'status': 'active',
-        'system': system_stats,
+        'system': {**system_stats, 'total_threats': len(threats), 'tick': snapshot['version']},
         'devices': {
-            'total': len(devices),
-            'online': len([d for d in devices if d.get('status') == 'Online']),
+            'total': counts.get('total', 0),
+            'online': counts.get('Online', 0),
             'high_risk': high_risk,
             'medium_risk': medium_risk,
             'low_risk': low_risk,
             'list': devices[-10:]  # Last 10 devices
         },
         'threats': {
-            'total': system_stats['total_threats'],
+            'total': len(threats),
             'recent': threats,
-            'active': len([t for t in threats if t.get('status') == 'Detected'])
+            'active': len([t for t in threats if t.get('status') == Status.DETECTED])
         },
-        'deception': deception_status,
-        'defense': defense_status,
-        'honeypot_alerts': honeypot_alerts[-5:] if honeypot_alerts else [],
-        'timestamp': datetime.now().strftime("%H:%M:%S")
+        'deception': snapshot.get('deception', {}),
+        'defense': snapshot.get('defense', {}),
+        'honeypot_alerts': honeypot_alerts,
+        'timestamp': clock.now().strftime("%H:%M:%S")
     })
 
 @app.route('/api/scan')
 def trigger_scan():
     """Trigger manual scan"""
-    new_devices = discovery.scan_network()
+    # The inventory belongs to the scheduler thread; concurrent scans queue up there
+    diff = scheduler.call(run_scan).result()
+    new_devices = diff['added']
     return jsonify({
         'status': 'success',
+        'scan_id': diff['scan_id'],
         'new_devices': len(new_devices),
+        'updated_devices': len(diff['updated']),
+        'lost_devices': len(diff['lost']),
         'message': f'Found {len(new_devices)} new devices'
     })
 
+@app.route('/api/scan/diff')
+def get_scan_diff():
+    """Get devices changed by the last scan, or since ?since=<scan_id>"""
+    since = request.args.get('since', type=int)
+    snapshot = scheduler.snapshot
+    if since is None:
+        return jsonify(snapshot['scan_diff'])
+    return jsonify({
+        'scan_id': snapshot['scan_diff']['scan_id'],
+        'changed': [record for changed, record in snapshot['inventory'] if changed > since]
+    })
+
 @app.route('/api/devices')
 def get_all_devices():
     """Get all devices"""
-    devices = iot_sim.get_devices()
-    return jsonify(devices)
+    return jsonify(scheduler.snapshot.get('devices', ()))
 
 @app.route('/api/threats')
 def get_all_threats():
     """Get all threats"""
-    threats = threat_detector.get_recent_threats(20)
-    return jsonify(threats)
+    return jsonify(scheduler.snapshot.get('threats', ()))
+
+@app.route('/api/scheduler')
+def get_scheduler_stats():
+    """Tick durations and overruns per scheduled job"""
+    return jsonify(scheduler.get_stats())
+
+@app.route('/api/models')
+def get_model_status():
+    """Live model version and the last training run"""
+    return jsonify(training.get_stats())
 
 @app.route('/api/health')
 def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
-        'timestamp': datetime.now().isoformat(),
+        'timestamp': clock.now().isoformat(),
         'components': {
             'discovery': 'active',
             'threat_detector': 'active',
@@ -136,4 +254,5 @@ def health_check():
     })
 
 if __name__ == '__main__':
+    scheduler.start()
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -1,58 +1,422 @@
 """
 Simple SQLite Database
 """
+import asyncio
+import queue
 import sqlite3
 import json
-from datetime import datetime
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 import os
 
-def initialize_database():
+import config
+from core.metrics import REGISTRY
+from database.records import to_iso
+
+CACHE_REQUESTS = REGISTRY.counter("db_cache_requests_total", "History query cache lookups", ["result"])
+QUERY_SECONDS = REGISTRY.histogram("db_query_seconds", "SQLite history query time (cache misses)", ["query"])
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS devices (
+        id TEXT PRIMARY KEY,
+        name TEXT,
+        ip TEXT,
+        type TEXT,
+        risk_score REAL,
+        discovered TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS threats (
+        id TEXT PRIMARY KEY,
+        type TEXT,
+        source TEXT,
+        target TEXT,
+        severity TEXT,
+        timestamp TEXT,
+        status TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS actions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        action TEXT,
+        target TEXT,
+        timestamp TEXT
+    )
+    '''
+]
+
+# Threat counts per hour, kept current by triggers, so a summary over days
+# adds up a few hundred rows instead of scanning every threat in the window
+ROLLUP = [
+    '''
+    CREATE TABLE IF NOT EXISTS threat_counts (
+        hour TEXT,
+        target TEXT,
+        status TEXT,
+        severity TEXT,
+        count INTEGER,
+        PRIMARY KEY (hour, target, status, severity)
+    ) WITHOUT ROWID
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_threat_counts_target ON threat_counts(target, hour)',
+    '''
+    CREATE TRIGGER IF NOT EXISTS threat_counts_insert AFTER INSERT ON threats BEGIN
+        INSERT INTO threat_counts VALUES (substr(NEW.timestamp, 1, 13), coalesce(NEW.target, ''),
+                                          coalesce(NEW.status, ''), coalesce(NEW.severity, ''), 1)
+        ON CONFLICT DO UPDATE SET count = count + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS threat_counts_delete AFTER DELETE ON threats BEGIN
+        UPDATE threat_counts SET count = count - 1
+        WHERE hour = substr(OLD.timestamp, 1, 13) AND target = coalesce(OLD.target, '')
+          AND status = coalesce(OLD.status, '') AND severity = coalesce(OLD.severity, '');
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS threat_counts_update AFTER UPDATE OF timestamp, target, status, severity ON threats BEGIN
+        UPDATE threat_counts SET count = count - 1
+        WHERE hour = substr(OLD.timestamp, 1, 13) AND target = coalesce(OLD.target, '')
+          AND status = coalesce(OLD.status, '') AND severity = coalesce(OLD.severity, '');
+        INSERT INTO threat_counts VALUES (substr(NEW.timestamp, 1, 13), coalesce(NEW.target, ''),
+                                          coalesce(NEW.status, ''), coalesce(NEW.severity, ''), 1)
+        ON CONFLICT DO UPDATE SET count = count + 1;
+    END
+    '''
+]
+
+# Time-window counts by status/severity/target are answered from the first index alone;
+# the (column, timestamp) indexes serve "newest N with status = ?" without sorting
+INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_threats_time ON threats(timestamp, status, severity, target)',
+    'CREATE INDEX IF NOT EXISTS idx_threats_status_time ON threats(status, timestamp)',
+    'CREATE INDEX IF NOT EXISTS idx_threats_severity_time ON threats(severity, timestamp)',
+    'CREATE INDEX IF NOT EXISTS idx_threats_target_time ON threats(target, timestamp)',
+    'CREATE INDEX IF NOT EXISTS idx_devices_risk ON devices(risk_score, type, id, name, ip, discovered)',
+    'CREATE INDEX IF NOT EXISTS idx_devices_type_risk ON devices(type, risk_score)',
+    'CREATE INDEX IF NOT EXISTS idx_actions_time ON actions(timestamp)',
+    'CREATE INDEX IF NOT EXISTS idx_actions_target_time ON actions(target, timestamp)',
+]
+
+THREAT_COLUMNS = ('id', 'type', 'source', 'target', 'severity', 'timestamp', 'status')
+DEVICE_COLUMNS = ('id', 'name', 'ip', 'type', 'risk_score', 'discovered')
+ACTION_COLUMNS = ('id', 'action', 'target', 'timestamp')
+
+
+def initialize_database(path=None):
     """Initialize the database"""
     try:
-        conn = sqlite3.connect('iot_security.db')
+        conn = sqlite3.connect(path or config.DB_PATH)
         cursor = conn.cursor()
-        
-        # Create devices table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS devices (
-            id TEXT PRIMARY KEY,
-            name TEXT,
-            ip TEXT,
-            type TEXT,
-            risk_score REAL,
-            discovered TEXT
-        )
-        ''')
-        
-        # Create threats table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS threats (
-            id TEXT PRIMARY KEY,
-            type TEXT,
-            source TEXT,
-            target TEXT,
-            severity TEXT,
-            timestamp TEXT,
-            status TEXT
-        )
-        ''')
-        
-        # Create actions table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS actions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            action TEXT,
-            target TEXT,
-            timestamp TEXT
-        )
-        ''')
-        
+
+        # Readers never block the writer (or each other) in WAL mode
+        cursor.execute('PRAGMA journal_mode=WAL')
+        for statement in SCHEMA + INDEXES:
+            cursor.execute(statement)
+        new_rollup = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'threat_counts'").fetchone() is None
+        for statement in ROLLUP:
+            cursor.execute(statement)
+        if new_rollup:  # backfill from threats written before the rollup existed
+            cursor.execute('''
+                INSERT INTO threat_counts
+                SELECT substr(timestamp, 1, 13), coalesce(target, ''), coalesce(status, ''),
+                       coalesce(severity, ''), COUNT(*)
+                FROM threats GROUP BY 1, 2, 3, 4
+            ''')
+
         conn.commit()
+        # Refresh planner statistics where they are missing or stale (cheap when nothing changed)
+        cursor.execute('PRAGMA optimize')
         conn.close()
         print("✅ Database initialized successfully")
-        
+
     except Exception as e:
         print(f"⚠️ Database initialization error: {e}")
 
+
+class IoTDatabase:
+    """Devices, threats and actions in SQLite with an indexed, cached read path.
+
+    Writes go through one connection. Reads run on a ThreadPoolExecutor
+    over DB_READERS read-only connections, so queries never block the
+    event loop and never wait on a write (WAL). Every query is one of a
+    fixed set of parameterized statements, so each connection's
+    statement cache keeps them prepared. Results are kept in an LRU
+    cache that is cleared whenever the database changes, from this
+    process or any other: SQLite's data_version, checked on a dedicated
+    connection before each lookup, moves on every commit by another
+    connection. The file is opened on first use.
+    """
+
+    def __init__(self, path=None, readers=None, cache_size=None):
+        self.path = path or config.DB_PATH
+        self.readers = readers or config.DB_READERS
+        self.cache_size = cache_size or config.DB_CACHE_SIZE
+        self.cache = OrderedDict()  # (sql, params) -> rows
+        self.cache_lock = threading.Lock()
+        self.generation = 0  # bumped on every cache clear
+        self.data_version = None
+        self.writer = None
+        self.write_lock = threading.Lock()
+        self.open_lock = threading.Lock()
+        self.pool = queue.Queue()
+        self.executor = None
+
+    def _open(self):
+        with self.open_lock:
+            if self.executor is not None:
+                return
+            initialize_database(self.path)
+            self.writer = sqlite3.connect(self.path, check_same_thread=False)
+            for _ in range(self.readers):
+                self.pool.put(self._connect_reader())
+            self.watcher = self._connect_reader()
+            self.watch_lock = threading.Lock()
+            self.executor = ThreadPoolExecutor(self.readers, thread_name_prefix="db-reader")
+
+    def _connect_reader(self):
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False,
+                               cached_statements=256)
+        conn.execute(f'PRAGMA mmap_size={int(config.DB_MMAP_SIZE)}')
+        return conn
+
+    def close(self):
+        if self.executor is None:
+            return
+        self.executor.shutdown(wait=True)
+        while not self.pool.empty():
+            self.pool.get().close()
+        self.watcher.close()
+        self.writer.close()
+        self.executor = None
+
+    # Writes
+
+    def _write(self, sql, rows):
+        self._open()
+        with self.write_lock:
+            self.writer.executemany(sql, rows)
+            self.writer.commit()
+        self._check_version()
+
+    def upsert_devices(self, devices):
+        """Insert or replace device rows (dicts)"""
+        self._write(f"INSERT OR REPLACE INTO devices ({', '.join(DEVICE_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                    [self._row(device, DEVICE_COLUMNS) for device in devices])
+
+    def insert_threats(self, threats):
+        """Insert threat rows (dicts or ThreatRecords), updating any already stored by id"""
+        # An upsert rather than INSERT OR REPLACE: REPLACE's implicit delete skips the rollup triggers
+        updates = ', '.join(f"{column} = excluded.{column}" for column in THREAT_COLUMNS[1:])
+        self._write(f"INSERT INTO threats ({', '.join(THREAT_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    f"ON CONFLICT(id) DO UPDATE SET {updates}",
+                    [self._row(threat, THREAT_COLUMNS) for threat in threats])
+
+    def insert_actions(self, actions):
+        """Append action rows (dicts with action, target, timestamp)"""
+        self._write("INSERT INTO actions (action, target, timestamp) VALUES (?, ?, ?)",
+                    [self._row(action, ACTION_COLUMNS[1:]) for action in actions])
+
+    @staticmethod
+    def _row(record, columns):
+        values = []
+        for column in columns:
+            value = record.get(column)
+            if column in ('timestamp', 'discovered') and isinstance(value, (int, float)):
+                value = to_iso(value)  # stored as ISO text, which sorts chronologically
+            elif value is not None and not isinstance(value, (int, float, str)):
+                value = str(value)
+            values.append(value)
+        return values
+
+    # Reads
+
+    def _check_version(self):
+        """Clear the cache if any connection committed since the last check"""
+        with self.watch_lock:
+            version = self.watcher.execute('PRAGMA data_version').fetchone()[0]
+        if version != self.data_version:
+            with self.cache_lock:
+                self.data_version = version
+                self.cache.clear()
+                self.generation += 1
+
+    def _fetch(self, name, sql, params):
+        """Rows for a statement, from the cache or a pooled read-only connection"""
+        self._check_version()
+        key = (sql, params)
+        with self.cache_lock:
+            rows = self.cache.get(key)
+            if rows is not None:
+                self.cache.move_to_end(key)
+                CACHE_REQUESTS.labels('hit').inc()
+                return rows
+            generation = self.generation
+        CACHE_REQUESTS.labels('miss').inc()
+
+        conn = self.pool.get()
+        started = time.perf_counter()
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            self.pool.put(conn)
+        QUERY_SECONDS.labels(name).observe(time.perf_counter() - started)
+
+        with self.cache_lock:
+            # A write cleared the cache while this ran: the rows may predate it, so don't keep them
+            if generation == self.generation:
+                self.cache[key] = rows
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        return rows
+
+    async def fetch(self, name, sql, params):
+        """Run a read on the reader pool without blocking the event loop"""
+        self._open()
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._fetch, name, sql, params)
+
+    @staticmethod
+    def _window(column, since, until, clauses, params):
+        if since is not None:
+            clauses.append(f"{column} >= ?")
+            params.append(to_iso(since))
+        if until is not None:
+            clauses.append(f"{column} < ?")
+            params.append(to_iso(until))
+
+    @staticmethod
+    def _where(clauses):
+        return f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    async def threats(self, since=None, until=None, status=None, severity=None, target=None, limit=100):
+        """Newest threats in [since, until) matching the filters; page back with until=<oldest timestamp>"""
+        clauses, params = [], []
+        self._window('timestamp', since, until, clauses, params)
+        for column, value in (('status', status), ('severity', severity), ('target', target)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        sql = (f"SELECT {', '.join(THREAT_COLUMNS)} FROM threats{self._where(clauses)} "
+               f"ORDER BY timestamp DESC LIMIT ?")
+        rows = await self.fetch('threats', sql, (*params, self._limit(limit)))
+        return [dict(zip(THREAT_COLUMNS, row)) for row in rows]
+
+    async def threat_summary(self, since=None, until=None, target=None):
+        """Threat counts by status and severity in a window.
+
+        Whole hours come from the threat_counts rollup; only the partial
+        hours at either end of the window are counted from the threats
+        index.
+        """
+        first, last = self._whole_hours(since, until)
+        if first is not None and last is not None and first >= last:
+            rows = await self._count_threats(since, until, target)
+        else:
+            clauses, params = [], []
+            if first is not None:
+                clauses.append("hour >= ?")
+                params.append(first)
+            if last is not None:
+                clauses.append("hour < ?")
+                params.append(last)
+            if target is not None:
+                clauses.append("target = ?")
+                params.append(target)
+            rows = list(await self.fetch(
+                'threat_summary', f"SELECT status, severity, SUM(count) FROM threat_counts{self._where(clauses)} "
+                                  f"GROUP BY status, severity", tuple(params)))
+            if since is not None:
+                rows += await self._count_threats(since, self._hour_epoch(first), target)
+            if until is not None:
+                rows += await self._count_threats(self._hour_epoch(last), until, target)
+
+        by_status, by_severity = {}, {}
+        for status, severity, count in rows:
+            by_status[status] = by_status.get(status, 0) + count
+            by_severity[severity] = by_severity.get(severity, 0) + count
+        by_status = {status: count for status, count in by_status.items() if count}
+        by_severity = {severity: count for severity, count in by_severity.items() if count}
+        return {'total': sum(by_status.values()), 'by_status': by_status, 'by_severity': by_severity}
+
+    async def _count_threats(self, since, until, target):
+        """(status, severity, count) rows straight from the covering index, for short windows"""
+        clauses, params = [], []
+        self._window('timestamp', since, until, clauses, params)
+        if target is not None:
+            clauses.append("target = ?")
+            params.append(target)
+        index = 'idx_threats_target_time' if target is not None else 'idx_threats_time'
+        sql = (f"SELECT status, severity, COUNT(*) FROM threats INDEXED BY {index}{self._where(clauses)} "
+               f"GROUP BY status, severity")
+        return await self.fetch('threat_count', sql, tuple(params))
+
+    @staticmethod
+    def _whole_hours(since, until):
+        """Rollup hour keys [first, last) covering the whole hours inside [since, until)"""
+        first = last = None
+        if since is not None:
+            start = datetime.fromtimestamp(since)
+            hour = start.replace(minute=0, second=0, microsecond=0)
+            first = (hour if hour == start else hour + timedelta(hours=1)).isoformat()[:13]
+        if until is not None:
+            last = datetime.fromtimestamp(until).isoformat()[:13]
+        return first, last
+
+    @staticmethod
+    def _hour_epoch(hour):
+        return datetime.fromisoformat(hour + ':00:00').timestamp()
+
+    async def devices(self, min_risk=None, max_risk=None, type=None, limit=100):
+        """Riskiest devices first, optionally within a risk range and of one type"""
+        clauses, params = [], []
+        if type is not None:
+            clauses.append("type = ?")
+            params.append(type)
+        if min_risk is not None:
+            clauses.append("risk_score >= ?")
+            params.append(min_risk)
+        if max_risk is not None:
+            clauses.append("risk_score <= ?")
+            params.append(max_risk)
+        sql = (f"SELECT {', '.join(DEVICE_COLUMNS)} FROM devices{self._where(clauses)} "
+               f"ORDER BY risk_score DESC LIMIT ?")
+        rows = await self.fetch('devices', sql, (*params, self._limit(limit)))
+        return [dict(zip(DEVICE_COLUMNS, row)) for row in rows]
+
+    async def actions(self, since=None, until=None, target=None, limit=100):
+        """Newest actions in [since, until), optionally for one target"""
+        clauses, params = [], []
+        self._window('timestamp', since, until, clauses, params)
+        if target is not None:
+            clauses.append("target = ?")
+            params.append(target)
+        sql = (f"SELECT {', '.join(ACTION_COLUMNS)} FROM actions{self._where(clauses)} "
+               f"ORDER BY timestamp DESC LIMIT ?")
+        rows = await self.fetch('actions', sql, (*params, self._limit(limit)))
+        return [dict(zip(ACTION_COLUMNS, row)) for row in rows]
+
+    @staticmethod
+    def _limit(limit):
+        return max(1, min(int(limit), config.DB_MAX_LIMIT))
+
+    def get_stats(self):
+        """Get database read path statistics"""
+        return {
+            'path': self.path,
+            'open': self.executor is not None,
+            'readers': self.readers,
+            'cached_results': len(self.cache),
+            'cache_size': self.cache_size,
+            'cache_generation': self.generation,
+            'data_version': self.data_version
+        }
+
 # Note: The system will work even without database
-# This is a simplified version for hackathon
\ No newline at end of file
+# This is a simplified version for hackathon
@@ -0,0 +1,266 @@
+"""
+Compact record types for traffic, threats, actions and devices
+"""
+import sys
+from dataclasses import dataclass, fields
+from datetime import datetime
+from enum import Enum
+
+
+class Label(str, Enum):
+    """String enum whose members compare and serialize as their value.
+
+    Every record holding the same label points at one shared member, so a
+    million records cost one 8-byte reference each instead of a string.
+    """
+
+    def __str__(self):
+        return self.value
+
+    @classmethod
+    def parse(cls, value):
+        """Member for `value` (case-insensitive); unknown labels stay interned strings"""
+        if value is None or isinstance(value, cls):
+            return value
+        member = cls._lookup().get(str(value).lower())
+        return member if member is not None else sys.intern(str(value))
+
+    @classmethod
+    def _lookup(cls):
+        # Built lazily: Enum classes cannot hold extra attributes at definition time
+        lookup = cls.__dict__.get('_by_lower')
+        if lookup is None:
+            lookup = {member.value.lower(): member for member in cls}
+            setattr(cls, '_by_lower', lookup)
+        return lookup
+
+
+class Protocol(Label):
+    TCP = 'TCP'
+    UDP = 'UDP'
+    ICMP = 'ICMP'
+    HTTP = 'HTTP'
+    HTTPS = 'HTTPS'
+    DNS = 'DNS'
+    DHCP = 'DHCP'
+    SSH = 'SSH'
+    TELNET = 'TELNET'
+
+
+class Severity(Label):
+    LOW = 'low'
+    MEDIUM = 'medium'
+    HIGH = 'high'
+    CRITICAL = 'critical'
+
+
+class Status(Label):
+    ACTIVE = 'active'
+    RESOLVED = 'resolved'
+    COMPLETED = 'completed'
+    DETECTED = 'detected'
+    MITIGATED = 'mitigated'
+    ONLINE = 'online'
+    OFFLINE = 'offline'
+    BLOCKED = 'blocked'
+
+
+def to_epoch(value):
+    """Epoch seconds from an epoch number, datetime or ISO string"""
+    if value is None or isinstance(value, float):
+        return value
+    if isinstance(value, int):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return datetime.fromisoformat(value).timestamp()
+
+
+def to_iso(value):
+    """ISO string for an epoch timestamp (the JSON shape the API has always used)"""
+    return None if value is None else datetime.fromtimestamp(value).isoformat()
+
+
+def intern(value):
+    """Share one copy of repeated identifiers (IPs, MACs, device ids)"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class RecordMixin:
+    """Dict-style access so code written against the old dicts keeps working.
+
+    Subclasses list per-field converters in COERCE; they run on both
+    from_dict() and item assignment. Conversion back to the JSON shape
+    happens only in to_dict(), at the API boundary.
+    """
+    __slots__ = ()
+    COERCE = {}
+    TIMESTAMPS = ()
+
+    @classmethod
+    def from_dict(cls, data):
+        names = cls.field_names()
+        values = {key: cls.COERCE.get(key, intern)(value) for key, value in data.items() if key in names}
+        return cls(**values)
+
+    @classmethod
+    def coerce(cls, name, value):
+        """`value` as field `name` stores it (e.g. to compare a dict's value with a record's)"""
+        return cls.COERCE.get(name, intern)(value)
+
+    @classmethod
+    def field_names(cls):
+        """Field names as a frozenset, cached on the class"""
+        names = cls.__dict__.get('_field_names')
+        if names is None:
+            names = frozenset(f.name for f in fields(cls))
+            setattr(cls, '_field_names', names)
+        return names
+
+    @classmethod
+    def compile_filter(cls, spec):
+        """Predicate for a filter spec such as {"status": "active", "source": ["10.0.0.5", "10.0.0.6"]}.
+
+        A key is a field name, optionally with an operator suffix: __gte,
+        __lte or __prefix (strings). Plain values test equality and lists
+        test membership. Values go through the field's COERCE converter, so
+        labels match case-insensitively and timestamps accept ISO strings.
+        Unknown fields or operators raise ValueError.
+        """
+        names = cls.field_names()
+        tests = []
+        for key, value in spec.items():
+            name, _, op = key.partition('__')
+            if name not in names:
+                raise ValueError(f"Unknown field '{name}'")
+            coerce = cls.COERCE.get(name, intern)
+            if op == '' and isinstance(value, list):
+                allowed = {coerce(v) for v in value}
+                tests.append(lambda r, n=name, a=allowed: getattr(r, n) in a)
+            elif op == '':
+                expected = coerce(value)
+                tests.append(lambda r, n=name, e=expected: getattr(r, n) == e)
+            elif op in ('gte', 'lte'):
+                bound = coerce(value)
+                if op == 'gte':
+                    tests.append(lambda r, n=name, b=bound: getattr(r, n) is not None and getattr(r, n) >= b)
+                else:
+                    tests.append(lambda r, n=name, b=bound: getattr(r, n) is not None and getattr(r, n) <= b)
+            elif op == 'prefix':
+                prefix = str(value)
+                tests.append(lambda r, n=name, p=prefix: str(getattr(r, n) or '').startswith(p))
+            else:
+                raise ValueError(f"Unknown operator '__{op}' on '{name}'")
+        return lambda record: all(test(record) for test in tests)
+
+    def to_dict(self):
+        data = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if value is None:
+                continue
+            if name in self.TIMESTAMPS:
+                value = to_iso(value)
+            elif isinstance(value, Label):
+                value = value.value
+            elif isinstance(value, tuple):
+                value = list(value)
+            data[name] = value
+        return data
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None) if key in self.field_names() else None
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        if key not in self.field_names():
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.field_names():
+            raise KeyError(key)
+        setattr(self, key, self.COERCE.get(key, intern)(value))
+
+    def __contains__(self, key):
+        return key in self.field_names() and getattr(self, key) is not None
+
+
+@dataclass(slots=True, eq=False)
+class TrafficRecord(RecordMixin):
+    timestamp: float
+    source_ip: str
+    source_mac: str = None
+    destination_ip: str = None
+    destination_mac: str = None
+    protocol: Protocol = Protocol.TCP
+    port: int = 0
+    bytes: int = 0
+    is_suspicious: bool = False
+    src_device_id: str = None
+    dst_device_id: str = None
+    suspicious_type: str = None
+    flags: str = None
+    credentials_attempt: str = None
+
+    COERCE = {'timestamp': to_epoch, 'protocol': Protocol.parse, 'credentials_attempt': str}
+    TIMESTAMPS = ('timestamp',)
+
+
+@dataclass(slots=True, eq=False)
+class ThreatRecord(RecordMixin):
+    id: str
+    type: str
+    severity: Severity
+    source: str = None
+    target: str = None
+    device_id: str = None
+    description: str = None
+    confidence: float = None
+    timestamp: float = None
+    status: Status = Status.ACTIVE
+    count: int = None
+    first_seen: float = None
+    last_seen: float = None
+    mitigated_at: float = None
+
+    COERCE = {'timestamp': to_epoch, 'first_seen': to_epoch, 'last_seen': to_epoch, 'mitigated_at': to_epoch,
+              'severity': Severity.parse, 'status': Status.parse, 'id': str, 'description': str}
+    TIMESTAMPS = ('timestamp', 'first_seen', 'last_seen', 'mitigated_at')
+
+
+@dataclass(slots=True, eq=False)
+class ActionRecord(RecordMixin):
+    id: str
+    action_type: str
+    target: str
+    description: str = None
+    timestamp: float = None
+    status: Status = Status.COMPLETED
+    threat: str = None  # the threat type a defense response answered
+    actions: tuple = None  # and the steps it took
+
+    COERCE = {'timestamp': to_epoch, 'status': Status.parse, 'id': str, 'description': str, 'actions': tuple}
+    TIMESTAMPS = ('timestamp',)
+
+
+@dataclass(slots=True, eq=False)
+class DeviceRecord(RecordMixin):
+    id: str
+    name: str
+    ip: str
+    mac: str = None
+    type: str = None
+    vendor: str = "Unknown"
+    firmware: str = "1.0.0"
+    risk_score: float = 0.0
+    ports: tuple = ()
+    vulnerabilities: tuple = None
+    discovered: float = None
+    first_seen: float = None
+    last_seen: float = None
+    status: Status = Status.ONLINE
+
+    COERCE = {'discovered': to_epoch, 'first_seen': to_epoch, 'last_seen': to_epoch, 'status': Status.parse,
+              'ports': tuple, 'vulnerabilities': tuple, 'risk_score': float}
+    TIMESTAMPS = ('discovered', 'first_seen', 'last_seen')
@@ -0,0 +1,170 @@
+"""
+Bounded history retention with tiered rollups
+"""
+from collections import deque
+from datetime import datetime
+import config
+from core import clock
+from .time_index import TimeIndex
+
+
+class Rollup:
+    """Counts by type and severity per fixed-size time bucket"""
+
+    def __init__(self, bucket_seconds, max_buckets):
+        self.bucket_seconds = bucket_seconds
+        self.max_buckets = max_buckets
+        self.buckets = deque()  # [start, total, by_type, by_severity], oldest first
+
+    def add(self, ts, kind, severity):
+        """Count one record in the bucket covering `ts`"""
+        start = ts - ts % self.bucket_seconds
+        bucket = self._bucket_for(start)
+        if bucket is None:
+            return
+        bucket[1] += 1
+        bucket[2][kind] = bucket[2].get(kind, 0) + 1
+        if severity is not None:
+            bucket[3][severity] = bucket[3].get(severity, 0) + 1
+
+    def _bucket_for(self, start):
+        buckets = self.buckets
+        if not buckets or buckets[-1][0] < start:
+            buckets.append([start, 0, {}, {}])
+            if len(buckets) > self.max_buckets:
+                buckets.popleft()
+            return buckets[-1]
+
+        # Late records: walk back from the newest bucket (rare and short)
+        for i in range(len(buckets) - 1, -1, -1):
+            if buckets[i][0] == start:
+                return buckets[i]
+            if buckets[i][0] < start:
+                bucket = [start, 0, {}, {}]
+                buckets.insert(i + 1, bucket)
+                if len(buckets) > self.max_buckets:
+                    buckets.popleft()  # always older than the new bucket, which sits after index i
+                return bucket
+        return None  # older than anything retained
+
+    def query(self, since=None, until=None):
+        """Buckets overlapping [since, until)"""
+        return [
+            b for b in self.buckets
+            if (since is None or b[0] + self.bucket_seconds > since) and (until is None or b[0] < until)
+        ]
+
+    def covers(self, since):
+        """Whether this rollup still holds data back to `since`"""
+        return bool(self.buckets) and self.buckets[0][0] <= since
+
+
+class RetentionStore:
+    """Hot window of raw records plus per-minute and per-hour rollups.
+
+    Raw records live in a TimeIndex and are evicted a segment at a time
+    once older than config.RETENTION_HOT_SECONDS (or beyond
+    config.RETENTION_HOT_MAX); counts for them live on in the rollups,
+    which are themselves capped, so memory stays flat. Iterating the store
+    yields the hot records oldest first. `on_evict` is called with each
+    batch of raw records leaving the hot window.
+    """
+
+    def __init__(self, name, type_key='type', severity_key='severity',
+                 hot_seconds=None, hot_max=None, on_evict=None):
+        self.name = name
+        self.type_key = type_key
+        self.severity_key = severity_key
+        self.hot_seconds = hot_seconds or config.RETENTION_HOT_SECONDS
+        self.hot_max = hot_max or config.RETENTION_HOT_MAX
+        self.index = TimeIndex(on_drop=on_evict)
+        self.minutes = Rollup(60, config.RETENTION_MINUTE_BUCKETS)
+        self.hours = Rollup(3600, config.RETENTION_HOUR_BUCKETS)
+        self.total = 0
+        self.evicted = 0
+
+    def append(self, record, ts=None):
+        """Add a raw record and count it in the rollups"""
+        ts = clock.time() if ts is None else ts
+        kind = record.get(self.type_key, 'Unknown')
+        severity = record.get(self.severity_key, 'Unknown') if self.severity_key else None
+
+        self.index.append(record, ts)
+        self.minutes.add(ts, kind, severity)
+        self.hours.add(ts, kind, severity)
+        self.total += 1
+        self._evict(ts)
+
+    def _evict(self, now):
+        """Drop raw segments that fell out of the hot window"""
+        self.evicted += self.index.evict_before(now - self.hot_seconds)
+        self.evicted += self.index.evict_oldest(self.hot_max)
+
+    def recent(self, count=10):
+        """The newest `count` raw records, oldest first"""
+        return self.index.recent(count)
+
+    def range(self, since=None, until=None, limit=None):
+        """Raw records with since <= t < until that are still in the hot window"""
+        return self.index.range(since, until, limit)
+
+    def count_between(self, since=None, until=None):
+        """Record count in [since, until): exact from the index while it
+        covers `since`, otherwise from the rollups"""
+        first = self.index.first_time
+        if not self.evicted or (since is not None and first is not None and since >= first):
+            return self.index.count_between(since, until)
+        return self.counts(since, until)['total']
+
+    def rate(self, interval, buckets, until=None):
+        """Record counts for the last `buckets` intervals of `interval` seconds"""
+        until = clock.time() if until is None else until
+        start = until - interval * buckets
+        return [
+            {'start': start + i * interval,
+             'count': self.count_between(start + i * interval, start + (i + 1) * interval)}
+            for i in range(buckets)
+        ]
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def counts(self, since=None, until=None):
+        """Totals by type and severity, answered from the finest rollup that covers the range"""
+        rollup = self.minutes if since is not None and self.minutes.covers(since) else self.hours
+        total, by_type, by_severity = 0, {}, {}
+        for _, count, types, severities in rollup.query(since, until):
+            total += count
+            for key, value in types.items():
+                by_type[key] = by_type.get(key, 0) + value
+            for key, value in severities.items():
+                by_severity[key] = by_severity.get(key, 0) + value
+        return {'total': total, 'by_type': by_type, 'by_severity': by_severity}
+
+    def history(self, since=None, until=None, resolution='minute'):
+        """Per-bucket counts for charts and historical queries"""
+        rollup = self.hours if resolution == 'hour' else self.minutes
+        return [
+            {
+                'bucket': datetime.fromtimestamp(start).isoformat(),
+                'total': count,
+                'by_type': dict(types),
+                'by_severity': dict(severities)
+            }
+            for start, count, types, severities in rollup.query(since, until)
+        ]
+
+    def get_stats(self):
+        """Get retention statistics"""
+        return {
+            'name': self.name,
+            'hot_records': len(self.index),
+            'hot_segments': len(self.index.segments),
+            'total_records': self.total,
+            'evicted_records': self.evicted,
+            'minute_buckets': len(self.minutes.buckets),
+            'hour_buckets': len(self.hours.buckets)
+        }
@@ -0,0 +1,354 @@
+"""
+Threat Intelligence - memory-mapped IP reputation lookups
+
+The feed is a text file with one entry per line: an address, a CIDR
+block or a "first-last" range ('#' starts a comment). It is compiled
+into a binary table of merged, sorted uint32 ranges:
+
+    header   magic, version, range count          (16 bytes)
+    bitmap   one bit per /24 prefix that has any entry (2 MiB)
+    starts   uint32[count]
+    ends     uint32[count]
+
+Readers np.memmap the table read-only, so every process maps the same
+page-cache pages instead of loading its own copy. Compiling never
+happens on the lookup path: the CLI or a FeedCompiler thread writes a
+temporary file and os.replace()s it over the table (holding a lock file,
+so processes watching one feed don't compile it twice); readers notice
+the new inode on their next stat() and switch, while lookups already
+running finish on the old mapping.
+
+Usage (from backend/):
+    python -m database.threat_intel compile threat_intel.txt
+    python -m database.threat_intel lookup 10.0.0.7 192.168.1.20
+"""
+import argparse
+import fcntl
+import ipaddress
+import os
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+import config
+from core.metrics import REGISTRY
+
+MAGIC = b'TINT'
+VERSION = 1
+HEADER = struct.Struct('<4sHHQ')
+BITMAP_BYTES = (1 << 24) // 8
+
+RANGES = REGISTRY.gauge('threat_intel_ranges', 'Merged address ranges in the loaded threat-intel table')
+LOOKUPS = REGISTRY.counter('threat_intel_lookups_total', 'Addresses checked against threat intel', ['result'])
+RELOADS = REGISTRY.counter('threat_intel_reloads_total', 'Threat-intel tables mapped')
+
+
+def ip_to_int(ip):
+    """IPv4 address as an int, or -1 if it is not one"""
+    try:
+        return int.from_bytes(socket.inet_aton(ip), 'big')
+    except (OSError, TypeError, ValueError):
+        return -1
+
+
+def _parse_line(line):
+    """(first, last) addresses of one feed entry, or None"""
+    entry = line.split('#', 1)[0].strip()
+    if not entry:
+        return None
+    if entry.count('.') == 3 and entry.replace('.', '').isdigit():
+        address = ip_to_int(entry)  # plain address: the common case, skip ipaddress
+        if address >= 0:
+            return address, address
+    if '/' in entry:
+        network = ipaddress.IPv4Network(entry, strict=False)
+        return int(network.network_address), int(network.broadcast_address)
+    if '-' in entry:
+        first, last = (int(ipaddress.IPv4Address(part.strip())) for part in entry.split('-', 1))
+        return min(first, last), max(first, last)
+    address = int(ipaddress.IPv4Address(entry))
+    return address, address
+
+
+def _read_feed(path):
+    """Start and end arrays for every valid entry in a feed file"""
+    starts, ends = [], []
+    skipped = 0
+    with open(path) as f:
+        for line in f:
+            try:
+                parsed = _parse_line(line)
+            except ValueError:
+                skipped += 1
+                continue
+            if parsed is not None:
+                starts.append(parsed[0])
+                ends.append(parsed[1])
+    if skipped:
+        print(f"⚠️ Skipped {skipped} invalid threat-intel entries in {path}")
+    return np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64)
+
+
+def _merge(starts, ends):
+    """Sort ranges and merge overlapping or adjacent ones"""
+    if not len(starts):
+        return starts.astype(np.uint32), ends.astype(np.uint32)
+    order = np.argsort(starts, kind='stable')
+    starts, ends = starts[order], ends[order]
+    reach = np.maximum.accumulate(ends)
+    # A range opens a new group when it starts past everything before it (+1: adjacent ranges join)
+    first = np.concatenate(([True], starts[1:] > reach[:-1] + 1))
+    group_starts = np.flatnonzero(first)
+    return starts[group_starts].astype(np.uint32), np.maximum.reduceat(ends, group_starts).astype(np.uint32)
+
+
+def _prefix_bitmap(starts, ends):
+    """Bitmap with one bit set for every /24 prefix touched by a range"""
+    mask = np.zeros(1 << 24, dtype=bool)
+    first, last = starts >> 8, ends >> 8
+    single = first == last
+    mask[first[single]] = True
+    # Ranges spanning several /24s are rare in feeds; fill them one slice each
+    for lo, hi in zip(first[~single].tolist(), last[~single].tolist()):
+        mask[lo:hi + 1] = True
+    return np.packbits(mask, bitorder='little')
+
+
+def compile_feed(feed_path, table_path=None):
+    """Compile a text feed into the binary table, replacing any old table atomically"""
+    table_path = table_path or config.THREAT_INTEL_DB
+    starts, ends = _merge(*_read_feed(feed_path))
+    bitmap = _prefix_bitmap(starts, ends)
+
+    os.makedirs(os.path.dirname(os.path.abspath(table_path)), exist_ok=True)
+    tmp_path = f"{table_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(starts)))
+        f.write(bitmap.tobytes())
+        f.write(starts.astype('<u4').tobytes())
+        f.write(ends.astype('<u4').tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, table_path)
+    return len(starts)
+
+
+def _stale(feed_path, table_path):
+    """Whether the feed exists and is newer than the compiled table"""
+    try:
+        feed_mtime = os.stat(feed_path).st_mtime_ns
+    except (FileNotFoundError, TypeError):
+        return False
+    try:
+        return feed_mtime > os.stat(table_path).st_mtime_ns
+    except FileNotFoundError:
+        return True
+
+
+def compile_if_stale(feed_path=None, table_path=None):
+    """Recompile the table if the feed is newer; returns the range count, or None if nothing was done.
+
+    Callers in other processes that find the lock held skip instead of
+    compiling the same table again.
+    """
+    feed_path = config.THREAT_INTEL_FEED if feed_path is None else feed_path
+    table_path = table_path or config.THREAT_INTEL_DB
+    if not feed_path or not _stale(feed_path, table_path):
+        return None
+    os.makedirs(os.path.dirname(os.path.abspath(table_path)), exist_ok=True)
+    with open(f"{table_path}.lock", 'a') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None  # another process is compiling it
+        if not _stale(feed_path, table_path):
+            return None  # compiled between the check and the lock
+        return compile_feed(feed_path, table_path)
+
+
+class FeedCompiler:
+    """Background thread that recompiles the table when the feed changes"""
+
+    def __init__(self, interval=None, feed_path=None, table_path=None):
+        self.interval = interval or config.THREAT_INTEL_COMPILE_INTERVAL
+        self.feed_path = feed_path
+        self.table_path = table_path
+        self.compiled = 0
+        self._stop = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self._stop.clear()
+        self.thread = threading.Thread(target=self._run, name="threat-intel-compiler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+            self.thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                started = time.perf_counter()
+                count = compile_if_stale(self.feed_path, self.table_path)
+                if count is not None:
+                    self.compiled += 1
+                    print(f"🧠 Threat intel compiled ({count:,} ranges in {time.perf_counter() - started:.1f}s)")
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Threat intel compile failed: {e}")
+            self._stop.wait(self.interval)
+
+
+def _map_table(path):
+    """(starts, ends, bitmap) views over a read-only mapping of a compiled table"""
+    # Plain ndarray views over the mapping: np.memmap's own indexing adds per-call overhead
+    data = np.memmap(path, dtype=np.uint8, mode='r').view(np.ndarray)
+    magic, version, _, count = HEADER.unpack(bytes(data[:HEADER.size]))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a threat-intel table")
+    offset = HEADER.size
+    bitmap = data[offset:offset + BITMAP_BYTES]
+    offset += BITMAP_BYTES
+    starts = data[offset:offset + 4 * count].view('<u4')
+    ends = data[offset + 4 * count:offset + 8 * count].view('<u4')
+    return starts, ends, bitmap
+
+
+class ThreatIntel:
+    """Reputation lookups against a compiled threat-intel table.
+
+    The table is re-mapped when the file is replaced (a stat() at most
+    every THREAT_INTEL_RELOAD_INTERVAL seconds); this class never compiles
+    or writes it. A missing table means an empty one: nothing is reported
+    as malicious until it is compiled.
+    """
+
+    def __init__(self, table_path=None):
+        self.table_path = table_path or config.THREAT_INTEL_DB
+        self.table = (np.zeros(0, np.uint32), np.zeros(0, np.uint32), np.zeros(BITMAP_BYTES, np.uint8))
+        self.table_id = None
+        self.checked_at = 0.0
+        self.reload()
+        RANGES.set_function(lambda: len(self.table[0]))
+        print(f"🧠 Threat intel loaded ({len(self):,} ranges)")
+
+    def reload(self):
+        """Map the table if it was replaced since the last look; returns True if the table changed"""
+        self.checked_at = time.monotonic()
+        try:
+            stat = os.stat(self.table_path)
+        except FileNotFoundError:
+            return False
+
+        table_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if table_id == self.table_id:
+            return False
+        # One reference swap: concurrent lookups keep using the tuple they already read
+        self.table = _map_table(self.table_path)
+        self.table_id = table_id
+        RELOADS.inc()
+        return True
+
+    def maybe_reload(self):
+        """Reload if the check interval has passed"""
+        if time.monotonic() - self.checked_at >= config.THREAT_INTEL_RELOAD_INTERVAL:
+            try:
+                self.reload()
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Threat intel reload failed: {e}")
+
+    def lookup_batch(self, ips):
+        """Boolean array: which of `ips` (strings or uint32 addresses) are listed"""
+        self.maybe_reload()
+        starts, ends, bitmap = self.table
+        if isinstance(ips, np.ndarray):
+            addrs = ips.astype(np.int64, copy=False)
+        else:
+            addrs = np.fromiter((ip_to_int(ip) for ip in ips), dtype=np.int64, count=len(ips))
+        listed = np.zeros(len(addrs), dtype=bool)
+        if not len(starts) or not len(addrs):
+            return listed
+
+        # The /24 bitmap rejects most clean addresses before any binary search
+        valid = np.flatnonzero(addrs >= 0)
+        prefix = addrs[valid] >> 8
+        candidates = valid[(bitmap[prefix >> 3] >> (prefix & 7)) & 1 == 1]
+        if len(candidates):
+            probe = addrs[candidates].astype(np.uint32)  # same dtype as the table, or searchsorted copies it
+            index = np.searchsorted(starts, probe, side='right') - 1
+            inside = (index >= 0) & (ends[np.maximum(index, 0)] >= probe)
+            listed[candidates[inside]] = True
+
+        hits = int(listed.sum())
+        if hits:
+            LOOKUPS.labels('listed').inc(hits)
+        LOOKUPS.labels('clean').inc(len(addrs) - hits)
+        return listed
+
+    def contains(self, ip):
+        """Whether a single address is listed (scalar path, no array setup)"""
+        self.maybe_reload()
+        starts, ends, bitmap = self.table
+        address = ip_to_int(ip)
+        prefix = address >> 8
+        listed = (
+            address >= 0 and len(starts) > 0
+            and bitmap[prefix >> 3] >> (prefix & 7) & 1 == 1
+            and ends[max(int(starts.searchsorted(np.uint32(address), side='right')) - 1, 0)] >= address
+            and starts[0] <= address
+        )
+        LOOKUPS.labels('listed' if listed else 'clean').inc()
+        return bool(listed)
+
+    def __len__(self):
+        return len(self.table[0])
+
+    def get_stats(self):
+        """Get threat-intel statistics"""
+        starts, ends, _ = self.table
+        return {
+            'ranges': len(starts),
+            'addresses': int((ends.astype(np.int64) - starts + 1).sum()) if len(starts) else 0,
+            'table': self.table_path
+        }
+
+
+_shared = None
+
+
+def get_threat_intel():
+    """The process-wide ThreatIntel instance"""
+    global _shared
+    if _shared is None:
+        _shared = ThreatIntel()
+    return _shared
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile or query the threat-intel table")
+    commands = parser.add_subparsers(dest='command', required=True)
+    compile_cmd = commands.add_parser('compile', help="compile a text feed into the binary table")
+    compile_cmd.add_argument('feed', nargs='?', default=config.THREAT_INTEL_FEED)
+    compile_cmd.add_argument('--out', default=None)
+    lookup_cmd = commands.add_parser('lookup', help="check addresses against the table")
+    lookup_cmd.add_argument('ips', nargs='+')
+    args = parser.parse_args()
+
+    if args.command == 'compile':
+        started = time.perf_counter()
+        count = compile_feed(args.feed, args.out)
+        print(f"Compiled {count:,} ranges in {time.perf_counter() - started:.2f}s")
+    else:
+        intel = ThreatIntel()
+        for ip, listed in zip(args.ips, intel.lookup_batch(args.ips)):
+            print(f"{ip}\t{'LISTED' if listed else 'clean'}")
+
+
+if __name__ == '__main__':
+    main()
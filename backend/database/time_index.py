@@ -0,0 +1,144 @@
+"""
+Time-ordered event index with segment boundaries
+"""
+from bisect import bisect_left, bisect_right
+import config
+from core import clock
+
+
+class TimeIndex:
+    """Events ordered by epoch timestamp, split into fixed-size segments.
+
+    Each segment holds parallel `times`/`records` lists; `starts` keeps each
+    segment's first timestamp and `offsets` the absolute position of its
+    first event. A range query bisects to the first segment, then inside
+    it, and walks forward: O(log n + k). Counting needs only the two
+    bisects, so counts and rates never touch the records at all.
+    """
+
+    def __init__(self, segment_size=None, on_drop=None):
+        self.segment_size = segment_size or config.TIME_INDEX_SEGMENT_SIZE
+        self.on_drop = on_drop  # called with the records of each evicted segment
+        self.segments = []  # [times, records]
+        self.starts = []
+        self.offsets = []
+        self.size = 0
+
+    def append(self, record, ts=None):
+        """Add an event; in-order appends are O(1)"""
+        ts = clock.time() if ts is None else ts
+        segments = self.segments
+
+        if segments and ts < segments[-1][0][-1]:
+            self._insert_late(record, ts)
+        else:
+            if not segments or len(segments[-1][0]) >= self.segment_size:
+                segments.append([[], []])
+                self.starts.append(ts)
+                self.offsets.append(self.offsets[-1] + len(segments[-2][0]) if len(segments) > 1 else 0)
+            segments[-1][0].append(ts)
+            segments[-1][1].append(record)
+        self.size += 1
+
+    def _insert_late(self, record, ts):
+        """Slot an out-of-order event into its segment (rare)"""
+        i = max(0, bisect_right(self.starts, ts) - 1)
+        times, records = self.segments[i]
+        pos = bisect_right(times, ts)
+        times.insert(pos, ts)
+        records.insert(pos, record)
+        self.starts[i] = times[0]
+        for j in range(i + 1, len(self.offsets)):
+            self.offsets[j] += 1
+
+    def _locate(self, ts):
+        """(segment, position in it) of the first event at or after `ts`.
+
+        Equal timestamps can run across segment boundaries (every event of
+        a tick shares one clock reading), so start from the last segment
+        that begins strictly before `ts`, and move to the next one if `ts`
+        lies past its end.
+        """
+        i = max(0, bisect_left(self.starts, ts) - 1)
+        times = self.segments[i][0]
+        pos = bisect_left(times, ts)
+        if pos == len(times) and i + 1 < len(self.segments):
+            return i + 1, 0
+        return i, pos
+
+    def _position(self, ts):
+        """Absolute position of the first event at or after `ts`"""
+        if not self.segments:
+            return 0
+        i, pos = self._locate(ts)
+        return self.offsets[i] + pos
+
+    def count_between(self, since=None, until=None):
+        """Number of events with since <= t < until, in O(log n)"""
+        if not self.segments:
+            return 0
+        start = self.offsets[0] if since is None else self._position(since)
+        end = self.offsets[0] + self.size if until is None else self._position(until)
+        return max(0, end - start)
+
+    def range(self, since=None, until=None, limit=None):
+        """Events with since <= t < until, oldest first"""
+        if not self.segments:
+            return []
+        i, lo = (0, 0) if since is None else self._locate(since)
+        results = []
+        for times, records in self.segments[i:]:
+            hi = len(times) if until is None else bisect_left(times, until)
+            results.extend(records[lo:hi])
+            if limit is not None and len(results) >= limit:
+                return results[:limit]
+            if hi < len(times):
+                break
+            lo = 0
+        return results
+
+    def evict_before(self, cutoff):
+        """Drop whole segments whose newest event is older than `cutoff`"""
+        dropped = 0
+        while len(self.segments) > 1 and self.segments[0][0][-1] < cutoff:
+            dropped += self._drop_first()
+        return dropped
+
+    def evict_oldest(self, max_size):
+        """Drop whole segments until at most one segment over `max_size` remains"""
+        dropped = 0
+        while len(self.segments) > 1 and self.size - len(self.segments[0][0]) >= max_size:
+            dropped += self._drop_first()
+        return dropped
+
+    def _drop_first(self):
+        times, records = self.segments.pop(0)
+        self.starts.pop(0)
+        self.offsets.pop(0)
+        self.size -= len(times)
+        if self.on_drop:
+            self.on_drop(records)
+        return len(times)
+
+    @property
+    def first_time(self):
+        """Timestamp of the oldest retained event"""
+        return self.starts[0] if self.starts else None
+
+    def recent(self, count=10):
+        """The newest `count` events, oldest first"""
+        results = []
+        if count <= 0:
+            return results
+        for _, records in reversed(self.segments):
+            results[:0] = records[-(count - len(results)):]
+            if len(results) >= count:
+                break
+        return results
+
+    def __iter__(self):
+        for _, records in self.segments:
+            yield from records
+
+    def __len__(self):
+        return self.size
@@ -0,0 +1,493 @@
+"""
+Traffic Archive - append-only columnar segments with memory-mapped readers
+
+Traffic is buffered in an in-memory active segment and sealed to disk
+when it reaches ARCHIVE_SEGMENT_ROWS rows or ARCHIVE_SEGMENT_SECONDS of
+age. A sealed segment is one immutable file:
+
+    header   magic, version, flags, rows, then the segment index:
+             min/max timestamp, min/max source IP, min/max destination IP,
+             suspicious row count                       (64 bytes)
+    columns  timestamp f8 | source_ip u4 | destination_ip u4 | bytes u4
+             | port u2 | protocol u1 | suspicious_type u1, each 8-aligned
+
+Readers check the header index first and skip segments outside a query's
+time range or IP bounds; matching segments are np.memmap'ed and, since
+rows are normally in time order, the time range is found by binary search
+so only the pages holding matching rows are read. Retention deletes whole
+segment files (ARCHIVE_RETENTION_SECONDS, ARCHIVE_MAX_BYTES).
+
+Each directory has one writer, enforced by a lock file (retention
+deletes segments, so a second writer could delete files the first one
+indexed). Shard workers write to shards/<subnet>/
+below the archive directory; read-only archives index those too, so one
+reader sees every site's traffic.
+
+Usage (from backend/):
+    python -m database.traffic_archive stats
+    python -m database.traffic_archive query --minutes 60 --ip 10.0.0.5
+"""
+import argparse
+import atexit
+import fcntl
+import itertools
+import json
+import os
+import socket
+import struct
+import threading
+import weakref
+from datetime import datetime
+
+import numpy as np
+import config
+from core import clock
+from database.records import Protocol
+from database.threat_intel import ip_to_int
+
+MAGIC = b'TSEG'
+VERSION = 1
+SORTED = 1
+HEADER = struct.Struct('<4sHHIddIIIII')
+HEADER_SIZE = 64
+SHARD_DIR = 'shards'  # per-subnet archives written by shard workers
+WRITER_LOCK = '.writer.lock'
+
+COLUMNS = [
+    ('timestamp', np.dtype('<f8')),
+    ('source_ip', np.dtype('<u4')),
+    ('destination_ip', np.dtype('<u4')),
+    ('bytes', np.dtype('<u4')),
+    ('port', np.dtype('<u2')),
+    ('protocol', np.dtype('u1')),
+    ('suspicious_type', np.dtype('u1')),
+]
+
+# suspicious_type codes: 0 = clean, 1.. = index + 1 in this list, 255 = any other label
+PROTOCOLS = list(Protocol)
+SUSPICIOUS_TYPES = ['Port Scan', 'Brute Force', 'Data Exfiltration', 'Malware Beacon', 'DDoS',
+                    'Credential Stuffing', 'Host Sweep', 'Known Malicious IP']
+OTHER = 255
+_PROTOCOL_CODES = {p: i for i, p in enumerate(PROTOCOLS)}
+_TYPE_CODES = {t: i + 1 for i, t in enumerate(SUSPICIOUS_TYPES)}
+
+
+def _layout(rows):
+    """Byte offset of each column in a segment of `rows` rows, and the file size"""
+    offsets, offset = {}, HEADER_SIZE
+    for name, dtype in COLUMNS:
+        offsets[name] = offset
+        offset += -(-rows * dtype.itemsize // 8) * 8
+    return offsets, offset
+
+
+def int_to_ip(value):
+    return socket.inet_ntoa(struct.pack('!I', int(value)))
+
+
+def _type_label(code):
+    if code == 0:
+        return None
+    return SUSPICIOUS_TYPES[code - 1] if code <= len(SUSPICIOUS_TYPES) else 'Suspicious Traffic'
+
+
+# Writers still open at interpreter exit get their active segment sealed, so
+# short runs (a scenario replay, a CLI session) never lose buffered rows
+_WRITERS = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_writers():
+    for archive in list(_WRITERS):
+        try:
+            archive.flush()
+        except Exception as e:
+            print(f"⚠️ Traffic archive flush failed: {e}")
+
+
+class Segment:
+    """Index entry for one sealed segment; columns are mapped on first use"""
+
+    def __init__(self, path, rows, flags, min_ts, max_ts, min_src, max_src, min_dst, max_dst, suspicious):
+        self.path = path
+        self.rows = rows
+        self.sorted = bool(flags & SORTED)
+        self.min_ts, self.max_ts = min_ts, max_ts
+        self.min_src, self.max_src = min_src, max_src
+        self.min_dst, self.max_dst = min_dst, max_dst
+        self.suspicious = suspicious
+        self.size = _layout(rows)[1]
+        self._columns = None
+
+    @classmethod
+    def open(cls, path):
+        """Read just the header of a segment file"""
+        with open(path, 'rb') as f:
+            magic, version, flags, rows, *index = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a traffic segment")
+        return cls(path, rows, flags, *index)
+
+    def columns(self):
+        """Read-only column views over a mapping of the file"""
+        if self._columns is None:
+            data = np.memmap(self.path, dtype=np.uint8, mode='r').view(np.ndarray)
+            offsets = _layout(self.rows)[0]
+            self._columns = {
+                name: data[offsets[name]:offsets[name] + self.rows * dtype.itemsize].view(dtype)
+                for name, dtype in COLUMNS
+            }
+        return self._columns
+
+    def may_contain(self, since, until, ip):
+        """False if the index rules this segment out"""
+        if since is not None and self.max_ts < since:
+            return False
+        if until is not None and self.min_ts >= until:
+            return False
+        if ip is not None and not (self.min_src <= ip <= self.max_src or self.min_dst <= ip <= self.max_dst):
+            return False
+        return True
+
+
+class TrafficArchive:
+    """Append-only traffic history in a directory of columnar segments.
+
+    One process writes (append_batch); opening a second writer on a
+    directory raises RuntimeError until the first is closed. Any number of
+    processes can open the same directory with writer=False to query it,
+    picking up newly sealed segments on each query. The active segment is
+    only visible to the writing process until it is sealed: flush() seals
+    it early, as do close(), leaving a `with` block and interpreter exit.
+    """
+
+    def __init__(self, directory=None, writer=True):
+        self.directory = directory or config.ARCHIVE_DIR
+        self.writer = writer
+        self.segments = []  # sealed, oldest first
+        self.lock = threading.Lock()
+        self.written = 0
+        self.deleted = 0
+        self._names = itertools.count()
+        os.makedirs(self.directory, exist_ok=True)
+        if writer:
+            self._lock_writer()
+        self.refresh()
+        if writer:
+            self._new_active()
+            _WRITERS.add(self)
+            print(f"🗄️ Traffic archive at {self.directory} ({len(self.segments)} segments)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _lock_writer(self):
+        """Take the directory's writer lock (held until close() or process exit)"""
+        self._writer_lock = open(os.path.join(self.directory, WRITER_LOCK), 'a')
+        try:
+            fcntl.flock(self._writer_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._writer_lock.close()
+            raise RuntimeError(f"{self.directory} already has a writer") from None
+
+    def close(self):
+        """Seal the active segment and release the writer lock; the archive stays readable"""
+        if not self.writer:
+            return
+        self.flush()
+        self.writer = False
+        _WRITERS.discard(self)
+        self._writer_lock.close()
+
+    def _directories(self):
+        """Directories to index: this one, plus the shard archives below it when only reading"""
+        directories = [self.directory]
+        shards = os.path.join(self.directory, SHARD_DIR)
+        if not self.writer and os.path.isdir(shards):
+            # A writer never indexes them: its retention would delete another writer's segments
+            directories += [os.path.join(shards, name) for name in sorted(os.listdir(shards))
+                            if os.path.isdir(os.path.join(shards, name))]
+        return directories
+
+    def refresh(self):
+        """Index segment files that appeared since the last look (other writers, restarts)"""
+        known = {s.path for s in self.segments}
+        found = []
+        for directory in self._directories():
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                if name.endswith('.seg') and path not in known:
+                    try:
+                        found.append(Segment.open(path))
+                    except (OSError, ValueError, struct.error):
+                        continue
+        with self.lock:
+            live = [s for s in self.segments if os.path.exists(s.path)]
+            self.segments = sorted(live + found, key=lambda s: (s.min_ts, s.path))
+
+    # Writing
+
+    def _new_active(self):
+        capacity = config.ARCHIVE_SEGMENT_ROWS
+        self.active = {name: np.zeros(capacity, dtype) for name, dtype in COLUMNS}
+        self.active_rows = 0
+        self.active_started = clock.time()
+        self.active_sorted = True
+
+    def append_batch(self, records):
+        """Archive traffic records (TrafficRecords, or dicts with the same keys and epoch timestamps)"""
+        with self.lock:
+            for record in records:
+                if (self.active_rows >= config.ARCHIVE_SEGMENT_ROWS
+                        or clock.time() - self.active_started >= config.ARCHIVE_SEGMENT_SECONDS):
+                    self._seal()
+                self._append(record)
+
+    def _append(self, record):
+        i = self.active_rows
+        active = self.active
+        ts = record.get('timestamp')
+        ts = clock.time() if ts is None else ts
+        if i and ts < active['timestamp'][i - 1]:
+            self.active_sorted = False
+        active['timestamp'][i] = ts
+        active['source_ip'][i] = max(ip_to_int(record.get('source_ip')), 0)
+        active['destination_ip'][i] = max(ip_to_int(record.get('destination_ip')), 0)
+        active['bytes'][i] = min(max(record.get('bytes', 0), 0), 0xFFFFFFFF)
+        active['port'][i] = record.get('port', 0) & 0xFFFF
+        active['protocol'][i] = _PROTOCOL_CODES.get(Protocol.parse(record.get('protocol')), OTHER)
+        if record.get('is_suspicious'):
+            active['suspicious_type'][i] = _TYPE_CODES.get(record.get('suspicious_type'), OTHER)
+        else:
+            active['suspicious_type'][i] = 0
+        self.active_rows = i + 1
+        self.written += 1
+
+    def flush(self):
+        """Seal the active segment now (e.g. at shutdown)"""
+        with self.lock:
+            self._seal()
+
+    def _seal(self):
+        """Write the active rows as an immutable segment, then apply retention"""
+        rows = self.active_rows
+        if rows:
+            columns = {name: self.active[name][:rows] for name, _ in COLUMNS}
+            ts, src, dst = columns['timestamp'], columns['source_ip'], columns['destination_ip']
+            index = (float(ts.min()), float(ts.max()), int(src.min()), int(src.max()),
+                     int(dst.min()), int(dst.max()), int(np.count_nonzero(columns['suspicious_type'])))
+            flags = SORTED if self.active_sorted else 0
+
+            name = f"traffic-{int(self.active_started)}-{os.getpid()}-{next(self._names)}.seg"
+            path = os.path.join(self.directory, name)
+            offsets, size = _layout(rows)
+            with open(f"{path}.tmp", 'wb') as f:
+                f.write(HEADER.pack(MAGIC, VERSION, flags, rows, *index).ljust(HEADER_SIZE, b'\0'))
+                for column, dtype in COLUMNS:
+                    f.seek(offsets[column])
+                    f.write(columns[column].astype(dtype, copy=False).tobytes())
+                f.truncate(size)
+            os.replace(f"{path}.tmp", path)  # readers never see a half-written segment
+            self.segments.append(Segment(path, rows, flags, *index))
+        self._new_active()
+        self._enforce_retention()
+
+    def _enforce_retention(self):
+        """Delete whole segments past the retention age or the size budget, oldest first"""
+        cutoff = clock.time() - config.ARCHIVE_RETENTION_SECONDS
+        total = sum(s.size for s in self.segments)
+        while self.segments and (self.segments[0].max_ts < cutoff or total > config.ARCHIVE_MAX_BYTES):
+            segment = self.segments.pop(0)
+            total -= segment.size
+            try:
+                os.remove(segment.path)  # processes that mapped it keep reading the old inode
+            except FileNotFoundError:
+                pass
+            self.deleted += 1
+
+    # Reading
+
+    def scan(self, since=None, until=None, ip=None, suspicious=None):
+        """Yield (columns, stats) of matching rows per segment, oldest first.
+
+        `ip` matches either direction; `suspicious` is True/False to keep
+        only flagged/clean rows. stats counts segments skipped by the index.
+        """
+        for columns, _, stats in self._scan(since, until, ip, suspicious):
+            yield columns, stats
+
+    def _scan(self, since, until, ip, suspicious):
+        """scan(), also yielding whether each chunk's rows are in time order"""
+        if not self.writer:
+            self.refresh()
+        address = None
+        if ip is not None:
+            address = ip_to_int(ip)
+            if address < 0:
+                raise ValueError(f"Invalid IP address '{ip}'")
+
+        with self.lock:
+            segments = list(self.segments)
+            active = None
+            if self.writer and self.active_rows:
+                rows = self.active_rows
+                active = {name: self.active[name][:rows].copy() for name, _ in COLUMNS}
+                active_sorted = self.active_sorted
+
+        stats = {'segments': len(segments) + (active is not None), 'scanned': 0, 'skipped': 0}
+        sources = [(s, None) for s in segments] + ([(None, active)] if active is not None else [])
+        for segment, columns in sources:
+            if segment is not None:
+                if not segment.may_contain(since, until, address):
+                    stats['skipped'] += 1
+                    continue
+                try:
+                    columns, ordered = segment.columns(), segment.sorted
+                except FileNotFoundError:  # deleted by retention since it was indexed
+                    continue
+            else:
+                ordered = active_sorted
+            stats['scanned'] += 1
+            selected = self._select(columns, ordered, since, until, address, suspicious)
+            if selected is not None and len(selected['timestamp']):
+                yield selected, ordered, stats
+
+    @staticmethod
+    def _select(columns, ordered, since, until, address, suspicious):
+        ts = columns['timestamp']
+        lo, hi = 0, len(ts)
+        if ordered:
+            # Binary search touches only a few pages of the timestamp column
+            if since is not None:
+                lo = int(np.searchsorted(ts, since, side='left'))
+            if until is not None:
+                hi = int(np.searchsorted(ts, until, side='left'))
+            if lo >= hi:
+                return None
+        mask = None
+        if not ordered and (since is not None or until is not None):
+            window = ts[lo:hi]
+            mask = np.ones(hi - lo, dtype=bool)
+            if since is not None:
+                mask &= window >= since
+            if until is not None:
+                mask &= window < until
+        if address is not None:
+            hit = (columns['source_ip'][lo:hi] == address) | (columns['destination_ip'][lo:hi] == address)
+            mask = hit if mask is None else mask & hit
+        if suspicious is not None:
+            flagged = columns['suspicious_type'][lo:hi] != 0
+            hit = flagged if suspicious else ~flagged
+            mask = hit if mask is None else mask & hit
+        if mask is None:
+            return {name: column[lo:hi] for name, column in columns.items()}
+        rows = np.flatnonzero(mask) + lo
+        return {name: column[rows] for name, column in columns.items()}
+
+    def query(self, since=None, until=None, ip=None, suspicious=None, limit=1000):
+        """Matching traffic as dicts in the TrafficRecord JSON shape, the newest `limit` rows, oldest first"""
+        # Segments can overlap in time (shards, out-of-order writes), so each one offers its
+        # newest `limit` rows and the merged candidates are ordered by timestamp
+        tails = []
+        for columns, ordered, _ in self._scan(since, until, ip, suspicious):
+            n = len(columns['timestamp'])
+            if limit is not None and n > limit:
+                if ordered:
+                    columns = {name: column[n - limit:] for name, column in columns.items()}
+                else:
+                    rows = np.argpartition(columns['timestamp'], n - limit)[n - limit:]
+                    columns = {name: column[rows] for name, column in columns.items()}
+            tails.append(columns)
+        if not tails:
+            return []
+        merged = {name: np.concatenate([columns[name] for columns in tails]) for name, _ in COLUMNS}
+        order = np.argsort(merged['timestamp'], kind='stable')
+        if limit is not None:
+            order = order[-limit:]
+        return [self._row(merged, i) for i in order]
+
+    @staticmethod
+    def _row(columns, i):
+        code = int(columns['suspicious_type'][i])
+        protocol = int(columns['protocol'][i])
+        row = {
+            'timestamp': datetime.fromtimestamp(float(columns['timestamp'][i])).isoformat(),
+            'source_ip': int_to_ip(columns['source_ip'][i]),
+            'destination_ip': int_to_ip(columns['destination_ip'][i]),
+            'protocol': PROTOCOLS[protocol].value if protocol < len(PROTOCOLS) else 'Unknown',
+            'port': int(columns['port'][i]),
+            'bytes': int(columns['bytes'][i]),
+            'is_suspicious': code != 0
+        }
+        if code:
+            row['suspicious_type'] = _type_label(code)
+        return row
+
+    def summarize(self, since=None, until=None, ip=None, suspicious=None):
+        """Packet, byte and per-type/per-protocol totals, computed column-wise"""
+        packets = total_bytes = 0
+        by_type = np.zeros(256, dtype=np.int64)
+        by_protocol = np.zeros(256, dtype=np.int64)
+        stats = {'segments': 0, 'scanned': 0, 'skipped': 0}
+        for columns, stats in self.scan(since, until, ip, suspicious):
+            packets += len(columns['timestamp'])
+            total_bytes += int(columns['bytes'].sum(dtype=np.int64))
+            by_type += np.bincount(columns['suspicious_type'], minlength=256)
+            by_protocol += np.bincount(columns['protocol'], minlength=256)
+        return {
+            'packets': packets,
+            'bytes': total_bytes,
+            'suspicious_packets': int(by_type[1:].sum()),
+            'by_type': {_type_label(code): int(n) for code, n in enumerate(by_type) if code and n},
+            'by_protocol': {(PROTOCOLS[code].value if code < len(PROTOCOLS) else 'Unknown'): int(n)
+                            for code, n in enumerate(by_protocol) if n},
+            'segments': stats
+        }
+
+    def get_stats(self):
+        """Get archive statistics"""
+        segments = list(self.segments)
+        return {
+            'directory': self.directory,
+            'segments': len(segments),
+            'bytes': sum(s.size for s in segments),
+            'sealed_rows': sum(s.rows for s in segments),
+            'active_rows': self.active_rows if self.writer else None,
+            'written': self.written,
+            'deleted_segments': self.deleted,
+            'oldest': datetime.fromtimestamp(segments[0].min_ts).isoformat() if segments else None,
+            'newest': datetime.fromtimestamp(segments[-1].max_ts).isoformat() if segments else None
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the traffic archive")
+    parser.add_argument('--dir', default=None)
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('stats')
+    for name in ('query', 'summary'):
+        cmd = commands.add_parser(name)
+        cmd.add_argument('--minutes', type=float, default=60, help="look back this far")
+        cmd.add_argument('--ip', default=None)
+        cmd.add_argument('--suspicious', action='store_true')
+        cmd.add_argument('--limit', type=int, default=50)
+    args = parser.parse_args()
+
+    archive = TrafficArchive(args.dir, writer=False)
+    if args.command == 'stats':
+        result = archive.get_stats()
+    else:
+        since = clock.time() - args.minutes * 60
+        suspicious = True if args.suspicious else None
+        if args.command == 'query':
+            result = archive.query(since, None, args.ip, suspicious, args.limit)
+        else:
+            result = archive.summarize(since, None, args.ip, suspicious)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,22 +1,44 @@
-from fastapi import FastAPI, WebSocket, HTTPException
+from fastapi import FastAPI, WebSocket, HTTPException, Request, Header, Depends
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional
-from datetime import datetime
+from typing import Any, Dict, List, Optional
 import asyncio
+import itertools
 import json
 import uvicorn
 import random
 import time
 import threading
+import secrets
 
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 
+from agents.threat_correlator import ThreatCorrelator
+from database.iot_db import IoTDatabase
+from database.records import ActionRecord, DeviceRecord, Status, ThreatRecord
+from database.retention import RetentionStore
+from database.threat_intel import FeedCompiler
+from database.traffic_archive import TrafficArchive
+from core import clock, serialization
+from core.broadcaster import Broadcaster
+from core.event_stream import EventStream
+from core.jobs import JobManager
+from core.sharding import ShardCoordinator
+from core.state import ChangeFeed
+from core.metrics import REGISTRY, CONTENT_TYPE
+from core.profiler import LoopLagMonitor, SamplingProfiler
+import config
+
 # Lifespan context manager for startup/shutdown events
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    lag_monitor.start()
+    intel_compiler.start()
+    broadcaster.start()
+    shards.start()
     asyncio.create_task(simulate_background_activity())
     print("=" * 60)
     print("🚀 Guardian AI IoT Security System STARTED!")
@@ -27,10 +49,26 @@ async def lifespan(app: FastAPI):
     print("=" * 60)
     yield
     # Shutdown
+    await jobs.stop()
+    await asyncio.to_thread(shards.stop)
+    await asyncio.to_thread(history_db.close)
+    await broadcaster.stop()
+    await asyncio.to_thread(intel_compiler.stop)
+    lag_monitor.stop()
     print("🛑 System shutting down...")
 
+class FastJSONResponse(Response):
+    """JSON response encoded with orjson; pre-encoded bytes pass straight through"""
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return serialization.dumps(content)
+
 # Create app with lifespan
-app = FastAPI(title="Guardian AI IoT Security", version="1.0.0", lifespan=lifespan)
+app = FastAPI(title="Guardian AI IoT Security", version="1.0.0", lifespan=lifespan,
+              default_response_class=FastJSONResponse)
 
 # 🔧 FIXED CORS - Allow Vite port 5173
 app.add_middleware(
@@ -41,11 +79,98 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# In-memory storage (no MongoDB needed)
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Per-route latency and status counts, labelled by route template to keep cardinality bounded"""
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        REQUEST_LATENCY.labels("api", request.method, path).observe(time.perf_counter() - started)
+        REQUEST_COUNT.labels("api", request.method, path, str(status)).inc()
+
+# In-memory storage (no MongoDB needed); compact records, converted to JSON at the API boundary
 devices_db = []
-threats_db = []
-actions_db = []
-websocket_connections = []
+# Threat and action history keeps a bounded hot window plus rollups
+# Threats leaving the hot window are gone from the snapshot, so clients are told to drop them
+threats_db = RetentionStore("threats", on_evict=lambda evicted: mark_changed(threats=[t["id"] for t in evicted]))
+actions_db = RetentionStore("actions", type_key="action_type", severity_key=None)
+# Sequence suffix for action ids: several actions can land in the same second
+action_ids = itertools.count(1)
+# WebSocket clients get coalesced batches at most config.WS_MAX_RATE times a second
+broadcaster = Broadcaster()
+# Every event, in order, for SSE subscribers (replayable after a reconnect)
+event_stream = EventStream()
+
+# Indexed SQLite history with a read-only connection pool and a write-invalidated cache
+history_db = IoTDatabase()
+
+# Per-site pipelines in worker processes when config.SHARD_SUBNETS is set
+shards = ShardCoordinator()
+
+# Recompiles the threat-intel table off the lookup path when the feed changes
+intel_compiler = FeedCompiler()
+
+# Traffic history sealed to disk by the simulators, queried read-only
+traffic_archive = TrafficArchive(writer=False)
+
+# Folds repeated threats (same source, target and type) into incidents
+correlator = ThreatCorrelator()
+
+# Encoded list payloads, reused until the collection behind them changes
+response_cache = serialization.EncodedCache()
+# Version of the device/threat/action state, with a log of which ids changed, for /api/changes
+change_feed = ChangeFeed()
+# Encoded deltas per `since` version, valid until the next change
+delta_cache = serialization.EncodedCache()
+
+# Runtime metrics, scraped from /metrics
+REQUEST_LATENCY = REGISTRY.histogram("http_request_duration_seconds", "HTTP request latency by route",
+                                     ["server", "method", "route"])
+REQUEST_COUNT = REGISTRY.counter("http_requests_total", "HTTP requests by route and status",
+                                 ["server", "method", "route", "status"])
+TICK_SECONDS = REGISTRY.histogram("simulation_tick_seconds", "Duration of one simulation tick", ["simulator"])
+STORE_SIZE = REGISTRY.gauge("store_records", "Records currently held per store", ["store"])
+WS_CLIENTS = REGISTRY.gauge("websocket_clients", "Connected WebSocket clients")
+WS_SEND_QUEUE = REGISTRY.gauge("websocket_send_queue_depth", "WebSocket events waiting to be sent")
+
+WS_CLIENTS.set_function(lambda: len(broadcaster.clients))
+WS_SEND_QUEUE.set_function(broadcaster.queued)
+STORE_SIZE.labels("devices").set_function(lambda: len(devices_db))
+STORE_SIZE.labels("threats").set_function(lambda: len(threats_db))
+STORE_SIZE.labels("actions").set_function(lambda: len(actions_db))
+STORE_SIZE.labels("open_incidents").set_function(lambda: len(correlator.open_incidents))
+
+# Diagnostics: stalls of the event loop are recorded with the blocking stack
+lag_monitor = LoopLagMonitor()
+profiler = SamplingProfiler()
+
+def mark_changed(*collections, **changed_ids):
+    """Drop cached encodings after a store mutates and advance the change feed.
+
+    Positional names mark a whole collection as changed; keywords name the
+    ids that changed, e.g. mark_changed(devices=[device.id]).
+    """
+    response_cache.invalidate(*collections, *changed_ids, "snapshot")
+    delta_cache.invalidate()
+    for collection in collections:
+        change_feed.mark(collection)
+    for collection, ids in changed_ids.items():
+        change_feed.mark(collection, ids)
+
+def broadcast(message, key=None):
+    """Publish an event: appended to the SSE stream, and queued for WebSocket clients, where
+    events sharing a key before the next batch collapse to the latest"""
+    event_stream.publish(message)
+    broadcaster.publish(message, key)
+
+# Scans run in the background; progress goes out through broadcast() keyed per job
+jobs = JobManager(notify=broadcast)
 
 # Data Models
 class Device(BaseModel):
@@ -79,18 +204,117 @@ class Action(BaseModel):
     timestamp: str
     status: str = "completed"
 
+class BulkRequest(BaseModel):
+    """Selects records by id, by filter (see RecordMixin.compile_filter), or both"""
+    ids: List[str] = []
+    filter: Dict[str, Any] = {}
+    dry_run: bool = False
+
+def select_records(records, record_type, request):
+    """One pass over `records`: listed ids (if any) that also match the filter (if any)"""
+    if not request.ids and not request.filter:
+        raise HTTPException(status_code=400, detail="Give ids, a filter, or both")
+    try:
+        matches = record_type.compile_filter(request.filter) if request.filter else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    ids = set(request.ids) if request.ids else None
+    return [r for r in records if (ids is None or r.id in ids) and (matches is None or matches(r))]
+
+def new_action_id():
+    return f"action_{int(clock.time())}_{next(action_ids)}"
+
+def record_bulk_action(action_type, verb, noun, ids):
+    """One compound action record for a bulk change"""
+    shown = ", ".join(ids[:10]) + (f" and {len(ids) - 10} more" if len(ids) > 10 else "")
+    action = ActionRecord.from_dict({
+        "id": new_action_id(),
+        "action_type": action_type,
+        "target": f"{len(ids)} {noun}",
+        "description": f"{verb} {len(ids)} {noun}: {shown}",
+        "timestamp": clock.time(),
+        "status": "completed"
+    })
+    actions_db.append(action)
+    return action
+
 # WebSocket endpoint
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    await websocket.accept()
-    websocket_connections.append(websocket)
+    # Offer Sec-WebSocket-Protocol "msgpack" (or ?encoding=msgpack) for binary batches
+    client = await broadcaster.connect(websocket)
     try:
         while True:
             data = await websocket.receive_text()
             # Echo for testing
             await websocket.send_text(f"Message received: {data}")
     except:
-        websocket_connections.remove(websocket)
+        broadcaster.disconnect(client)
+
+@app.get("/api/events")
+async def stream_events(request: Request, last_event_id: Optional[int] = None, types: Optional[str] = None):
+    """Server-Sent Events; a Last-Event-ID header (or ?last_event_id=) replays what was missed"""
+    header = request.headers.get("last-event-id")
+    if header is not None:
+        try:
+            last_event_id = int(header)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Last-Event-ID must be an event id")
+    wanted = set(types.split(",")) if types else None
+    return StreamingResponse(event_stream.subscribe(last_event_id, wanted), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/api/events/stats")
+async def get_event_stream_stats():
+    """SSE subscribers and the id range still available for replay"""
+    return event_stream.get_stats()
+
+@app.get("/api/ws/stats")
+async def get_websocket_stats():
+    """Connected clients by encoding and events waiting to be sent"""
+    return broadcaster.get_stats()
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of the runtime metrics"""
+    return Response(REGISTRY.render(), headers={"Content-Type": CONTENT_TYPE})
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Admin endpoints need an X-Admin-Token header matching config.ADMIN_TOKEN"""
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (set IOT_ADMIN_TOKEN)")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, config.ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+@app.get("/api/admin/loop-lag", dependencies=[Depends(require_admin)])
+async def get_loop_lag():
+    """Event-loop lag and the stacks of recent stalls"""
+    return lag_monitor.get_stats()
+
+@app.post("/api/admin/profile", dependencies=[Depends(require_admin)])
+async def run_profiler(seconds: float = 5, format: str = "folded"):
+    """Sample all threads for N seconds; returns folded stacks (flamegraph.pl/speedscope) or JSON"""
+    if not 0 < seconds <= config.PROFILER_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be in (0, {config.PROFILER_MAX_SECONDS}]")
+    if profiler.busy:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    
+    # Sample from a worker thread so the loop keeps serving (and shows up in the profile)
+    try:
+        result = await asyncio.to_thread(profiler.profile, seconds)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    if format == "json":
+        return {
+            "seconds": result["seconds"],
+            "samples": result["samples"],
+            "stacks": dict(result["stacks"].most_common())
+        }
+    return Response(SamplingProfiler.folded(result), headers={
+        "Content-Type": "text/plain; charset=utf-8",
+        "Content-Disposition": f'attachment; filename="profile-{int(time.time())}.folded"'
+    })
 
 # 🔧 API Routes
 @app.get("/")
@@ -108,23 +332,26 @@ async def test_connection():
     return {
         "status": "connected", 
         "message": "Backend is working!",
-        "timestamp": datetime.now().isoformat()
+        "timestamp": clock.now().isoformat()
     }
 
 @app.get("/api/devices")
 async def get_devices():
-    return devices_db
+    return FastJSONResponse(response_cache.get("devices", lambda: [d.to_dict() for d in devices_db]))
 
 @app.get("/api/threats")
 async def get_threats():
-    return threats_db
+    return FastJSONResponse(response_cache.get("threats", lambda: [t.to_dict() for t in threats_db]))
 
 @app.get("/api/actions")
 async def get_actions():
-    return actions_db
+    return FastJSONResponse(response_cache.get("actions", lambda: [a.to_dict() for a in actions_db]))
 
 @app.get("/api/stats")
 async def get_stats():
+    return build_stats()
+
+def build_stats():
     high_risk = len([d for d in devices_db if d.get("risk_score", 0) > 0.7])
     active_threats = len([t for t in threats_db if t.get("status") == "active"])
     
@@ -132,20 +359,120 @@ async def get_stats():
         "total_devices": len(devices_db),
         "protected_devices": len(devices_db) - high_risk,
         "active_threats": active_threats,
-        "threats_blocked": len(actions_db),
+        "threats_blocked": actions_db.total,
         "system_health": 95.5,
-        "timestamp": datetime.now().isoformat()
+        "timestamp": clock.now().isoformat()
+    }
+
+def build_snapshot():
+    """Devices, threats and stats from one point in time (built without yielding to the loop)"""
+    return {
+        "epoch": change_feed.epoch,
+        "version": change_feed.version,
+        "devices": [d.to_dict() for d in devices_db],
+        "threats": [t.to_dict() for t in threats_db],
+        "stats": build_stats()
+    }
+
+def build_delta(since, epoch=None):
+    """What changed after version `since`: per collection the upserted records and removed ids,
+    or a full snapshot when `since` is too old (or from another process's epoch) to diff against"""
+    changes = change_feed.changes_since(since, epoch)
+    if changes is None:
+        return {**build_snapshot(), "full": True}
+    
+    delta = {"epoch": change_feed.epoch, "version": change_feed.version, "full": False, "stats": build_stats()}
+    for name, store in (("devices", devices_db), ("threats", threats_db)):
+        if name not in changes:
+            continue
+        ids = changes[name]
+        if ids is None:
+            delta[name] = {"replace": [r.to_dict() for r in store]}
+            continue
+        found = [r for r in store if r.id in ids]
+        delta[name] = {
+            "upserted": [r.to_dict() for r in found],
+            "removed": sorted(ids - {r.id for r in found})
+        }
+    return delta
+
+@app.get("/api/snapshot")
+async def get_snapshot():
+    """Devices, threats and stats in one consistent, versioned response"""
+    return FastJSONResponse(response_cache.get("snapshot", build_snapshot))
+
+@app.get("/api/changes")
+async def get_changes(since: int, epoch: Optional[str] = None, timeout: float = config.LONG_POLL_TIMEOUT):
+    """Long-poll: waits until the state moves past version `since` (or `timeout` seconds),
+    then returns only the delta; a client from another epoch gets a full snapshot at once"""
+    if epoch is not None and epoch != change_feed.epoch:
+        return FastJSONResponse(delta_cache.get("other_epoch", lambda: build_delta(since, epoch)))
+    await change_feed.wait(since, min(max(timeout, 0.0), config.LONG_POLL_TIMEOUT))
+    return FastJSONResponse(delta_cache.get(since, lambda: build_delta(since)))
+
+async def run_scan(progress):
+    """Scan job: discover devices into a new list, then swap it in as one step"""
+    if config.DISCOVERY_MODE == "network":
+        from agents.discovery_agent import DiscoveryAgent
+        found = await DiscoveryAgent().scan_network_async(on_progress=progress)
+        new_devices = [DeviceRecord.from_dict({**device, "last_seen": clock.time()}) for device in found]
+    else:
+        new_devices = await simulate_scan(progress)
+
+    # Readers see the old inventory until here, never a partial or empty one
+    devices_db[:] = new_devices
+    mark_changed("devices")
+
+    # Generate random threats
+    if new_devices and random.random() > 0.5:
+        threat = {
+            "id": f"threat_{int(clock.time())}",
+            "type": random.choice(["Port Scan", "Brute Force", "Malware", "Data Exfiltration", "DDoS"]),
+            "severity": random.choice(["high", "critical", "medium"]),
+            "device_id": random.choice(new_devices)["id"],
+            "description": f"Suspicious activity detected on port {random.choice([80, 443, 22, 8080])}",
+            "confidence": random.uniform(0.7, 0.99),
+            "timestamp": clock.now().isoformat(),
+            "status": "active"
+        }
+        threat, status = correlator.ingest(ThreatRecord.from_dict(threat))
+        
+        # Auto-generate action once per incident
+        if status == "new":
+            threats_db.append(threat)
+            action = {
+                "id": new_action_id(),
+                "action_type": "block",
+                "target": threat["device_id"],
+                "description": f"Automatically blocked {threat['device_id']} due to {threat['type']}",
+                "timestamp": clock.now().isoformat(),
+                "status": "completed"
+            }
+            actions_db.append(ActionRecord.from_dict(action))
+            mark_changed(threats=[threat["id"]], actions=[action["id"]])
+    
+    # Notify WebSocket clients
+    broadcast({
+        "type": "scan_complete",
+        "devices_found": len(new_devices),
+        "threats_found": threats_db.total
+    }, key="scan")
+    
+    return {
+        "devices_found": len(new_devices),
+        "threats_detected": threats_db.total
     }
 
-@app.post("/api/scan")
-async def trigger_scan():
-    # Generate simulated devices
+async def simulate_scan(progress):
+    """Generate simulated devices, one probe delay per host"""
     device_types = ["Smart TV", "Security Camera", "Smart Bulb", "Thermostat", 
                     "Smart Speaker", "Router", "Phone", "Laptop", "IoT Hub"]
     vendors = ["Philips", "Nest", "Ring", "Samsung", "Apple", "Google", "Amazon"]
     
-    devices_db.clear()
-    for i in range(random.randint(5, 12)):
+    devices = []
+    total = random.randint(5, 12)
+    for i in range(total):
+        await clock.async_sleep(config.SCAN_PROBE_DELAY)
         device = {
             "id": f"device_{i}",
             "name": f"{random.choice(device_types)} {i}",
@@ -156,53 +483,46 @@ async def trigger_scan():
             "firmware": f"v{random.randint(1, 5)}.{random.randint(0, 9)}",
             "risk_score": random.uniform(0.1, 0.95),
             "ports": random.sample([80, 443, 8080, 22, 23], random.randint(1, 3)),
-            "last_seen": datetime.now().isoformat(),
+            "last_seen": clock.now().isoformat(),
             "status": random.choice(["online", "online", "online", "offline"])
         }
-        devices_db.append(device)
-    
-    # Generate random threats
-    if random.random() > 0.5:
-        threat = {
-            "id": f"threat_{int(time.time())}",
-            "type": random.choice(["Port Scan", "Brute Force", "Malware", "Data Exfiltration", "DDoS"]),
-            "severity": random.choice(["high", "critical", "medium"]),
-            "device_id": random.choice(devices_db)["id"] if devices_db else "unknown",
-            "description": f"Suspicious activity detected on port {random.choice([80, 443, 22, 8080])}",
-            "confidence": random.uniform(0.7, 0.99),
-            "timestamp": datetime.now().isoformat(),
-            "status": "active"
-        }
-        threats_db.append(threat)
-        
-        # Auto-generate action
-        action = {
-            "id": f"action_{int(time.time())}",
-            "action_type": "block",
-            "target": threat["device_id"],
-            "description": f"Automatically blocked {threat['device_id']} due to {threat['type']}",
-            "timestamp": datetime.now().isoformat(),
-            "status": "completed"
-        }
-        actions_db.append(action)
-    
-    # Notify WebSocket clients
-    for conn in websocket_connections:
-        try:
-            await conn.send_json({
-                "type": "scan_complete",
-                "devices_found": len(devices_db),
-                "threats_found": len(threats_db)
-            })
-        except:
-            pass
-    
+        devices.append(DeviceRecord.from_dict(device))
+        progress({"scanned": i + 1, "total": total, "found": len(devices)})
+    return devices
+
+@app.post("/api/scan", status_code=202)
+async def trigger_scan(wait: bool = False):
+    """Start a scan job, or join the one already running; ?wait=true returns once it finishes"""
+    job, created = jobs.submit("scan", run_scan)
+    if wait:
+        job = await jobs.wait(job["id"])
     return {
-        "message": "Network scan completed",
-        "devices_found": len(devices_db),
-        "threats_detected": len(threats_db)
+        "message": "Network scan started" if created else "Network scan already running",
+        "job_id": job["id"],
+        "status": job["status"],
+        "deduplicated": not created,
+        "progress": job["progress"],
+        "result": job["result"]
     }
 
+@app.get("/api/shards")
+async def get_shards(top: int = config.SHARD_TOP_K):
+    """Global view merged from every subnet shard's latest report"""
+    if not shards.subnets:
+        raise HTTPException(status_code=404, detail="Sharding is off (config.SHARD_SUBNETS is empty)")
+    return shards.global_view(top)
+
+@app.get("/api/jobs")
+async def list_jobs(kind: Optional[str] = None):
+    return jobs.list(kind)
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 @app.post("/api/block/{device_id}")
 async def block_device(device_id: str):
     # Find and update device
@@ -214,62 +534,180 @@ async def block_device(device_id: str):
     
     # Create action
     action = {
-        "id": f"action_{int(time.time())}",
+        "id": new_action_id(),
         "action_type": "manual_block",
         "target": device_id,
         "description": f"Manually blocked device {device_id}",
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": clock.now().isoformat(),
         "status": "completed"
     }
-    actions_db.append(action)
+    actions_db.append(ActionRecord.from_dict(action))
+    mark_changed(devices=[device_id], actions=[action["id"]])
     
     return {"message": f"Device {device_id} blocked successfully"}
 
+@app.post("/api/devices/block")
+async def bulk_block_devices(request: BulkRequest):
+    """Block every selected device with one pass, one action record and one notification"""
+    selected = select_records(devices_db, DeviceRecord, request)
+    changed = [d for d in selected if d.status != Status.BLOCKED]
+    ids = [d.id for d in changed]
+    if request.dry_run or not changed:
+        return {"matched": len(selected), "changed": 0, "ids": ids, "dry_run": request.dry_run}
+    
+    for device in changed:
+        device.status = Status.BLOCKED
+        device.risk_score = 1.0
+    action = record_bulk_action("bulk_block", "Manually blocked", "devices", ids)
+    mark_changed(devices=ids, actions=[action.id])
+    
+    broadcast({"type": "bulk_update", "collection": "devices", "status": "blocked",
+               "count": len(ids), "ids": ids, "action": action})
+    return {"matched": len(selected), "changed": len(ids), "ids": ids, "action": action.to_dict()}
+
+@app.get("/api/threats/range")
+async def get_threats_range(since: Optional[float] = None, until: Optional[float] = None,
+                            limit: Optional[int] = None):
+    """Threats recorded between two epoch timestamps (hot window only)"""
+    return [t.to_dict() for t in threats_db.range(since, until, limit)]
+
+@app.get("/api/threats/rate")
+async def get_threat_rate(interval: float = 60, buckets: int = 60, until: Optional[float] = None):
+    """Threat counts per interval, newest bucket last"""
+    if interval <= 0 or not 0 < buckets <= 10000:
+        raise HTTPException(status_code=400, detail="interval must be > 0 and buckets in 1..10000")
+    
+    return {
+        "interval": interval,
+        "since_midnight": threats_db.count_between(
+            clock.now().replace(hour=0, minute=0, second=0, microsecond=0).timestamp()),
+        "buckets": threats_db.rate(interval, buckets, until)
+    }
+
+@app.get("/api/traffic/history")
+async def get_traffic_history(since: Optional[float] = None, until: Optional[float] = None,
+                              ip: Optional[str] = None, suspicious: Optional[bool] = None,
+                              limit: int = 1000, summary: bool = False):
+    """Archived traffic between two epoch timestamps; segments outside the range or IP are skipped"""
+    if not 0 < limit <= 100000:
+        raise HTTPException(status_code=400, detail="limit must be in 1..100000")
+    try:
+        if summary:
+            return await asyncio.to_thread(traffic_archive.summarize, since, until, ip, suspicious)
+        rows = await asyncio.to_thread(traffic_archive.query, since, until, ip, suspicious, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"count": len(rows), "traffic": rows}
+
+@app.get("/api/history/{store}")
+async def get_history(store: str, since: Optional[float] = None, until: Optional[float] = None,
+                      resolution: str = "minute"):
+    """Historical counts by type and severity, served from the rollups"""
+    stores = {"threats": threats_db, "actions": actions_db}
+    if store not in stores:
+        raise HTTPException(status_code=404, detail=f"Unknown history store '{store}'")
+    
+    history = stores[store]
+    return {
+        "store": store,
+        "resolution": resolution,
+        "totals": history.counts(since, until),
+        "buckets": history.history(since, until, resolution),
+        "retention": history.get_stats()
+    }
+
+@app.get("/api/db/threats")
+async def get_db_threats(since: Optional[float] = None, until: Optional[float] = None,
+                         status: Optional[str] = None, severity: Optional[str] = None,
+                         target: Optional[str] = None, limit: int = 100):
+    """Stored threats, newest first; page back by passing the oldest timestamp as `until`"""
+    return await history_db.threats(since, until, status, severity, target, limit)
+
+@app.get("/api/db/threats/summary")
+async def get_db_threat_summary(since: Optional[float] = None, until: Optional[float] = None,
+                                target: Optional[str] = None):
+    return await history_db.threat_summary(since, until, target)
+
+@app.get("/api/db/devices")
+async def get_db_devices(min_risk: Optional[float] = None, max_risk: Optional[float] = None,
+                         type: Optional[str] = None, limit: int = 100):
+    return await history_db.devices(min_risk, max_risk, type, limit)
+
+@app.get("/api/db/actions")
+async def get_db_actions(since: Optional[float] = None, until: Optional[float] = None,
+                         target: Optional[str] = None, limit: int = 100):
+    return await history_db.actions(since, until, target, limit)
+
+@app.get("/api/db/stats")
+async def get_db_stats():
+    return history_db.get_stats()
+
 @app.post("/api/threats/{threat_id}/resolve")
 async def resolve_threat(threat_id: str):
     for threat in threats_db:
         if threat["id"] == threat_id:
             threat["status"] = "resolved"
+            mark_changed(threats=[threat_id])
             break
     
     return {"message": f"Threat {threat_id} resolved"}
 
+@app.post("/api/threats/resolve")
+async def bulk_resolve_threats(request: BulkRequest):
+    """Resolve every selected threat, e.g. {"filter": {"status": "active", "source": "10.0.0.5"}}"""
+    selected = select_records(threats_db, ThreatRecord, request)
+    changed = [t for t in selected if t.status != Status.RESOLVED]
+    ids = [t.id for t in changed]
+    if request.dry_run or not changed:
+        return {"matched": len(selected), "changed": 0, "ids": ids, "dry_run": request.dry_run}
+    
+    for threat in changed:
+        threat.status = Status.RESOLVED
+    action = record_bulk_action("bulk_resolve", "Resolved", "threats", ids)
+    mark_changed(threats=ids, actions=[action.id])
+    
+    broadcast({"type": "bulk_update", "collection": "threats", "status": "resolved",
+               "count": len(ids), "ids": ids, "action": action})
+    return {"matched": len(selected), "changed": len(ids), "ids": ids, "action": action.to_dict()}
+
 # Background threat simulation
 async def simulate_background_activity():
     """Simulate real-time updates"""
     while True:
+        started = time.perf_counter()
         # Occasionally add new threat
         if random.random() > 0.8 and devices_db:
             threat = {
-                "id": f"threat_bg_{int(time.time())}",
+                "id": f"threat_bg_{int(clock.time())}",
                 "type": random.choice(["Port Scan", "Suspicious Traffic", "Unauthorized Access"]),
                 "severity": random.choice(["low", "medium"]),
                 "device_id": random.choice(devices_db)["id"],
                 "description": f"Background security event detected",
                 "confidence": random.uniform(0.4, 0.7),
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": clock.now().isoformat(),
                 "status": "active"
             }
-            threats_db.append(threat)
+            threat, status = correlator.ingest(ThreatRecord.from_dict(threat))
+            if status == "new":
+                threats_db.append(threat)
+            mark_changed(threats=[threat["id"]])
             
-            # Notify WebSocket
-            for conn in websocket_connections:
-                try:
-                    await conn.send_json({
-                        "type": "threat_alert",
-                        "data": threat
-                    })
-                except:
-                    pass
+            # Notify WebSocket on new or escalating incidents only
+            # Alerts and updates coalesce separately: an escalation must not swallow the alert
+            if status != "merged":
+                event_type = "threat_alert" if status == "new" else "incident_update"
+                broadcast({"type": event_type, "data": threat}, key=f"{event_type}:{threat['id']}")
         
         # Update device status occasionally
         if devices_db and random.random() > 0.9:
             device = random.choice(devices_db)
             old_score = device["risk_score"]
             device["risk_score"] = min(1.0, old_score + random.uniform(-0.1, 0.2))
-            device["last_seen"] = datetime.now().isoformat()
+            device["last_seen"] = clock.time()
+            mark_changed(devices=[device["id"]])
+        TICK_SECONDS.labels("api_background").observe(time.perf_counter() - started)
         
-        await asyncio.sleep(10)  # Update every 10 seconds
+        await clock.async_sleep(10)  # Update every 10 seconds
 
 @app.on_event("startup")
 async def startup_event():
@@ -1,14 +1,100 @@
 """
 Anomaly Detection Model
 """
+import math
 import random
 
+import numpy as np
+
+import config
+from database.records import Protocol, to_epoch
+
+PROTOCOL_CODES = {p: i for i, p in enumerate(Protocol)}
+SECONDS_PER_DAY = 86400.0
+
+
+def traffic_features(bytes, port, protocol, timestamp):
+    """Feature matrix (rows x features) from traffic columns; protocol is the Protocol index"""
+    bytes, port = np.asarray(bytes, dtype=np.float64), np.asarray(port, dtype=np.float64)
+    protocol = np.asarray(protocol, dtype=np.int64)
+    angle = np.asarray(timestamp, dtype=np.float64) % SECONDS_PER_DAY * (2 * np.pi / SECONDS_PER_DAY)
+    features = np.zeros((len(bytes), 4 + len(PROTOCOL_CODES)))
+    features[:, 0] = np.log1p(bytes)
+    features[:, 1] = np.log1p(port)
+    features[:, 2] = np.sin(angle)
+    features[:, 3] = np.cos(angle)
+    known = protocol < len(PROTOCOL_CODES)
+    features[np.flatnonzero(known), 4 + protocol[known]] = 1.0
+    return features
+
+
+def record_features(traffic_data):
+    """Feature vector for one traffic record; same layout as traffic_features()"""
+    features = np.zeros(4 + len(PROTOCOL_CODES))
+    features[0] = math.log1p(traffic_data.get('bytes', 0))
+    features[1] = math.log1p(traffic_data.get('port', 0))
+    angle = (to_epoch(traffic_data.get('timestamp')) or 0.0) % SECONDS_PER_DAY * (2 * math.pi / SECONDS_PER_DAY)
+    features[2] = math.sin(angle)
+    features[3] = math.cos(angle)
+    protocol = PROTOCOL_CODES.get(Protocol.parse(traffic_data.get('protocol', 'TCP')))
+    if protocol is not None:
+        features[4 + protocol] = 1.0
+    return features
+
+
 class AnomalyDetector:
-    def __init__(self):
-        print("🤖 Anomaly Detector initialized")
-    
+    """Gaussian model of normal traffic: a record far (in Mahalanobis distance) from the
+    training mean is anomalous. Without trained parameters, detection is simulated."""
+
+    def __init__(self, params=None):
+        self.params = params
+        if params is None:
+            print("🤖 Anomaly Detector initialized")
+
+    @staticmethod
+    def fit(features):
+        """Parameters for a feature matrix of normal traffic"""
+        mean = features.mean(axis=0)
+        # Ridge keeps the covariance invertible when a feature never varies (an unused protocol)
+        cov = np.cov(features, rowvar=False) + np.eye(features.shape[1]) * 1e-3
+        precision = np.linalg.inv(cov)
+        centered = features - mean
+        distances = np.einsum('ij,jk,ik->i', centered, precision, centered)
+        return {
+            'mean': mean,
+            'precision': precision,
+            'scale': float(np.percentile(distances, 99)),
+            'rows': len(features)
+        }
+
+    def score_batch(self, features):
+        """Anomaly confidence per row: 0.5 at the training 99th percentile distance, towards 1 beyond"""
+        params = self.params
+        centered = features - params['mean']
+        distances = np.einsum('ij,jk,ik->i', centered, params['precision'], centered)
+        return 1.0 - 0.5 ** (distances / max(params['scale'], 1e-9))
+
     def detect(self, traffic_data):
         """Detect anomalies in traffic"""
+        if self.params is not None:
+            params = self.params
+            centered = record_features(traffic_data) - params['mean']
+            distance = float(centered @ params['precision'] @ centered)
+            confidence = 1.0 - 0.5 ** (distance / max(params['scale'], 1e-9))
+            if confidence >= config.ANOMALY_THRESHOLD:
+                return {
+                    'is_anomaly': True,
+                    'confidence': confidence,
+                    'type': 'Anomalous Traffic',
+                    'details': 'Traffic far outside the learned normal profile'
+                }
+            return {
+                'is_anomaly': False,
+                'confidence': confidence,
+                'type': 'Normal',
+                'details': 'Traffic patterns normal'
+            }
+
         # Simulate AI detection
         if random.random() < 0.25:  # 25% chance of anomaly
             return {
@@ -17,10 +103,10 @@ class AnomalyDetector:
                 'type': random.choice(['Traffic Spike', 'Unusual Port', 'Suspicious Pattern']),
                 'details': 'AI detected unusual network behavior'
             }
-        
+
         return {
             'is_anomaly': False,
             'confidence': random.uniform(0.1, 0.3),
             'type': 'Normal',
             'details': 'Traffic patterns normal'
-        }
\ No newline at end of file
+        }
@@ -1,12 +1,58 @@
 """
 Behavioral Baseline Model
 """
+import math
 import random
 
+import numpy as np
+
+from database.threat_intel import ip_to_int
+
+MIN_STD = 0.25  # log-bytes spread assumed for a device whose packets were all one size
+Z_MAX = 6.0  # deviations from the usual packet size that count as a certain anomaly
+SERVICE_PORT_LIMIT = 1024  # only service ports are checked; ephemeral ports change every connection
+UNUSUAL_PORT_SCORE = 0.6
+
+
+def _find(values, value):
+    """Position of `value` in a sorted array (devices, normal_ports), or None"""
+    value = values.dtype.type(value)  # a Python int against uint64 takes a slow conversion path
+    i = int(values.searchsorted(value))
+    return i if i < len(values) and values[i] == value else None
+
+
 class BaselineModel:
-    def __init__(self):
+    def __init__(self, params=None):
         self.device_baselines = {}
-    
+        # Learned per-device arrays from fit(), sorted by source address; searched in place,
+        # since a restored checkpoint maps them straight from disk
+        self.params = params
+
+    @staticmethod
+    def fit(source, bytes, port, timestamp):
+        """Per-device baselines from traffic columns: packet size, rate and usual ports"""
+        devices, inverse, counts = np.unique(np.asarray(source, dtype=np.uint32),
+                                             return_inverse=True, return_counts=True)
+        log_bytes = np.log1p(np.asarray(bytes, dtype=np.float64))
+        mean = np.bincount(inverse, log_bytes) / counts
+        var = np.bincount(inverse, log_bytes * log_bytes) / counts - mean * mean
+        span = max(float(np.max(timestamp) - np.min(timestamp)), 60.0)
+
+        # A port is normal for a device once it carries 1% of its packets (and at least two)
+        pairs, pair_counts = np.unique(inverse.astype(np.uint64) << np.uint64(16) |
+                                       np.asarray(port, dtype=np.uint64), return_counts=True)
+        owner = (pairs >> np.uint64(16)).astype(np.int64)
+        keep = (pair_counts >= 2) & (pair_counts >= counts[owner] * 0.01)
+        normal_ports = devices[owner[keep]].astype(np.uint64) << np.uint64(16) | (pairs[keep] & np.uint64(0xFFFF))
+
+        return {
+            'devices': devices,
+            'mean': mean,
+            'std': np.maximum(np.sqrt(np.maximum(var, 0.0)), MIN_STD),
+            'packet_rate': counts * 60.0 / span,  # packets per minute
+            'normal_ports': normal_ports  # sorted (address << 16 | port)
+        }
+
     def create_baseline(self, device_id, metrics):
         """Create baseline for device"""
         baseline = {
@@ -18,17 +64,36 @@ class BaselineModel:
         }
         self.device_baselines[device_id] = baseline
         return baseline
-    
+
     def check_anomaly(self, device_id, current_metrics):
         """Check for anomalies"""
-        if device_id not in self.device_baselines:
+        if self.params is not None and current_metrics.get('ip'):
+            anomaly_score = self._learned_score(current_metrics)
+            if anomaly_score is None:
+                return 0.0, "No baseline"
+        elif device_id not in self.device_baselines:
             return 0.0, "No baseline"
-        
-        # Simulate anomaly detection
-        anomaly_score = random.random()
+        else:
+            # Simulate anomaly detection
+            anomaly_score = random.random()
+
         if anomaly_score > 0.7:
             return anomaly_score, "High anomaly detected"
         elif anomaly_score > 0.4:
             return anomaly_score, "Medium anomaly"
         else:
-            return anomaly_score, "Normal"
\ No newline at end of file
+            return anomaly_score, "Normal"
+
+    def _learned_score(self, metrics):
+        """0-1 score of one packet against its device's learned baseline; None if unseen"""
+        address = ip_to_int(metrics['ip'])
+        i = _find(self.params['devices'], address) if address >= 0 else None
+        if i is None:
+            return None
+        z = abs(math.log1p(metrics.get('bytes', 0)) - self.params['mean'][i]) / self.params['std'][i]
+        score = min(1.0, float(z) / Z_MAX)
+
+        port = int(metrics.get('port', 0))
+        if port < SERVICE_PORT_LIMIT and _find(self.params['normal_ports'], address << 16 | port) is None:
+            score = max(score, UNUSUAL_PORT_SCORE)  # a service this device has not been seen using
+        return score
@@ -0,0 +1,205 @@
+"""
+Model Checkpoints - versioned on-disk model state with memory-mapped warm start
+
+Each checkpoint is a directory v000042/ holding one raw .npy file per
+model array plus meta.json (scalars, manual baselines, timestamps). A
+directory is written under a temporary name, fsynced and renamed into
+place, then the CURRENT file is os.replace()d to point at it; the parent
+directory is fsynced after each rename so the renames themselves survive
+power loss. A crash leaves either the old or the new checkpoint, never a
+torn one. Loading np.load()s the arrays with mmap_mode='r': nothing is
+read or recomputed up front, pages come in as scoring touches them.
+Runtime state that changes between model versions (per-device risk) goes
+to state.json, replaced the same way.
+
+Usage (from backend/):
+    python -m models.checkpoint [list|show]
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+import config
+from core import clock
+from models.anomaly_detector import AnomalyDetector
+from models.baseline_model import BaselineModel
+from models.training_service import ModelSet
+
+POINTER = 'CURRENT'
+META = 'meta.json'
+STATE = 'state.json'
+
+
+def _fsync_dir(path):
+    """Flush a directory's entries (new files, renames) to disk"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class CheckpointStore:
+    def __init__(self, directory=None, keep=None):
+        self.directory = directory or config.CHECKPOINT_DIR
+        self.keep = keep or config.CHECKPOINT_KEEP
+        os.makedirs(self.directory, exist_ok=True)
+        self.saved_version = None
+        self.last_save = None
+        print(f"💾 Checkpoint store at {self.directory}")
+
+    @staticmethod
+    def _name(version):
+        return f"v{version:06d}"
+
+    def save(self, models):
+        """Write a ModelSet as a new version and point CURRENT at it; returns its path"""
+        started = time.perf_counter()
+        name = self._name(models.version)
+        path = os.path.join(self.directory, name)
+        if os.path.isdir(path):  # this version is already on disk
+            self._point_to(name)
+            self.saved_version = models.version
+            return path
+
+        meta = {
+            'version': models.version,
+            'trained_at': models.trained_at,
+            'rows': models.rows,
+            'saved_at': clock.now().isoformat(),
+            'scalars': {},
+            'device_baselines': models.baseline.device_baselines
+        }
+        tmp = os.path.join(self.directory, f".{name}.{os.getpid()}.tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for model, params in (('baseline', models.baseline.params), ('anomaly', models.anomaly.params)):
+            for key, value in params.items():
+                if isinstance(value, np.ndarray):
+                    with open(os.path.join(tmp, f"{model}.{key}.npy"), 'wb') as f:
+                        np.save(f, value)
+                        os.fsync(f.fileno())
+                else:
+                    meta['scalars'][f"{model}.{key}"] = value
+        with open(os.path.join(tmp, META), 'w') as f:
+            json.dump(meta, f, default=str)
+            os.fsync(f.fileno())
+        _fsync_dir(tmp)
+        os.rename(tmp, path)  # the version appears complete or not at all
+        _fsync_dir(self.directory)
+        self._point_to(name)
+        self._prune(name)
+
+        self.saved_version = models.version
+        self.last_save = {'version': models.version, 'seconds': time.perf_counter() - started,
+                          'saved_at': meta['saved_at']}
+        return path
+
+    def _point_to(self, name):
+        self._replace(POINTER, name + '\n')
+
+    def _replace(self, filename, text):
+        tmp = os.path.join(self.directory, f".{filename}.{os.getpid()}.tmp")
+        with open(tmp, 'w') as f:
+            f.write(text)
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.directory, filename))
+        _fsync_dir(self.directory)
+
+    def save_state(self, state):
+        """Replace the JSON runtime state"""
+        self._replace(STATE, json.dumps({'saved_at': clock.now().isoformat(), **state}, default=str))
+
+    def load_state(self):
+        """Runtime state from the last save_state(), or {}"""
+        try:
+            with open(os.path.join(self.directory, STATE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _prune(self, current):
+        """Delete all but the newest `keep` versions (never the current one)"""
+        for name in self.versions()[:-self.keep]:
+            if name != current:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def versions(self):
+        """Complete version directories, oldest first"""
+        return sorted(name for name in os.listdir(self.directory)
+                      if name.startswith('v') and os.path.isfile(os.path.join(self.directory, name, META)))
+
+    def current(self):
+        """Directory name CURRENT points at, else the newest complete version, else None"""
+        try:
+            with open(os.path.join(self.directory, POINTER)) as f:
+                name = f.read().strip()
+            if os.path.isfile(os.path.join(self.directory, name, META)):
+                return name
+        except OSError:
+            pass
+        versions = self.versions()
+        return versions[-1] if versions else None
+
+    def load(self):
+        """ModelSet from the current checkpoint with memory-mapped arrays; None if there is none"""
+        name = self.current()
+        if name is None:
+            return None
+        path = os.path.join(self.directory, name)
+        with open(os.path.join(path, META)) as f:
+            meta = json.load(f)
+
+        params = {'baseline': {}, 'anomaly': {}}
+        for key, value in meta['scalars'].items():
+            model, field = key.split('.', 1)
+            params[model][field] = value
+        for filename in os.listdir(path):
+            if filename.endswith('.npy'):
+                model, field = filename[:-len('.npy')].split('.', 1)
+                # Plain ndarray views over the mapping: np.memmap's own indexing adds per-call overhead
+                params[model][field] = np.load(os.path.join(path, filename), mmap_mode='r').view(np.ndarray)
+
+        baseline = BaselineModel(params['baseline'])
+        baseline.device_baselines = meta.get('device_baselines', {})
+        models = ModelSet(meta['version'], baseline, AnomalyDetector(params['anomaly']),
+                          meta['rows'], meta['trained_at'])
+        self.saved_version = models.version
+        return models
+
+    def get_stats(self):
+        """Get checkpoint statistics"""
+        return {
+            'directory': self.directory,
+            'current': self.current(),
+            'versions': self.versions(),
+            'last_save': self.last_save
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect model checkpoints")
+    parser.add_argument('command', choices=['list', 'show'], nargs='?', default='list')
+    parser.add_argument('--dir', default=None)
+    args = parser.parse_args()
+
+    store = CheckpointStore(args.dir)
+    if args.command == 'list':
+        print(json.dumps(store.get_stats(), indent=2))
+        return
+    started = time.perf_counter()
+    models = store.load()
+    elapsed = time.perf_counter() - started
+    if models is None:
+        print("No checkpoint")
+        return
+    print(f"v{models.version}: trained {models.trained_at} on {models.rows:,} rows, "
+          f"{len(models.baseline.params['devices']):,} device baselines, loaded in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
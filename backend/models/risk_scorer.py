@@ -45,6 +45,10 @@ class RiskScorer:
         else:
             level = "LOW"
         
+        # Last score per device; checkpointed so a restart picks up where it left off
+        if device_info.get('id'):
+            self.device_risks[device_info['id']] = {'score': round(risk, 2), 'level': level}
+        
         return {
             'score': round(risk, 2),
             'level': level,
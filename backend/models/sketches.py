@@ -0,0 +1,237 @@
+"""
+Traffic Sketches - fixed-memory heavy hitters and scan detection
+"""
+import math
+import zlib
+from array import array
+from collections import OrderedDict
+
+import config
+from core import clock
+
+M64 = (1 << 64) - 1
+
+
+def hash64(key):
+    """Well-mixed 64-bit hash, the same in every process (splitmix64 finalizer over ints or CRC-32).
+
+    Not hash(): string hashes are salted per process, so sketches and
+    replays would differ between runs and between shard workers.
+    """
+    x = ((key if isinstance(key, int) else zlib.crc32(str(key).encode())) + 0x9E3779B97F4A7C15) & M64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & M64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & M64
+    return x ^ (x >> 31)
+
+
+class CountMinSketch:
+    """Approximate counts in depth x width counters; never undercounts"""
+
+    def __init__(self, width=2048, depth=4):
+        self.width = width
+        self.depth = depth
+        self.rows = [array('q', [0]) * width for _ in range(depth)]
+
+    def _cells(self, key):
+        # Double hashing: row i uses h1 + i*h2, so one hash serves every row
+        h = hash64(key)
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def add(self, key, count=1):
+        """Count `key` and return its new estimate"""
+        estimate = None
+        for row, cell in zip(self.rows, self._cells(key)):
+            row[cell] += count
+            if estimate is None or row[cell] < estimate:
+                estimate = row[cell]
+        return estimate
+
+    def estimate(self, key):
+        return min(row[cell] for row, cell in zip(self.rows, self._cells(key)))
+
+
+class HeavyHitters:
+    """Top-k keys by Count-Min estimate.
+
+    Only the k current leaders are kept as keys; the smallest leader's
+    estimate is cached, so most updates cost one sketch add and a compare.
+    """
+
+    def __init__(self, k=10, width=2048, depth=4):
+        self.k = k
+        self.sketch = CountMinSketch(width, depth)
+        self.top = {}
+        self.floor = 0
+
+    def add(self, key, count=1):
+        estimate = self.sketch.add(key, count)
+        if key in self.top:
+            self.top[key] = estimate
+        elif len(self.top) < self.k:
+            self.top[key] = estimate
+        elif estimate > self.floor:
+            del self.top[min(self.top, key=self.top.get)]
+            self.top[key] = estimate
+        else:
+            return estimate
+        self.floor = min(self.top.values()) if len(self.top) >= self.k else 0
+        return estimate
+
+    def most_common(self, n=None):
+        return sorted(self.top.items(), key=lambda item: item[1], reverse=True)[:n]
+
+
+class HyperLogLog:
+    """Distinct-count estimate in 2**p one-byte registers (about 1.04/sqrt(2**p) error)"""
+
+    def __init__(self, p=8):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+        self.alpha = 0.7213 / (1 + 1.079 / self.m)
+        self._count = 0
+
+    def add(self, item):
+        """Add an item; returns True if the estimate may have changed"""
+        h = hash64(item)
+        index = h >> (64 - self.p)
+        rest = h & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            self._count = None
+            return True
+        return False
+
+    def count(self):
+        """Estimated number of distinct items (cached until a register changes)"""
+        if self._count is None:
+            estimate = self.alpha * self.m * self.m / sum(2.0 ** -r for r in self.registers)
+            zeros = self.registers.count(0)
+            if estimate <= 2.5 * self.m and zeros:
+                estimate = self.m * math.log(self.m / zeros)  # small-range correction (linear counting)
+            self._count = int(round(estimate))
+        return self._count
+
+
+class _Window:
+    """Sketch state for one tumbling window"""
+
+    def __init__(self, start, k, width, depth, max_sources, p):
+        self.start = start
+        self.sources = HeavyHitters(k, width, depth)
+        self.destinations = HeavyHitters(k, width, depth)
+        self.profiles = OrderedDict()  # source -> [ports HLL, destinations HLL], least recently seen first
+        self.max_sources = max_sources
+        self.p = p
+        self.packets = 0
+        self.bytes = 0
+
+    def profile(self, source):
+        entry = self.profiles.get(source)
+        if entry is None:
+            entry = self.profiles[source] = [HyperLogLog(self.p), HyperLogLog(self.p)]
+            if len(self.profiles) > self.max_sources:
+                self.profiles.popitem(last=False)
+        else:
+            self.profiles.move_to_end(source)
+        return entry
+
+
+class TrafficSketch:
+    """Heavy hitters and per-source scan/fan-out detection over tumbling windows.
+
+    Memory is fixed by configuration: two Count-Min sketches and at most
+    SKETCH_MAX_SOURCES pairs of HyperLogLogs per window (least recently
+    seen sources are evicted), however many addresses the traffic uses.
+    The previous window is kept so summaries never start from empty.
+    """
+
+    def __init__(self, window=None, k=None, width=None, depth=None, max_sources=None, p=None):
+        self.window = window or config.SKETCH_WINDOW
+        self.params = (
+            k or config.SKETCH_TOP_K,
+            width or config.SKETCH_WIDTH,
+            depth or config.SKETCH_DEPTH,
+            max_sources or config.SKETCH_MAX_SOURCES,
+            p or config.SKETCH_HLL_PRECISION
+        )
+        self.current = _Window(clock.time(), *self.params)
+        self.previous = None
+        self.flagged = OrderedDict()  # (source, type) -> latest flag, bounded like the profiles
+
+    def _rotate(self, now):
+        if now - self.current.start >= self.window:
+            self.previous = self.current
+            self.current = _Window(now - (now - self.current.start) % self.window, *self.params)
+
+    def add(self, traffic):
+        """Feed one traffic record; returns 'Port Scan'/'Host Sweep' if its source is flagged"""
+        now = clock.time()
+        self._rotate(now)
+        window = self.current
+        source = traffic.get('source_ip') or 'Unknown'
+        destination = traffic.get('destination_ip') or 'Unknown'
+
+        window.packets += 1
+        window.bytes += traffic.get('bytes', 0)
+        window.sources.add(source)
+        window.destinations.add(destination)
+
+        ports, destinations = window.profile(source)
+        port = traffic.get('port', 0)
+        if port < config.SKETCH_SCAN_PORT_LIMIT:
+            ports.add(port)
+        destinations.add(destination)
+
+        if ports.count() >= config.SKETCH_PORT_SCAN_THRESHOLD:
+            return self._flag(source, 'Port Scan', ports.count())
+        if destinations.count() >= config.SKETCH_FANOUT_THRESHOLD:
+            return self._flag(source, 'Host Sweep', destinations.count())
+        return None
+
+    def _flag(self, source, kind, distinct):
+        key = (source, kind)
+        self.flagged[key] = {'source': source, 'type': kind, 'distinct': distinct,
+                             'time': clock.now().isoformat()}
+        self.flagged.move_to_end(key)
+        if len(self.flagged) > config.SKETCH_MAX_SOURCES:
+            self.flagged.popitem(last=False)
+        return kind
+
+    def _windows(self):
+        return [w for w in (self.previous, self.current) if w is not None]
+
+    def span(self):
+        """Seconds of traffic the top lists cover (the previous window plus the current one so far)"""
+        return clock.time() - self._windows()[0].start
+
+    def top_sources(self, n=5):
+        """Heaviest sources across the current and previous window"""
+        return self._top(n, 'sources')
+
+    def top_destinations(self, n=5):
+        return self._top(n, 'destinations')
+
+    def _top(self, n, attr):
+        windows = self._windows()
+        candidates = {}  # a dict, not a set: string sets iterate in a per-process order, and ties keep it
+        for window in windows:
+            candidates.update(dict.fromkeys(getattr(window, attr).top))
+        totals = {key: sum(getattr(w, attr).sketch.estimate(key) for w in windows) for key in candidates}
+        return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:n]
+
+    def scan_suspects(self, n=10):
+        """Most recently flagged port scanners and host sweepers"""
+        return list(self.flagged.values())[-n:][::-1]
+
+    def get_stats(self):
+        """Get sketch statistics"""
+        return {
+            'window': self.window,
+            'packets': sum(w.packets for w in self._windows()),
+            'bytes': sum(w.bytes for w in self._windows()),
+            'tracked_sources': len(self.current.profiles),
+            'flagged_sources': len(self.flagged)
+        }
@@ -0,0 +1,237 @@
+"""
+Model Training Service - periodic retraining in a process pool
+"""
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import config
+from core import clock
+from core.metrics import REGISTRY
+from database.traffic_archive import TrafficArchive
+from models.anomaly_detector import AnomalyDetector, traffic_features
+from models.baseline_model import BaselineModel
+
+TRAINING_SECONDS = REGISTRY.histogram("model_training_seconds", "Wall time of one model training run",
+                                      buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120))
+TRAINING_RUNS = REGISTRY.counter("model_training_runs_total", "Model training runs by outcome", ["outcome"])
+MODEL_VERSION = REGISTRY.gauge("model_version", "Version of the models used for live scoring")
+
+# Rows of the training table handed to the worker, one contiguous column each
+TABLE_COLUMNS = ['source_ip', 'bytes', 'port', 'protocol', 'timestamp']
+
+
+def train_models(shm_name, rows):
+    """Worker process: fit both models on the table in shared memory; returns their parameters"""
+    started = time.perf_counter()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        table = np.ndarray((len(TABLE_COLUMNS), rows), dtype=np.float64, buffer=shm.buf)
+        source, bytes, port, protocol, timestamp = table
+        baseline = BaselineModel.fit(source, bytes, port, timestamp)
+        anomaly = AnomalyDetector.fit(traffic_features(bytes, port, protocol, timestamp))
+        del table, source, bytes, port, protocol, timestamp  # views into the block must go before close()
+    finally:
+        shm.close()
+    return {'baseline': baseline, 'anomaly': anomaly, 'fit_seconds': time.perf_counter() - started}
+
+
+class ModelSet:
+    """One trained version of the baseline and anomaly models, scored together"""
+
+    def __init__(self, version, baseline, anomaly, rows, trained_at):
+        self.version = version
+        self.baseline = baseline
+        self.anomaly = anomaly
+        self.rows = rows
+        self.trained_at = trained_at
+
+    def score(self, traffic):
+        """Anomaly verdict for one traffic record (dict or TrafficRecord)"""
+        result = self.anomaly.detect(traffic)
+        score, label = self.baseline.check_anomaly(None, {
+            'ip': traffic.get('source_ip'), 'bytes': traffic.get('bytes', 0), 'port': traffic.get('port', 0)
+        })
+        if score > result['confidence']:
+            result = {**result, 'confidence': score, 'details': f"Baseline: {label}"}
+            if score >= config.ANOMALY_THRESHOLD:
+                result.update(is_anomaly=True, type='Anomalous Traffic')
+        result['model_version'] = self.version
+        return result
+
+
+class TrainingService:
+    """Rebuilds the baseline and anomaly models from archived clean traffic, off the web process.
+
+    tick() (run every MODEL_UPDATE_INTERVAL) copies the training window
+    from the traffic archive straight into a shared-memory block and
+    submits a fit to a one-process pool; the worker maps the same block,
+    so the feature data is never pickled and only the small parameter
+    arrays come back. When the fit finishes, a new ModelSet is built and
+    installed with a single reference assignment on the detector:
+    scoring keeps using the previous version until that moment, and
+    each record is scored entirely by one version.
+    """
+
+    def __init__(self, detector=None, archive=None, workers=None, checkpoints=None):
+        self.detector = detector
+        self.archive = archive or TrafficArchive(writer=False)
+        self.workers = workers or config.MODEL_TRAINING_WORKERS
+        self.models = None
+        self.version = 0
+        self.pool = None
+        self.future = None
+        self.lock = threading.Lock()
+        self.last_run = None
+        self.runs = 0
+        MODEL_VERSION.set_function(lambda: self.version)
+        print("🧠 Training Service initialized")
+
+        # Warm start: serve the last checkpointed models straight from disk
+        self.checkpoints = checkpoints
+        self.restored_state = {}
+        if checkpoints is not None:
+            started = time.perf_counter()
+            models = checkpoints.load()
+            self.restored_state = checkpoints.load_state()
+            if models is not None:
+                self.install(models)
+                print(f"🧠 Models v{models.version} restored in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    def tick(self):
+        """Start a training run unless one is still in flight; returns True if one was started"""
+        with self.lock:
+            if self.future is not None:
+                return False
+            started = time.perf_counter()
+            shm, rows = self._load_table()
+            if shm is None:
+                self.last_run = {'status': 'skipped', 'rows': rows, 'finished': clock.now().isoformat(),
+                                 'reason': f"need {config.MODEL_TRAINING_MIN_ROWS} clean rows"}
+                TRAINING_RUNS.labels('skipped').inc()
+                return False
+            if self.pool is None:
+                # spawn, not fork: the web process has server and scheduler threads
+                self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+            try:
+                self.future = self.pool.submit(train_models, shm.name, rows)
+            except Exception:
+                shm.close()
+                shm.unlink()
+                raise
+            self.future.add_done_callback(lambda future: self._finish(future, shm, rows, started))
+            return True
+
+    def _load_table(self):
+        """(shared-memory training table, rows); (None, rows) when there is too little data"""
+        until = clock.time()
+        chunks = [columns for columns, _ in self.archive.scan(until - config.MODEL_TRAINING_WINDOW, until,
+                                                               suspicious=False)]
+        rows = sum(len(columns['timestamp']) for columns in chunks)
+        if rows < config.MODEL_TRAINING_MIN_ROWS:
+            return None, rows
+
+        # Newest rows win when the window holds more than the cap
+        skip = max(0, rows - config.MODEL_TRAINING_MAX_ROWS)
+        rows -= skip
+        shm = shared_memory.SharedMemory(create=True, size=len(TABLE_COLUMNS) * rows * 8)
+        table = np.ndarray((len(TABLE_COLUMNS), rows), dtype=np.float64, buffer=shm.buf)
+        offset = 0
+        for columns in chunks:
+            n = len(columns['timestamp'])
+            if skip >= n:
+                skip -= n
+                continue
+            for row, name in enumerate(TABLE_COLUMNS):
+                table[row, offset:offset + n - skip] = columns[name][skip:]
+            offset += n - skip
+            skip = 0
+        del table
+        return shm, rows
+
+    def _finish(self, future, shm, rows, started):
+        """Pool callback: install the new models, or record why the run failed"""
+        shm.close()
+        shm.unlink()
+        elapsed = time.perf_counter() - started
+        TRAINING_SECONDS.observe(elapsed)
+        try:
+            result = future.result()
+        except Exception as e:
+            TRAINING_RUNS.labels('failed').inc()
+            self.last_run = {'status': 'failed', 'rows': rows, 'seconds': elapsed, 'error': str(e),
+                             'finished': clock.now().isoformat()}
+            print(f"❌ Model training failed: {e}")
+            if isinstance(e, BrokenProcessPool):
+                # A crashed worker breaks the pool for good; the next tick starts a fresh one
+                self.pool.shutdown(wait=False)
+                self.pool = None
+        else:
+            baseline = BaselineModel(result['baseline'])
+            if self.models is not None:
+                baseline.device_baselines = self.models.baseline.device_baselines
+            models = ModelSet(self.version + 1, baseline, AnomalyDetector(result['anomaly']),
+                              rows, clock.now().isoformat())
+            self.install(models)
+            TRAINING_RUNS.labels('completed').inc()
+            self.last_run = {'status': 'completed', 'rows': rows, 'seconds': elapsed,
+                             'fit_seconds': result['fit_seconds'], 'version': models.version,
+                             'devices': len(result['baseline']['devices']), 'finished': models.trained_at}
+            print(f"🧠 Models v{models.version} trained on {rows:,} rows in {elapsed:.2f}s")
+        finally:
+            self.runs += 1
+            self.future = None
+
+    def install(self, models):
+        """Swap in a new model version; readers see the old or the new one, never a mix"""
+        self.models = models
+        self.version = models.version
+        if self.detector is not None:
+            self.detector.models = models
+
+    def checkpoint(self, state=None):
+        """Save the live models if they changed since the last save, and the given runtime state"""
+        if self.checkpoints is None:
+            return False
+        if state is not None:
+            self.checkpoints.save_state(state)
+        models = self.models
+        if models is None or models.version == self.checkpoints.saved_version:
+            return False
+        self.checkpoints.save(models)
+        return True
+
+    def wait(self, timeout=None):
+        """Block until the run in flight (if any) has finished and been installed"""
+        future = self.future
+        if future is not None:
+            try:
+                future.result(timeout)
+            except Exception:
+                pass
+            while self.future is future:  # done callbacks run just after result() returns
+                time.sleep(0.01)
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+
+    def get_stats(self):
+        """Get training statistics"""
+        models = self.models
+        return {
+            'version': self.version,
+            'trained_at': models.trained_at if models else None,
+            'training_rows': models.rows if models else 0,
+            'running': self.future is not None,
+            'runs': self.runs,
+            'last_run': self.last_run,
+            'interval': config.MODEL_UPDATE_INTERVAL,
+            'checkpoints': self.checkpoints.get_stats() if self.checkpoints is not None else None
+        }
@@ -1,32 +1,25 @@
 """
 Simplified Runner - Use if main.py has issues
 """
-from dashboard.web_server import app
+from dashboard.web_server import app, intel_compiler, scheduler
 import webbrowser
-import threading
-import time
+from core import clock
+import config
 
 def run_simulations():
-    """Run background simulations"""
-    from simulation.iot_simulator import IoTDeviceSimulator
+    """Run background simulations on the dashboard's tick scheduler"""
     from simulation.attack_simulator import AttackSimulator
     
-    iot_sim = IoTDeviceSimulator(num_devices=8)
     attack_sim = AttackSimulator()
     
-    # Run in background
-    def run_iot():
-        while True:
-            iot_sim.simulate_activity()
-            time.sleep(5)
+    def attacks_tick():
+        attack_sim.generate_attack()
+        return {'attacks': attack_sim.get_recent_attacks()}
     
-    def run_attack():
-        while True:
-            attack_sim.generate_attack()
-            time.sleep(25)
-    
-    threading.Thread(target=run_iot, daemon=True).start()
-    threading.Thread(target=run_attack, daemon=True).start()
+    # Devices, threats, defense and deception jobs are registered by the dashboard
+    scheduler.add_job('attacks', attacks_tick, config.TICK_RATES['attacks'])
+    intel_compiler.start()
+    scheduler.start()
 
 if __name__ == "__main__":
     print("🚀 Starting IoT Security System...")
@@ -36,8 +29,8 @@ if __name__ == "__main__":
     run_simulations()
     
     # Open browser
-    time.sleep(2)
+    clock.sleep(2)
     webbrowser.open("http://localhost:5000")
     
-    # Run app
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # Run app (no reloader: it re-runs this module in a child and would start a second scheduler)
+    app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
\ No newline at end of file
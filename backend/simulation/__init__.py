@@ -1,3 +1,6 @@
 # Simulation package
 from .iot_simulator import IoTDeviceSimulator
-from .attack_simulator import AttackSimulator
\ No newline at end of file
+from .attack_simulator import AttackSimulator
+from .scheduler import TickScheduler
+from .fleet_simulator import FleetSimulator
+from .scenario_engine import ScenarioEngine
\ No newline at end of file
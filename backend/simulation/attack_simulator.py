@@ -3,33 +3,40 @@ Attack Simulator
 """
 import time
 import random
-from datetime import datetime
 import config
+from core import clock
+from agents.threat_correlator import ThreatCorrelator
+from database.retention import RetentionStore
 
 class AttackSimulator:
     def __init__(self):
-        self.attack_log = []
+        self.attack_log = RetentionStore("attacks")
+        self.correlator = ThreatCorrelator()
         print("⚔️ Attack Simulator initialized")
     
     def generate_attack(self):
         """Generate simulated attack"""
         attack_type = random.choice(config.ATTACK_TYPES)
         attack = {
-            'id': f"ATT{len(self.attack_log)+1:04d}",
+            'id': f"ATT{self.attack_log.total+1:04d}",
             'type': attack_type,
             'source': f"10.0.0.{random.randint(1, 255)}",
             'target': f"192.168.1.{random.randint(10, 100)}",
-            'time': datetime.now().strftime("%H:%M:%S"),
+            'time': clock.now().strftime("%H:%M:%S"),
             'severity': random.choice(['Low', 'Medium', 'High']),
             'status': 'Active'
         }
         
-        self.attack_log.append(attack)
+        # Repeats of the same attack fold into one logged incident
+        incident, status = self.correlator.ingest(attack)
+        if status == 'new':
+            self.attack_log.append(incident)
         
         # Log attack
-        self._log_attack(attack)
+        if status != 'merged':
+            self._log_attack(incident)
         
-        return attack
+        return incident
     
     def _log_attack(self, attack):
         """Log attack to file"""
@@ -42,4 +49,4 @@ class AttackSimulator:
     
     def get_recent_attacks(self):
         """Get recent attacks"""
-        return self.attack_log[-10:] if self.attack_log else []
\ No newline at end of file
+        return self.attack_log.recent(10)
\ No newline at end of file
@@ -0,0 +1,86 @@
+"""
+Fleet Simulator - vectorized IoT device simulation for large fleets
+"""
+import time
+
+import numpy as np
+import config
+from core import clock
+
+VENDORS = ['Philips', 'Samsung', 'Google']
+STATUSES = ['Online', 'Offline', 'Busy']
+ONLINE, OFFLINE, BUSY = range(len(STATUSES))
+
+
+class FleetSimulator:
+    """IoTDeviceSimulator for 100k-1M devices.
+
+    Device state lives in NumPy columns (one element per device) and every
+    tick updates the whole fleet in a few array operations. Device dicts
+    in the IoTDeviceSimulator shape are only built for the slice a caller
+    asks for in get_devices().
+    """
+
+    def __init__(self, num_devices=None, seed=None):
+        self.num_devices = num_devices or config.FLEET_SIZE
+        self.rng = np.random.default_rng(seed)
+        self.names = [f"{vendor} {device_type}" for vendor in VENDORS for device_type in config.DEVICE_TYPES]
+        self.create_devices(self.num_devices)
+        print(f"📱 Created {self.num_devices:,} IoT devices (fleet mode)")
+
+    def create_devices(self, num_devices):
+        """Allocate the device columns"""
+        n = num_devices
+        self.name_idx = self.rng.integers(0, len(self.names), n, dtype=np.uint8)
+        self.type_idx = self.rng.integers(0, len(config.DEVICE_TYPES), n, dtype=np.uint8)
+        self.status = np.full(n, ONLINE, dtype=np.uint8)
+        self.activity = self.rng.integers(10, 101, n, dtype=np.uint8)
+        self.last_active = np.full(n, clock.time())
+
+    def simulate_activity(self):
+        """Simulate one tick of activity for every device at once"""
+        n = self.num_devices
+        self.activity[:] = self.rng.integers(10, 101, n, dtype=np.uint8)
+        self.last_active.fill(clock.time())
+
+        # Occasionally change status (5% chance per device)
+        changed = np.flatnonzero(self.rng.random(n, dtype=np.float32) < 0.05)
+        self.status[changed] = self.rng.integers(0, len(STATUSES), len(changed), dtype=np.uint8)
+
+    def get_devices(self, offset=0, limit=None):
+        """Device dicts for a slice of the fleet, shaped like IoTDeviceSimulator.get_devices()"""
+        stop = self.num_devices if limit is None else min(self.num_devices, offset + limit)
+        names, types = self.names, config.DEVICE_TYPES
+        clock = {}
+        devices = []
+        for i in range(offset, stop):
+            ts = float(self.last_active[i])
+            if ts not in clock:
+                clock[ts] = time.strftime("%H:%M:%S", time.localtime(ts))
+            devices.append({
+                'id': f"DEV{i+1:03d}",
+                'name': names[self.name_idx[i]],
+                'ip': self.device_ip(i),
+                'type': types[self.type_idx[i]],
+                'status': STATUSES[self.status[i]],
+                'last_active': clock[ts],
+                'activity': int(self.activity[i])
+            })
+        return devices
+
+    @staticmethod
+    def device_ip(i):
+        """Address of device `i`; the first 246 match IoTDeviceSimulator's 192.168.1.x layout"""
+        if i < 246:
+            return f"192.168.1.{i+10}"
+        return f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}"
+
+    def get_status_counts(self):
+        """Device counts by status, computed over the whole fleet"""
+        counts = np.bincount(self.status, minlength=len(STATUSES))
+        summary = {status: int(count) for status, count in zip(STATUSES, counts)}
+        summary['total'] = self.num_devices
+        return summary
+
+    def __len__(self):
+        return self.num_devices
@@ -1,10 +1,9 @@
 """
 IoT Device Simulator
 """
-import time
 import random
-from datetime import datetime
 import config
+from core import clock
 
 class IoTDeviceSimulator:
     def __init__(self, num_devices=8):
@@ -21,25 +20,35 @@ class IoTDeviceSimulator:
                 'ip': f"192.168.1.{i+10}",
                 'type': random.choice(config.DEVICE_TYPES),
                 'status': 'Online',
-                'last_active': datetime.now().strftime("%H:%M:%S"),
+                'last_active': clock.now().strftime("%H:%M:%S"),
                 'activity': random.randint(10, 100)
             }
             self.devices.append(device)
     
     def simulate_activity(self):
-        """Simulate device activity"""
-        while True:
-            for device in self.devices:
-                # Update activity
-                device['activity'] = random.randint(10, 100)
-                device['last_active'] = datetime.now().strftime("%H:%M:%S")
-                
-                # Occasionally change status
-                if random.random() < 0.05:  # 5% chance
-                    device['status'] = random.choice(['Online', 'Offline', 'Busy'])
+        """Simulate one tick of device activity (the tick scheduler sets the cadence)"""
+        for device in self.devices:
+            # Update activity
+            device['activity'] = random.randint(10, 100)
+            device['last_active'] = clock.now().strftime("%H:%M:%S")
             
-            time.sleep(10)  # Update every 10 seconds
+            # Occasionally change status
+            if random.random() < 0.05:  # 5% chance
+                device['status'] = random.choice(['Online', 'Offline', 'Busy'])
     
-    def get_devices(self):
+    def get_devices(self, offset=0, limit=None):
         """Get current device states"""
-        return self.devices
\ No newline at end of file
+        if offset or limit is not None:
+            return self.devices[offset:None if limit is None else offset + limit]
+        return self.devices
+    
+    def get_status_counts(self):
+        """Device counts by status"""
+        summary = {'Online': 0, 'Offline': 0, 'Busy': 0}
+        for device in self.devices:
+            summary[device['status']] = summary.get(device['status'], 0) + 1
+        summary['total'] = len(self.devices)
+        return summary
+    
+    def __len__(self):
+        return len(self.devices)
\ No newline at end of file
@@ -4,16 +4,29 @@ Network Traffic Simulator
 import time
 import random
 import threading
-from datetime import datetime, timedelta
+from datetime import timedelta
 import socket
 import struct
 from scapy.all import IP, TCP, UDP, ICMP, Ether
-import config
+from core import clock
+from core.metrics import REGISTRY
+from database.records import TrafficRecord
+from database.threat_intel import get_threat_intel
+from models.sketches import TrafficSketch
+
+TICK_SECONDS = REGISTRY.histogram("simulation_tick_seconds", "Duration of one simulation tick", ["simulator"])
 
 class NetworkSimulator:
-    def __init__(self):
+    def __init__(self, archive=None):
         self.devices = []
         self.traffic_log = []
+        # Heavy hitters and scan detection in fixed memory, fed by every record
+        self.sketch = TrafficSketch()
+        # Known-bad addresses, checked for each batch of records
+        self.intel = get_threat_intel()
+        # Everything logged is also kept on disk when given a (writer) TrafficArchive;
+        # traffic_log is only the recent tail
+        self.archive = archive
         self.simulation_running = False
         self.traffic_thread = None
         
@@ -21,7 +34,7 @@ class NetworkSimulator:
         """Add a device to the simulation"""
         self.devices.append({
             **device_info,
-            'last_activity': datetime.now(),
+            'last_activity': clock.now(),
             'traffic_stats': {
                 'sent_packets': 0,
                 'received_packets': 0,
@@ -38,48 +51,57 @@ class NetworkSimulator:
         self.simulation_running = True
         self.traffic_thread = threading.Thread(target=self._simulate_traffic, daemon=True)
         self.traffic_thread.start()
-        print(f"[{datetime.now()}] 🌐 Network traffic simulation started")
+        print(f"[{clock.now()}] 🌐 Network traffic simulation started")
     
     def stop_simulation(self):
         """Stop network traffic simulation"""
         self.simulation_running = False
         if self.traffic_thread:
             self.traffic_thread.join(timeout=2)
-        print(f"[{datetime.now()}] 🌐 Network traffic simulation stopped")
+        if self.archive is not None:
+            self.archive.flush()
+        print(f"[{clock.now()}] 🌐 Network traffic simulation stopped")
     
     def _simulate_traffic(self):
         """Simulate network traffic between devices"""
         while self.simulation_running:
             if len(self.devices) < 2:
-                time.sleep(5)
+                clock.sleep(5)
                 continue
             
-            # Generate random traffic between devices
-            num_transactions = random.randint(1, 5)
-            
-            for _ in range(num_transactions):
-                # Randomly select source and destination devices
-                src_device = random.choice(self.devices)
-                dst_device = random.choice([d for d in self.devices if d != src_device])
-                
-                # Generate traffic data
-                traffic = self._generate_traffic(src_device, dst_device)
-                
-                if traffic:
-                    self.traffic_log.append(traffic)
-                    
-                    # Update device stats
-                    src_device['traffic_stats']['sent_packets'] += 1
-                    src_device['traffic_stats']['sent_bytes'] += traffic.get('bytes', 0)
-                    dst_device['traffic_stats']['received_packets'] += 1
-                    dst_device['traffic_stats']['received_bytes'] += traffic.get('bytes', 0)
-                    
-                    # Keep log size manageable
-                    if len(self.traffic_log) > 1000:
-                        self.traffic_log = self.traffic_log[-500:]
+            started = time.perf_counter()
+            self.simulate_tick()
+            TICK_SECONDS.labels("network").observe(time.perf_counter() - started)
             
             # Sleep before next traffic generation
-            time.sleep(random.uniform(0.5, 2.0))
+            clock.sleep(random.uniform(0.5, 2.0))
+    
+    def simulate_tick(self):
+        """Generate one burst of traffic between devices; returns the new records"""
+        if len(self.devices) < 2:
+            return []
+        
+        # Generate random traffic between devices
+        num_transactions = random.randint(1, 5)
+        batch = []
+        
+        for _ in range(num_transactions):
+            # Randomly select source and destination devices
+            src_device = random.choice(self.devices)
+            dst_device = random.choice([d for d in self.devices if d != src_device])
+            
+            # Generate traffic data
+            traffic = self._generate_traffic(src_device, dst_device)
+            
+            if traffic:
+                batch.append(traffic)
+                
+                # Update device stats
+                src_device['traffic_stats']['sent_packets'] += 1
+                src_device['traffic_stats']['sent_bytes'] += traffic.get('bytes', 0)
+                dst_device['traffic_stats']['received_packets'] += 1
+                dst_device['traffic_stats']['received_bytes'] += traffic.get('bytes', 0)
+        return self._log_batch(batch)
     
     def _generate_traffic(self, src_device, dst_device):
         """Generate simulated network traffic"""
@@ -108,7 +130,7 @@ class NetworkSimulator:
         is_suspicious = random.random() < 0.05  # 5% chance
         
         traffic = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': clock.now().isoformat(),
             'source_ip': src_device.get('ip', '192.168.1.100'),
             'source_mac': src_device.get('mac', '00:00:00:00:00:00'),
             'destination_ip': dst_device.get('ip', '192.168.1.101'),
@@ -133,9 +155,48 @@ class NetworkSimulator:
         
         return traffic
     
+    def record_traffic(self, traffic):
+        """Ingest one externally generated traffic record (e.g. scenario replay)"""
+        return self._log_traffic({'timestamp': clock.time(), **traffic})
+    
+    def _log_traffic(self, traffic):
+        """Store one traffic record"""
+        return self._log_batch([traffic])[0]
+    
+    def _log_batch(self, batch):
+        """Store traffic records, checking reputation and feeding the sketches"""
+        records = [TrafficRecord.from_dict(traffic) for traffic in batch]
+        if not records:
+            return records
+        
+        # One reputation lookup for every source and destination in the batch
+        listed = self.intel.lookup_batch(
+            [r.source_ip for r in records] + [r.destination_ip for r in records]
+        )
+        n = len(records)
+        
+        for i, record in enumerate(records):
+            # A source the sketches flag as scanning marks its traffic for the detector
+            flag = self.sketch.add(record)
+            if not record.is_suspicious:
+                if listed[i] or listed[n + i]:
+                    record.is_suspicious = True
+                    record.suspicious_type = 'Known Malicious IP'
+                elif flag:
+                    record.is_suspicious = True
+                    record.suspicious_type = flag
+        self.traffic_log.extend(records)
+        if self.archive is not None:
+            self.archive.append_batch(records)
+        
+        # Keep log size manageable
+        if len(self.traffic_log) > 1000:
+            self.traffic_log = self.traffic_log[-500:]
+        return records
+    
     def generate_port_scan(self, attacker_ip, target_network):
         """Simulate a port scan attack"""
-        print(f"[{datetime.now()}] 🔍 Simulating port scan from {attacker_ip}")
+        print(f"[{clock.now()}] 🔍 Simulating port scan from {attacker_ip}")
         
         scan_traffic = []
         target_ip = target_network.rstrip('0') + str(random.randint(2, 254))
@@ -145,7 +206,7 @@ class NetworkSimulator:
         
         for port in common_ports[:random.randint(5, 10)]:  # Scan 5-10 ports
             scan_traffic.append({
-                'timestamp': datetime.now().isoformat(),
+                'timestamp': clock.now().isoformat(),
                 'source_ip': attacker_ip,
                 'destination_ip': target_ip,
                 'protocol': 'TCP',
@@ -156,19 +217,19 @@ class NetworkSimulator:
                 'flags': 'SYN'
             })
         
-        self.traffic_log.extend(scan_traffic)
+        self._log_batch(scan_traffic)
         return scan_traffic
     
     def generate_brute_force(self, attacker_ip, target_ip):
         """Simulate brute force attack"""
-        print(f"[{datetime.now()}] 🔑 Simulating brute force attack from {attacker_ip}")
+        print(f"[{clock.now()}] 🔑 Simulating brute force attack from {attacker_ip}")
         
         attack_traffic = []
         port = random.choice([22, 23, 3389])  # SSH, Telnet, RDP
         
         for attempt in range(random.randint(10, 30)):
             attack_traffic.append({
-                'timestamp': (datetime.now() + timedelta(seconds=attempt*0.1)).isoformat(),
+                'timestamp': (clock.now() + timedelta(seconds=attempt*0.1)).isoformat(),
                 'source_ip': attacker_ip,
                 'destination_ip': target_ip,
                 'protocol': 'TCP',
@@ -179,17 +240,20 @@ class NetworkSimulator:
                 'credentials_attempt': f"user{attempt}:password{attempt}"
             })
         
-        self.traffic_log.extend(attack_traffic)
+        self._log_batch(attack_traffic)
         return attack_traffic
     
     def get_traffic_summary(self, minutes=5):
-        """Get traffic summary for the last N minutes"""
-        cutoff = datetime.now() - timedelta(minutes=minutes)
+        """Get traffic summary for the last N minutes.
+
+        Packet, byte and protocol counts cover the last `minutes` of the
+        recent traffic log. Top sources and destinations come from the
+        sketches, which can't be cut to an arbitrary window: they cover the
+        current and previous SKETCH_WINDOW, reported as top_window_seconds.
+        """
+        cutoff = (clock.now() - timedelta(minutes=minutes)).timestamp()
         
-        recent_traffic = [
-            t for t in self.traffic_log
-            if datetime.fromisoformat(t['timestamp']) > cutoff
-        ]
+        recent_traffic = [t for t in self.traffic_log if t.timestamp > cutoff]
         
         if not recent_traffic:
             return {
@@ -203,32 +267,20 @@ class NetworkSimulator:
         
         # Calculate statistics
         total_packets = len(recent_traffic)
-        total_bytes = sum(t.get('bytes', 0) for t in recent_traffic)
-        suspicious_packets = sum(1 for t in recent_traffic if t.get('is_suspicious', False))
+        total_bytes = sum(t.bytes for t in recent_traffic)
+        suspicious_packets = sum(1 for t in recent_traffic if t.is_suspicious)
         
         # Count protocols
         protocol_counts = {}
         for traffic in recent_traffic:
-            proto = traffic.get('protocol', 'Unknown')
+            proto = str(traffic.protocol)
             protocol_counts[proto] = protocol_counts.get(proto, 0) + 1
         
         top_protocols = sorted(protocol_counts.items(), key=lambda x: x[1], reverse=True)[:5]
         
-        # Count source IPs
-        source_counts = {}
-        for traffic in recent_traffic:
-            src = traffic.get('source_ip', 'Unknown')
-            source_counts[src] = source_counts.get(src, 0) + 1
-        
-        top_sources = sorted(source_counts.items(), key=lambda x: x[1], reverse=True)[:5]
-        
-        # Count destination IPs
-        dest_counts = {}
-        for traffic in recent_traffic:
-            dst = traffic.get('destination_ip', 'Unknown')
-            dest_counts[dst] = dest_counts.get(dst, 0) + 1
-        
-        top_destinations = sorted(dest_counts.items(), key=lambda x: x[1], reverse=True)[:5]
+        # Heavy hitters come from the sketches: fixed memory however many IPs appear
+        top_sources = self.sketch.top_sources(5)
+        top_destinations = self.sketch.top_destinations(5)
         
         return {
             'total_packets': total_packets,
@@ -238,27 +290,31 @@ class NetworkSimulator:
             'top_protocols': top_protocols,
             'top_sources': top_sources,
             'top_destinations': top_destinations,
-            'sample_traffic': recent_traffic[-10:] if recent_traffic else []
+            'top_window_seconds': round(self.sketch.span(), 1),
+            'scan_suspects': self.sketch.scan_suspects(),
+            'sketch': self.sketch.get_stats(),
+            'threat_intel': self.intel.get_stats(),
+            'sample_traffic': [t.to_dict() for t in recent_traffic[-10:]]
         }
     
     def get_device_traffic_stats(self, device_id):
         """Get traffic statistics for a specific device"""
         device_traffic = [
             t for t in self.traffic_log
-            if t.get('src_device_id') == device_id or t.get('dst_device_id') == device_id
+            if t.src_device_id == device_id or t.dst_device_id == device_id
         ]
         
-        sent = [t for t in device_traffic if t.get('src_device_id') == device_id]
-        received = [t for t in device_traffic if t.get('dst_device_id') == device_id]
+        sent = [t for t in device_traffic if t.src_device_id == device_id]
+        received = [t for t in device_traffic if t.dst_device_id == device_id]
         
         return {
             'device_id': device_id,
             'total_packets': len(device_traffic),
             'sent_packets': len(sent),
             'received_packets': len(received),
-            'total_bytes': sum(t.get('bytes', 0) for t in device_traffic),
-            'sent_bytes': sum(t.get('bytes', 0) for t in sent),
-            'received_bytes': sum(t.get('bytes', 0) for t in received),
-            'suspicious_packets': sum(1 for t in device_traffic if t.get('is_suspicious', False)),
-            'recent_traffic': device_traffic[-20:] if device_traffic else []
+            'total_bytes': sum(t.bytes for t in device_traffic),
+            'sent_bytes': sum(t.bytes for t in sent),
+            'received_bytes': sum(t.bytes for t in received),
+            'suspicious_packets': sum(1 for t in device_traffic if t.is_suspicious),
+            'recent_traffic': [t.to_dict() for t in device_traffic[-20:]]
         }
\ No newline at end of file
@@ -0,0 +1,228 @@
+"""
+Tick Scheduler - runs simulators and agents on one thread
+"""
+import heapq
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from types import MappingProxyType
+
+from core import clock
+from core.metrics import REGISTRY
+
+TICK_SECONDS = REGISTRY.histogram("simulation_tick_seconds", "Duration of one simulation tick", ["simulator"])
+TICK_OVERRUNS = REGISTRY.counter("scheduler_tick_overruns_total", "Ticks that took longer than their interval", ["job"])
+TICK_SKIPPED = REGISTRY.counter("scheduler_ticks_skipped_total", "Ticks dropped because the scheduler fell behind", ["job"])
+
+
+def freeze(value):
+    """Deep read-only copy: dicts become mappingproxies, lists tuples, records their dict form"""
+    if hasattr(value, 'to_dict'):
+        value = value.to_dict()
+    if isinstance(value, (dict, MappingProxyType)):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+class TickScheduler:
+    """Runs periodic jobs on a single thread and publishes immutable snapshots.
+
+    Each job's tick may return a dict of state to publish. The values are
+    frozen and merged into a new snapshot, which replaces the old one with
+    a single reference assignment; readers grab `scheduler.snapshot` once
+    and see a consistent view without locks, however long they hold it.
+    Simulated state is only ever mutated on the scheduler thread; request
+    handlers that need to change it (a manual scan) hand the work over
+    with call() and wait on the returned future.
+
+    Due times follow core.clock, so under a VirtualClock run_for() replays
+    hours of ticks back to back; tick durations and overruns are always
+    measured in real time.
+    """
+
+    def __init__(self):
+        self.jobs = {}
+        self.queue = []  # (due, seq, job name)
+        self.snapshot = MappingProxyType({'version': 0})
+        self.version = 0
+        self.running = False
+        self.thread = None
+        self._seq = 0
+        self.calls = deque()  # (fn, future) to run between ticks
+        self._lock = threading.Lock()  # guards the queues only; readers never take it
+        self._inline_lock = threading.Lock()
+        self._wake = threading.Event()
+        print("⏱️ Tick Scheduler initialized")
+
+    def add_job(self, name, tick, interval, delay=0.0, publish=True):
+        """Run `tick` every `interval` seconds, first after `delay`.
+
+        With publish=False the tick's return value is ignored.
+        """
+        self.jobs[name] = {
+            'name': name,
+            'tick': tick,
+            'publish': publish,
+            'interval': interval,
+            'runs': 0,
+            'overruns': 0,
+            'skipped': 0,
+            'errors': 0,
+            'last_duration': 0.0,
+            'max_duration': 0.0,
+            'total_duration': 0.0
+        }
+        self._schedule(name, clock.monotonic() + delay)
+        self._wake.set()
+
+    def _schedule(self, name, due):
+        with self._lock:
+            self._seq += 1
+            heapq.heappush(self.queue, (due, self._seq, name))
+
+    def call(self, fn):
+        """Run `fn` on the scheduler thread between ticks; returns a Future with its result"""
+        future = Future()
+        if not self.running:
+            # No scheduler thread to hand over to: run here, still one call at a time
+            with self._inline_lock:
+                self._run_call(fn, future)
+            return future
+        with self._lock:
+            self.calls.append((fn, future))
+        self._wake.set()
+        return future
+
+    def _run_calls(self):
+        while True:
+            with self._lock:
+                if not self.calls:
+                    return
+                fn, future = self.calls.popleft()
+            self._run_call(fn, future)
+
+    @staticmethod
+    def _run_call(fn, future):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn())
+        except Exception as e:
+            future.set_exception(e)
+
+    def start(self):
+        """Start the scheduler thread"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="tick-scheduler", daemon=True)
+        self.thread.start()
+        print(f"[{clock.now()}] ⏱️ Tick scheduler started with {len(self.jobs)} jobs")
+
+    def stop(self):
+        """Stop the scheduler thread"""
+        self.running = False
+        self._wake.set()
+        if self.thread:
+            self.thread.join(timeout=2)
+
+    def _run(self):
+        while self.running:
+            self._run_calls()
+            with self._lock:
+                due, _, name = self.queue[0] if self.queue else (None, None, None)
+            wait = None if due is None else due - clock.monotonic()
+            if wait is None or wait > 0:
+                clock.wait(self._wake, wait)
+                self._wake.clear()
+                continue
+
+            with self._lock:
+                heapq.heappop(self.queue)
+            self._run_job(name, due)
+
+    def run_for(self, seconds):
+        """Run every tick due in the next `seconds` on the calling thread.
+
+        Use instead of start(). With a VirtualClock the clock jumps straight
+        to each due time, so a simulated day takes only as long as the
+        ticks' own work.
+        """
+        end = clock.monotonic() + seconds
+        while True:
+            self._run_calls()
+            with self._lock:
+                if not self.queue or self.queue[0][0] > end:
+                    break
+                due, _, name = heapq.heappop(self.queue)
+            if due > clock.monotonic():
+                clock.sleep(due - clock.monotonic())
+            self._run_job(name, due)
+        if end > clock.monotonic():
+            clock.sleep(end - clock.monotonic())
+
+    def _run_job(self, name, due):
+        """Run one tick of a job, publish its state and schedule the next tick"""
+        job = self.jobs[name]
+        started = time.perf_counter()
+        try:
+            state = job['tick']()
+        except Exception as e:
+            job['errors'] += 1
+            print(f"⚠️ Tick job {name} failed: {e}")
+            state = None
+        if state and job['publish']:
+            self.publish(state)
+
+        duration = time.perf_counter() - started
+        job['runs'] += 1
+        job['last_duration'] = duration
+        job['max_duration'] = max(job['max_duration'], duration)
+        job['total_duration'] += duration
+        TICK_SECONDS.labels(name).observe(duration)
+        if duration > job['interval']:
+            job['overruns'] += 1
+            TICK_OVERRUNS.labels(name).inc()
+
+        # Keep the cadence; ticks that are already in the past are dropped, not replayed
+        next_due = due + job['interval']
+        now = clock.monotonic()
+        if next_due < now:
+            missed = int((now - next_due) // job['interval']) + 1
+            next_due += missed * job['interval']
+            job['skipped'] += missed
+            TICK_SKIPPED.labels(name).inc(missed)
+        self._schedule(name, next_due)
+
+    def publish(self, state):
+        """Freeze `state` and swap in a new snapshot containing it"""
+        snapshot = dict(self.snapshot)
+        for key, value in state.items():
+            snapshot[key] = freeze(value)
+        self.version += 1
+        snapshot['version'] = self.version
+        snapshot['published'] = clock.now().isoformat()
+        self.snapshot = MappingProxyType(snapshot)
+
+    def get_stats(self):
+        """Get per-job tick statistics"""
+        return {
+            'running': self.running,
+            'version': self.version,
+            'jobs': {
+                name: {
+                    'interval': job['interval'],
+                    'runs': job['runs'],
+                    'overruns': job['overruns'],
+                    'skipped': job['skipped'],
+                    'errors': job['errors'],
+                    'last_duration': round(job['last_duration'], 4),
+                    'max_duration': round(job['max_duration'], 4),
+                    'avg_duration': round(job['total_duration'] / job['runs'], 4) if job['runs'] else 0.0
+                }
+                for name, job in list(self.jobs.items())
+            }
+        }
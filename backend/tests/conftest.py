@@ -0,0 +1,7 @@
+"""
+Test setup - the backend modules import each other as top-level packages (run from backend/)
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
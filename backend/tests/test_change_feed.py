@@ -0,0 +1,60 @@
+"""
+Change feed tests - changes_since edge cases and hot-window evictions
+"""
+from core.state import ChangeFeed
+from database.retention import RetentionStore
+
+
+def test_changes_since_merges_ids_per_collection():
+    feed = ChangeFeed(size=10)
+    feed.mark('devices', ['d1'])
+    feed.mark('threats', ['t1'])
+    feed.mark('devices', ['d2'])
+    assert feed.changes_since(0) == {'devices': {'d1', 'd2'}, 'threats': {'t1'}}
+    assert feed.changes_since(2) == {'devices': {'d2'}}
+    assert feed.changes_since(3) == {}
+
+
+def test_whole_collection_mark_wins():
+    feed = ChangeFeed(size=10)
+    feed.mark('devices', ['d1'])
+    feed.mark('devices')
+    feed.mark('devices', ['d2'])
+    assert feed.changes_since(0) == {'devices': None}
+
+
+def test_version_ahead_of_feed_needs_reload():
+    feed = ChangeFeed(size=10)
+    feed.mark('devices', ['d1'])
+    assert feed.changes_since(5) is None  # held from before a restart
+
+
+def test_other_epoch_needs_reload():
+    feed = ChangeFeed(size=10)
+    feed.mark('devices', ['d1'])
+    assert feed.changes_since(1, feed.epoch) == {}
+    assert feed.changes_since(1, 'stale') is None
+    assert ChangeFeed().epoch != feed.epoch
+
+
+def test_log_overflow_needs_reload():
+    feed = ChangeFeed(size=3)
+    for i in range(5):
+        feed.mark('threats', [f"t{i}"])
+    assert feed.changes_since(1) is None  # version 2 already fell out of the log
+    assert feed.changes_since(2) == {'threats': {'t2', 't3', 't4'}}
+
+
+def test_evicted_threats_are_marked_removed():
+    feed = ChangeFeed(size=100)
+    store = RetentionStore('threats', hot_seconds=60,
+                           on_evict=lambda records: feed.mark('threats', [r['id'] for r in records]))
+    store.index.segment_size = 2
+    for i in range(4):
+        store.append({'id': f"t{i}", 'type': 'Port Scan', 'severity': 'high'}, ts=1000.0 + i)
+    since = feed.version
+    store.append({'id': 't4', 'type': 'Port Scan', 'severity': 'high'}, ts=1100.0)
+
+    changed = feed.changes_since(since)['threats']
+    assert changed == {'t0', 't1', 't2', 't3'}
+    assert changed - {r['id'] for r in store} == changed  # build_delta reports these as removed
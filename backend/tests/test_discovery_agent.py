@@ -0,0 +1,109 @@
+"""
+Network sweep tests against local stand-in listeners
+"""
+import asyncio
+import time
+
+import config
+from agents import discovery_agent
+from agents.discovery_agent import DiscoveryAgent, _RateLimiter
+
+
+async def _listen(count):
+    """Start `count` localhost listeners; returns (servers, ports)"""
+    async def handle(reader, writer):
+        writer.close()
+
+    servers = [await asyncio.start_server(handle, '127.0.0.1', 0) for _ in range(count)]
+    return servers, [server.sockets[0].getsockname()[1] for server in servers]
+
+
+def _closed_port():
+    """A localhost port nothing listens on"""
+    import socket
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def test_sweep_finds_open_ports():
+    agent = DiscoveryAgent(mode="network")
+    closed = _closed_port()
+
+    async def run():
+        servers, ports = await _listen(3)
+        try:
+            found = await agent.scan_network_async('127.0.0.1/32', ports + [closed])
+        finally:
+            for server in servers:
+                server.close()
+        return ports, found
+
+    ports, found = asyncio.run(run())
+    assert len(found) == 1
+    assert found[0]['ip'] == '127.0.0.1'
+    assert sorted(found[0]['ports']) == sorted(ports)
+    assert [device['ip'] for device in agent.devices] == ['127.0.0.1']
+
+
+def test_host_timeout(monkeypatch):
+    """A port that never answers is dropped after the host timeout; the host keeps its open ports"""
+    monkeypatch.setattr(config, 'DISCOVERY_HOST_TIMEOUT', 0.2)
+    blackhole = _closed_port()
+    open_connection = asyncio.open_connection
+
+    async def filtered(host, port, **kwargs):
+        if port == blackhole:  # a firewall that drops SYNs
+            await asyncio.sleep(3600)
+        return await open_connection(host, port, **kwargs)
+
+    monkeypatch.setattr(discovery_agent.asyncio, 'open_connection', filtered)
+    agent = DiscoveryAgent(mode="network")
+
+    async def run():
+        servers, ports = await _listen(1)
+        try:
+            started = time.monotonic()
+            partial = await agent.scan_network_async('127.0.0.1/32', ports + [blackhole])
+            silent = await agent.scan_network_async('127.0.0.1/32', [blackhole])
+            return ports, partial, silent, time.monotonic() - started
+        finally:
+            for server in servers:
+                server.close()
+
+    ports, partial, silent, elapsed = asyncio.run(run())
+    assert partial[0]['ports'] == ports
+    assert silent == []  # no port answered at all: the host counts as down
+    assert elapsed < 2
+
+
+def test_rate_limiter_spaces_attempts():
+    async def run():
+        limiter = _RateLimiter(50)
+        started = asyncio.get_running_loop().time()
+        for _ in range(6):
+            await limiter.acquire()
+        await limiter.acquire(5)
+        return asyncio.get_running_loop().time() - started
+
+    # 6 single slots then a block of 5: the last acquire waits for slot 6 at 6 / 50s
+    assert 0.11 <= asyncio.run(run()) < 0.5
+    assert _RateLimiter(0).interval == 0.0
+
+
+def test_sweep_rate_limit_and_progress(monkeypatch):
+    """Every loopback address refuses (host up, no ports); 6 hosts x 2 ports at 40/s takes >= 0.25s"""
+    monkeypatch.setattr(config, 'DISCOVERY_RATE_LIMIT', 40)
+    agent = DiscoveryAgent(mode="network")
+    updates = []
+
+    started = time.monotonic()
+    found = asyncio.run(agent.scan_network_async('127.0.0.0/29', [_closed_port(), _closed_port()],
+                                                 on_progress=updates.append))
+    elapsed = time.monotonic() - started
+
+    assert elapsed >= 0.25
+    assert len(found) == 6
+    assert all(device['ports'] == [] for device in found)
+    assert [update['scanned'] for update in updates] == [1, 2, 3, 4, 5, 6]
+    assert updates[-1] == {'scanned': 6, 'total': 6, 'found': 6}
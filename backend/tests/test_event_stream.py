@@ -0,0 +1,81 @@
+"""
+Server-Sent Events stream tests - Last-Event-ID replay and ring wrap-around
+"""
+import asyncio
+import json
+import re
+
+from core.event_stream import EventStream
+
+
+def parse(chunk):
+    """[(id or None, event, data)] from a chunk of SSE frames"""
+    frames = []
+    for block in chunk.decode().split("\n\n"):
+        fields = dict(re.findall(r"^(id|event|data): (.*)$", block, re.M))
+        if 'event' in fields:
+            frames.append((int(fields['id']) if 'id' in fields else None, fields['event'],
+                           json.loads(fields['data'])))
+    return frames
+
+
+async def first_chunks(stream, count, **kwargs):
+    """The first `count` chunks after the retry line"""
+    subscription = stream.subscribe(**kwargs)
+    assert (await subscription.__anext__()).startswith(b"retry:")
+    chunks = [await asyncio.wait_for(subscription.__anext__(), 1) for _ in range(count)]
+    await subscription.aclose()
+    return chunks
+
+
+def test_replays_events_after_last_event_id():
+    async def run():
+        stream = EventStream(size=100)
+        for n in range(5):
+            stream.publish({'type': 'threat_alert', 'n': n})
+        return await first_chunks(stream, 1, last_id=2)
+
+    frames = parse(asyncio.run(run())[0])
+    assert [frame[0] for frame in frames] == [3, 4, 5]
+    assert [frame[2]['n'] for frame in frames] == [2, 3, 4]
+
+
+def test_wrapped_ring_sends_reset_then_what_is_left():
+    async def run():
+        stream = EventStream(size=4)
+        for n in range(10):
+            stream.publish({'type': 'tick', 'n': n})
+        return await first_chunks(stream, 1, last_id=1)
+
+    frames = parse(asyncio.run(run())[0])
+    assert frames[0] == (None, 'reset', {'missed': 5})  # ids 2-6 were overwritten
+    assert [frame[0] for frame in frames[1:]] == [7, 8, 9, 10]
+
+
+def test_id_from_a_previous_server_resets():
+    async def run():
+        stream = EventStream(size=10)
+        stream.publish({'type': 'tick'})
+        return await first_chunks(stream, 1, last_id=500)
+
+    assert parse(asyncio.run(run())[0]) == [(None, 'reset', {'missed': None})]
+
+
+def test_type_filter_and_live_delivery():
+    async def run():
+        stream = EventStream(size=10)
+        stream.publish({'type': 'tick'})
+        subscription = stream.subscribe(last_id=0, types={'threat_alert'})
+        await subscription.__anext__()  # retry line
+        pending = asyncio.ensure_future(subscription.__anext__())
+        await asyncio.sleep(0.01)
+        assert not pending.done()  # the only event so far is filtered out
+        stream.publish({'type': 'tick'})
+        stream.publish({'type': 'threat_alert', 'id': 'THR1'})
+        chunk = await asyncio.wait_for(pending, 1)
+        await subscription.aclose()
+        return chunk, stream.subscribers
+
+    chunk, subscribers = asyncio.run(run())
+    assert parse(chunk) == [(3, 'threat_alert', {'type': 'threat_alert', 'id': 'THR1'})]
+    assert subscribers == 0
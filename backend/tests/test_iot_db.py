@@ -0,0 +1,105 @@
+"""
+IoT database tests - rollup-backed threat summaries against a brute-force COUNT
+"""
+import asyncio
+import random
+import sqlite3
+
+import pytest
+
+from database.iot_db import IoTDatabase
+from database.records import to_iso
+
+START = 1.7e9 + 1234.5  # not on an hour boundary
+SPAN = 30 * 3600
+STATUSES = ['active', 'resolved', 'mitigated']
+SEVERITIES = ['Low', 'Medium', 'High', 'Critical']
+TARGETS = [f"192.168.1.{i}" for i in range(5)]
+
+
+def threat(i, ts, **fields):
+    return {'id': f"threat_{i}", 'type': 'Port Scan', 'source': '203.0.113.9', 'target': TARGETS[i % 5],
+            'severity': SEVERITIES[i % 4], 'timestamp': ts, 'status': STATUSES[i % 3], **fields}
+
+
+@pytest.fixture
+def db(tmp_path):
+    rng = random.Random(7)
+    db = IoTDatabase(str(tmp_path / 'iot.db'), readers=2)
+    db.insert_threats([threat(i, START + rng.uniform(0, SPAN)) for i in range(3000)])
+    yield db
+    db.close()
+
+
+def brute_force(db, since, until, target=None):
+    """The summary computed the slow way, straight from the threats table"""
+    clauses, params = [], []
+    if since is not None:
+        clauses.append('timestamp >= ?')
+        params.append(to_iso(since))
+    if until is not None:
+        clauses.append('timestamp < ?')
+        params.append(to_iso(until))
+    if target is not None:
+        clauses.append('target = ?')
+        params.append(target)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    conn = sqlite3.connect(db.path)
+    rows = conn.execute(f"SELECT status, severity, COUNT(*) FROM threats{where} GROUP BY status, severity", params).fetchall()
+    conn.close()
+    by_status, by_severity = {}, {}
+    for status, severity, count in rows:
+        by_status[status] = by_status.get(status, 0) + count
+        by_severity[severity] = by_severity.get(severity, 0) + count
+    return {'total': sum(by_status.values()), 'by_status': by_status, 'by_severity': by_severity}
+
+
+def test_summary_matches_count_on_unaligned_windows(db):
+    rng = random.Random(11)
+    windows = [(None, None), (START + 5000.25, None), (None, START + 7 * 3600 + 17.5),
+               (START + 600, START + 1800)]  # inside one hour: no rollup rows at all
+    for _ in range(20):
+        since = START + rng.uniform(-3600, SPAN)
+        windows.append((since, since + rng.uniform(60, 12 * 3600)))
+
+    async def check():
+        for since, until in windows:
+            for target in (None, TARGETS[2]):
+                assert await db.threat_summary(since, until, target) == brute_force(db, since, until, target)
+    asyncio.run(check())
+
+
+def test_writes_invalidate_cached_summaries(db):
+    since, until = START + 3600.5, START + 10 * 3600.5
+
+    async def check():
+        before = await db.threat_summary(since, until)
+        db.insert_threats([threat(10_000, START + 5 * 3600, status='active')])
+        after = await db.threat_summary(since, until)
+        assert after['total'] == before['total'] + 1
+
+        # A commit from another connection (another process) clears the cache too
+        conn = sqlite3.connect(db.path)
+        conn.execute("INSERT INTO threats VALUES ('threat_10001', 'DDoS', '203.0.113.9', '192.168.1.1', "
+                     "'High', ?, 'active')", (to_iso(START + 6 * 3600),))
+        conn.commit()
+        conn.close()
+        assert (await db.threat_summary(since, until))['total'] == before['total'] + 2
+        assert await db.threat_summary(since, until) == brute_force(db, since, until)
+    asyncio.run(check())
+
+
+def test_upsert_moves_rollup_counts(db):
+    ts = START + 2 * 3600 + 10
+
+    async def check():
+        db.insert_threats([threat(20_000, ts, status='active', severity='Low')])
+        before = await db.threat_summary()
+        db.insert_threats([threat(20_000, ts, status='resolved', severity='Critical')])
+        after = await db.threat_summary()
+        assert after['total'] == before['total']
+        assert after['by_status']['active'] == before['by_status']['active'] - 1
+        assert after['by_status']['resolved'] == before['by_status']['resolved'] + 1
+        assert after['by_severity']['Critical'] == before['by_severity']['Critical'] + 1
+        assert after == brute_force(db, None, None)
+    asyncio.run(check())
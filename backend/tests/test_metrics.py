@@ -0,0 +1,50 @@
+"""
+Metrics tests - per-thread cells of finished threads fold into the base cell
+"""
+import threading
+
+from core.metrics import MetricsRegistry
+
+
+def test_finished_threads_fold_into_base_cell():
+    registry = MetricsRegistry()
+    requests = registry.counter('requests_total', 'Requests', ('route',))
+    latency = registry.histogram('latency_seconds', 'Latency')
+
+    def handle():
+        requests.labels('/api').inc()
+        latency.observe(0.003)
+
+    for _ in range(500):
+        thread = threading.Thread(target=handle)
+        thread.start()
+        thread.join()
+
+    counter = requests.labels('/api')
+    assert counter.value() == 500
+    assert len(counter.shards.cells) <= 1
+    assert len(latency._default.shards.cells) <= 1
+    assert latency._default.snapshot()[1] == 500
+    assert 'requests_total{route="/api"} 500' in registry.render()
+
+
+def test_live_threads_keep_their_cells():
+    registry = MetricsRegistry()
+    requests = registry.counter('requests_total', 'Requests')
+    ready, done = threading.Barrier(9), threading.Event()
+
+    def handle():
+        requests.inc()
+        ready.wait()
+        done.wait()
+
+    threads = [threading.Thread(target=handle) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    assert len(requests._default.shards.cells) == 8
+    assert requests._default.value() == 8
+    done.set()
+    for thread in threads:
+        thread.join()
+    assert requests._default.value() == 8
@@ -0,0 +1,76 @@
+"""
+Tick scheduler tests - frozen snapshots and work handed to the scheduler thread
+"""
+import threading
+
+import pytest
+
+from core import clock
+from core.clock import VirtualClock
+from simulation.scheduler import TickScheduler
+
+
+@pytest.fixture
+def virtual_clock():
+    previous = clock.set_clock(VirtualClock())
+    yield
+    clock.set_clock(previous)
+
+
+def test_snapshot_is_immutable():
+    scheduler = TickScheduler()
+    devices = [{'id': 'DEV1', 'ports': [80, 443]}]
+    scheduler.publish({'devices': devices})
+    snapshot = scheduler.snapshot
+
+    with pytest.raises(TypeError):
+        snapshot['devices'] = ()
+    with pytest.raises(TypeError):
+        snapshot['devices'][0]['id'] = 'DEV2'
+    assert snapshot['devices'][0]['ports'] == (80, 443)
+
+    # Later changes to the source objects never reach a published snapshot
+    devices[0]['id'] = 'DEV2'
+    devices.append({'id': 'DEV3'})
+    assert [d['id'] for d in snapshot['devices']] == ['DEV1']
+
+
+def test_publish_swaps_snapshot_and_keeps_other_keys():
+    scheduler = TickScheduler()
+    scheduler.publish({'devices': [1], 'threats': [2]})
+    first = scheduler.snapshot
+    scheduler.publish({'threats': [3]})
+
+    assert first['threats'] == (2,) and first['version'] == 1
+    assert scheduler.snapshot['threats'] == (3,)
+    assert scheduler.snapshot['devices'] == (1,)
+    assert scheduler.snapshot['version'] == 2
+
+
+def test_ticks_publish_in_order(virtual_clock):
+    scheduler = TickScheduler()
+    ticks = []
+
+    def tick():
+        ticks.append(len(ticks) + 1)
+        return {'ticks': ticks}
+
+    scheduler.add_job('counter', tick, 10)
+    scheduler.run_for(35)
+    assert scheduler.snapshot['ticks'] == (1, 2, 3, 4)
+
+
+def test_call_runs_on_scheduler_thread():
+    scheduler = TickScheduler()
+    scheduler.start()
+    try:
+        thread = scheduler.call(threading.current_thread).result(timeout=5)
+        assert thread is scheduler.thread
+
+        def fail():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            scheduler.call(fail).result(timeout=5)
+    finally:
+        scheduler.stop()
@@ -0,0 +1,61 @@
+"""
+Threat intel tests - out-of-band compiles and lookups across a table swap
+"""
+import fcntl
+import os
+
+import numpy as np
+import pytest
+
+import config
+from database.threat_intel import ThreatIntel, compile_if_stale
+
+
+def write_feed(path, lines, mtime):
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.utime(path, ns=(mtime, mtime))
+
+
+@pytest.fixture
+def paths(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'THREAT_INTEL_RELOAD_INTERVAL', 0)
+    return str(tmp_path / 'feed.txt'), str(tmp_path / 'intel' / 'table.bin')
+
+
+def test_lookups_never_compile(paths):
+    feed, table = paths
+    write_feed(feed, ['10.0.0.7'], 10**18)
+    intel = ThreatIntel(table)
+    assert not intel.contains('10.0.0.7')
+    assert not os.path.exists(table)
+
+
+def test_lookups_follow_a_swapped_table(paths):
+    feed, table = paths
+    write_feed(feed, ['10.0.0.7', '192.0.2.0/24'], 10**18)
+    assert compile_if_stale(feed, table) == 2
+    assert compile_if_stale(feed, table) is None  # up to date
+
+    intel = ThreatIntel(table)
+    old_table = intel.table
+    assert intel.lookup_batch(['10.0.0.7', '192.0.2.99', '10.9.9.9']).tolist() == [True, True, False]
+
+    write_feed(feed, ['10.9.9.9', '172.16.0.0-172.16.0.9'], os.stat(table).st_mtime_ns + 1)
+    assert compile_if_stale(feed, table) == 2
+    assert intel.lookup_batch(['10.0.0.7', '192.0.2.99', '10.9.9.9']).tolist() == [False, False, True]
+    assert intel.contains('172.16.0.5') and not intel.contains('10.0.0.7')
+
+    # Lookups that read the old tuple keep working on the old mapping
+    starts, ends, _ = old_table
+    assert int(np.searchsorted(starts, np.uint32(0x0A000007), side='right')) == 1
+
+
+def test_concurrent_compiler_skips(paths):
+    feed, table = paths
+    write_feed(feed, ['10.0.0.7'], 10**18)
+    os.makedirs(os.path.dirname(table))
+    with open(f"{table}.lock", 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)  # another process is compiling
+        assert compile_if_stale(feed, table) is None
+    assert compile_if_stale(feed, table) == 1
@@ -0,0 +1,71 @@
+"""
+Time index tests - counts and ranges against a brute-force scan
+"""
+import random
+
+from database.time_index import TimeIndex
+
+
+def brute_range(events, since=None, until=None):
+    return [r for t, r in sorted(events, key=lambda e: e[0])
+            if (since is None or t >= since) and (until is None or t < until)]
+
+
+def check(index, events, bounds):
+    for since in bounds:
+        for until in bounds:
+            expected = brute_range(events, since, until)
+            assert index.count_between(since, until) == len(expected), (since, until)
+            assert sorted(index.range(since, until)) == sorted(expected), (since, until)
+
+
+def test_equal_timestamps_across_segment_boundaries():
+    index = TimeIndex(segment_size=2)
+    for i in range(5):
+        index.append(i, ts=5.0)
+    assert index.count_between(5.0) == 5
+    assert index.range(5.0) == [0, 1, 2, 3, 4]
+    assert index.count_between(None, 5.0) == 0
+    assert index.range(5.0, limit=3) == [0, 1, 2]
+
+
+def test_ticks_of_shared_timestamps():
+    # Under the virtual clock every event of a tick has the same clock.time()
+    index = TimeIndex(segment_size=3)
+    events = []
+    for tick in range(10):
+        for _ in range(random.Random(tick).randint(1, 7)):
+            events.append((float(tick), len(events)))
+            index.append(events[-1][1], ts=float(tick))
+    check(index, events, [None, -1.0, 0.0, 0.5, 3.0, 3.5, 9.0, 10.0])
+
+
+def test_late_inserts():
+    rng = random.Random(3)
+    index = TimeIndex(segment_size=4)
+    events = []
+    for i in range(200):
+        ts = float(rng.randint(0, 40))  # mostly out of order, many duplicates
+        events.append((ts, i))
+        index.append(i, ts=ts)
+    assert len(index) == 200
+    check(index, events, [None] + [float(t) for t in range(-1, 42, 3)] + [7.5])
+
+
+def test_counts_after_eviction():
+    index = TimeIndex(segment_size=3)
+    events = []
+    for i in range(30):
+        ts = float(i // 4)  # runs of four equal timestamps
+        events.append((ts, i))
+        index.append(i, ts=ts)
+    dropped = index.evict_before(3.0)
+    kept = events[dropped:]
+    assert dropped and all(t >= 2.0 for t, _ in kept)
+    assert list(index) == [r for _, r in kept]
+    check(index, kept, [None, 2.0, 3.0, 4.0, 7.0, 8.0])
+
+    dropped += index.evict_oldest(10)
+    kept = events[dropped:]
+    assert len(index) == len(kept) and len(kept) - 3 < 10
+    check(index, kept, [None, 4.0, 5.0, 6.0, 7.0, 8.0])
@@ -0,0 +1,64 @@
+"""
+Traffic archive tests - sealing buffered rows, shard directories, merged queries
+"""
+import os
+import time
+
+import pytest
+
+from database.traffic_archive import SHARD_DIR, TrafficArchive
+
+START = time.time() - 600  # inside the retention window
+
+
+def records(start, count, source='192.168.1.10', step=1.0):
+    return [{'timestamp': start + i * step, 'source_ip': source, 'destination_ip': '192.168.1.1',
+             'protocol': 'TCP', 'port': 443, 'bytes': 100 + i} for i in range(count)]
+
+
+def test_rows_are_sealed_on_exit_from_with_block(tmp_path):
+    with TrafficArchive(str(tmp_path)) as archive:
+        archive.append_batch(records(START, 50))
+        assert TrafficArchive(str(tmp_path), writer=False).get_stats()['sealed_rows'] == 0
+    assert TrafficArchive(str(tmp_path), writer=False).get_stats()['sealed_rows'] == 50
+
+
+def test_reader_indexes_shard_directories(tmp_path):
+    root = str(tmp_path)
+    with TrafficArchive(root) as archive:
+        archive.append_batch(records(START, 10))
+    for n, subnet in enumerate(['10.1.0.0_24', '10.2.0.0_24']):
+        with TrafficArchive(os.path.join(root, SHARD_DIR, subnet)) as shard:
+            shard.append_batch(records(START + 0.5 + n * 0.25, 10, source=f"10.{n + 1}.0.5"))
+
+    reader = TrafficArchive(root, writer=False)
+    assert reader.summarize()['packets'] == 30
+    assert len(reader.query(ip='10.2.0.5')) == 10
+    # A writer keeps to its own directory (its retention must not touch other writers' segments)
+    assert TrafficArchive(root).get_stats()['sealed_rows'] == 10
+
+
+def test_query_returns_newest_rows_across_overlapping_segments(tmp_path):
+    root = str(tmp_path)
+    with TrafficArchive(root) as archive:
+        archive.append_batch(records(START, 100, step=2.0))  # even seconds
+    with TrafficArchive(os.path.join(root, SHARD_DIR, 'site')) as shard:
+        shard.append_batch(records(START + 1, 100, source='10.9.0.1', step=2.0))  # odd seconds
+
+    rows = TrafficArchive(root, writer=False).query(limit=10)
+    sources = [row['source_ip'] for row in rows]
+    assert len(rows) == 10
+    assert [row['timestamp'] for row in rows] == sorted(row['timestamp'] for row in rows)
+    assert sources.count('10.9.0.1') == 5 and sources[-1] == '10.9.0.1'  # START + 199 is the newest
+
+
+def test_one_writer_per_directory(tmp_path):
+    root = str(tmp_path)
+    writer = TrafficArchive(root)
+    with pytest.raises(RuntimeError):
+        TrafficArchive(root)
+    TrafficArchive(root, writer=False)  # readers are never locked out
+    writer.append_batch(records(START, 5))
+    writer.close()
+    with TrafficArchive(root) as archive:
+        assert archive.get_stats()['sealed_rows'] == 5
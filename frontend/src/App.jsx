@@ -1,6 +1,22 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import './App.css';
 
+// Merge a /api/changes collection delta into the current list (keyed by id)
+const applyDelta = (items, delta) => {
+  if (!delta) return items;
+  if (delta.replace) return delta.replace;
+  const removed = new Set(delta.removed);
+  const upserted = new Map(delta.upserted.map(item => [item.id, item]));
+  const merged = items
+    .filter(item => !removed.has(item.id))
+    .map(item => {
+      const update = upserted.get(item.id);
+      upserted.delete(item.id);
+      return update || item;
+    });
+  return [...merged, ...upserted.values()];
+};
+
 function App() {
   const [devices, setDevices] = useState([]);
   const [threats, setThreats] = useState([]);
@@ -10,30 +26,67 @@ function App() {
     system_health: 100
   });
   const [isLoading, setIsLoading] = useState(false);
+  const [scanProgress, setScanProgress] = useState(null);
   const [error, setError] = useState('');
 
-  // Fetch initial data
+  const version = useRef(null);
+  const epoch = useRef(null);
+
+  // One consistent snapshot, then long-poll for changes since its version
   useEffect(() => {
-    fetchData();
-    const interval = setInterval(fetchData, 5000);
-    return () => clearInterval(interval);
+    const controller = new AbortController();
+    const follow = async () => {
+      while (!controller.signal.aborted) {
+        try {
+          await pollChanges(controller.signal);
+          setError('');
+        } catch (err) {
+          if (controller.signal.aborted) return;
+          setError('Cannot connect to backend. Make sure it\'s running on port 8000');
+          console.error(err);
+          await new Promise(resolve => setTimeout(resolve, 5000));
+        }
+      }
+    };
+    follow();
+    return () => controller.abort();
   }, []);
 
-  const fetchData = async () => {
+  const applySnapshot = (snapshot) => {
+    setDevices(snapshot.devices);
+    setThreats(snapshot.threats);
+    setStats(snapshot.stats);
+    version.current = snapshot.version;
+    epoch.current = snapshot.epoch;
+  };
+
+  const pollChanges = async (signal) => {
+    if (version.current === null) {
+      const res = await fetch('/api/snapshot', { signal });
+      if (!res.ok) throw new Error(`Snapshot failed: ${res.status}`);
+      applySnapshot(await res.json());
+      return;
+    }
+    // Returns as soon as anything changes, or after the server's timeout with no changes;
+    // a restarted backend has a new epoch and answers with a full snapshot
+    const res = await fetch(`/api/changes?since=${version.current}&epoch=${epoch.current}`, { signal });
+    if (!res.ok) throw new Error(`Changes failed: ${res.status}`);
+    const delta = await res.json();
+    if (delta.full) {
+      applySnapshot(delta);
+      return;
+    }
+    setDevices(current => applyDelta(current, delta.devices));
+    setThreats(current => applyDelta(current, delta.threats));
+    setStats(delta.stats);
+    version.current = delta.version;
+  };
+
+  const refresh = async () => {
     try {
-      const [devicesRes, threatsRes, statsRes] = await Promise.all([
-        fetch('/api/devices'),
-        fetch('/api/threats'),
-        fetch('/api/stats')
-      ]);
-      
-      if (devicesRes.ok) setDevices(await devicesRes.json());
-      if (threatsRes.ok) setThreats(await threatsRes.json());
-      if (statsRes.ok) setStats(await statsRes.json());
-      
-      setError('');
+      const res = await fetch('/api/snapshot');
+      if (res.ok) applySnapshot(await res.json());
     } catch (err) {
-      setError('Cannot connect to backend. Make sure it\'s running on port 8000');
       console.error(err);
     }
   };
@@ -45,13 +98,20 @@ function App() {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' }
       });
-      const data = await response.json();
-      alert(`Scan completed! Found ${data.devices_found} devices and ${data.threats_detected} threats.`);
-      fetchData();
+      // The scan runs in the background; follow its job until it finishes
+      let job = await response.json();
+      while (job.status === 'running') {
+        await new Promise(resolve => setTimeout(resolve, 500));
+        job = await (await fetch(`/api/jobs/${job.job_id || job.id}`)).json();
+        setScanProgress(job.progress);
+      }
+      if (job.status !== 'completed') throw new Error(job.error || job.status);
+      alert(`Scan completed! Found ${job.result.devices_found} devices and ${job.result.threats_detected} threats.`);
     } catch (err) {
       alert('Scan failed: ' + err.message);
     } finally {
       setIsLoading(false);
+      setScanProgress(null);
     }
   };
 
@@ -63,7 +123,6 @@ function App() {
           headers: { 'Content-Type': 'application/json' }
         });
         alert('Device blocked successfully!');
-        fetchData();
       } catch (err) {
         alert('Failed to block device');
       }
@@ -86,7 +145,9 @@ function App() {
           onClick={triggerScan}
           disabled={isLoading}
         >
-          {isLoading ? '🔍 Scanning...' : '🔍 Scan Network'}
+          {isLoading
+            ? `🔍 Scanning...${scanProgress && scanProgress.total ? ` ${scanProgress.scanned}/${scanProgress.total}` : ''}`
+            : '🔍 Scan Network'}
         </button>
       </header>
 
@@ -146,7 +207,7 @@ function App() {
       <div className="section">
         <div className="section-header">
           <h2>📱 Connected Devices ({devices.length})</h2>
-          <button className="refresh-btn" onClick={fetchData}>🔄 Refresh</button>
+          <button className="refresh-btn" onClick={refresh}>🔄 Refresh</button>
         </div>
         
         {devices.length === 0 ? (
@@ -234,6 +295,7 @@ function App() {
                 <div className="threat-footer">
                   <span>Device: {threat.device_id}</span>
                   <span>Confidence: {(threat.confidence * 100).toFixed(0)}%</span>
+                  {threat.count > 1 && <span>{threat.count} events</span>}
                   <span>{new Date(threat.timestamp).toLocaleTimeString()}</span>
                 </div>
               </div>